@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+import auditoria
+from visor_logs import VisorLogs
 
 class ModuloAdmin:
     def __init__(self, db):
@@ -43,9 +45,11 @@ class ModuloAdmin:
                             try:
                                 if id_p == 0:
                                     self.db.insert("perfiles", datos_perfil)
+                                    auditoria.registrar("Creación", "Administración", f"Nuevo usuario: {usuario_n} ({rol_n})")
                                     st.success(f"✅ Usuario '{usuario_n}' creado exitosamente.")
                                 else:
                                     self.db.update("perfiles", datos_perfil, id_p)
+                                    auditoria.registrar("Edición", "Administración", f"Perfil {id_p}: {usuario_n} ({rol_n})")
                                     st.success(f"✅ Perfil ID {id_p} actualizado correctamente.")
                                 st.rerun()
                             except Exception as e:
@@ -53,7 +57,7 @@ class ModuloAdmin:
 
             # Visualización de la tabla actual de perfiles
             st.subheader("Usuarios Registrados")
-            perfiles_data = self.db.fetch("perfiles")
+            perfiles_data = self.db.fetch("perfiles", columnas=["id", "usuario", "rol", "email", "created_at"])
             if perfiles_data:
                 df_perfiles = pd.DataFrame(perfiles_data)
                 # Reordenamos columnas para que sea fácil de leer
@@ -67,6 +71,7 @@ class ModuloAdmin:
                     id_borrar = st.number_input("ID a eliminar", min_value=1, step=1, key="del_user")
                     if st.button("Confirmar Eliminación", type="primary"):
                         self.db.delete("perfiles", id_borrar)
+                        auditoria.registrar("Eliminación", "Administración", f"Perfil {id_borrar}")
                         st.warning(f"Usuario con ID {id_borrar} eliminado.")
                         st.rerun()
             else:
@@ -74,8 +79,4 @@ class ModuloAdmin:
 
         with tab2:
             st.subheader("Historial de Movimientos")
-            logs = self.db.fetch("logs_sistema")
-            if logs:
-                st.dataframe(pd.DataFrame(logs).sort_values(by="id", ascending=False), use_container_width=True)
-            else:
-                st.write("No hay logs registrados todavía.")
\ No newline at end of file
+            VisorLogs(self.db, clave="adm_logs").render()
\ No newline at end of file
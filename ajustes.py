@@ -0,0 +1,83 @@
+# ajustes.py (Configuración del sistema leída de st.secrets o variables de entorno)
+import os
+
+import streamlit as st
+
+# Valores por defecto; se reemplazan en .streamlit/secrets.toml o con variables de
+# entorno del mismo nombre. Las credenciales (SUPABASE_URL, SUPABASE_KEY) no tienen
+# valor por defecto: se leen con requerido() y deben definirse siempre.
+_DEFECTOS = {
+    # Dónde viven los datos: "supabase", "sqlite" (archivo DB_SQLITE_RUTA) o "memoria"
+    "DB_BACKEND": "supabase",
+    "DB_SQLITE_RUTA": "datos_local.sqlite",
+    # Conexiones HTTP compartidas por todas las sesiones
+    "DB_POOL_MAX": 20,
+    "DB_POOL_KEEPALIVE": 10,
+    "DB_KEEPALIVE_SEG": 30,
+    "DB_TIMEOUT_SEG": 15,
+    "DB_TIMEOUT_CONEXION_SEG": 5,
+    "DB_HTTP2": True,
+    # Caché de lecturas
+    "CACHE_TTL_SEG": 60,
+    "CACHE_MAX_ENTRADAS": 256,
+    # Respaldos
+    "DIR_RESPALDOS": "respaldos",
+    # PDFs ya generados (facturas y cotizaciones)
+    "DIR_CACHE_PDF": "cache_pdf",
+    "CACHE_PDF_MAX_MB": 200,
+    # Exportación de PDFs por lote (0 = un proceso por núcleo)
+    "DIR_EXPORTACIONES": "exportaciones",
+    "EXPORT_PROCESOS": 0,
+    # Réplica local en SQLite para leer sin ir a Supabase (sincronizada en segundo plano)
+    "REPLICA_LOCAL": False,
+    "REPLICA_RUTA": "replica_local.sqlite",
+    "REPLICA_INTERVALO_SEG": 15,
+    # Registro de llamadas a la base (pestaña Rendimiento de Configuración)
+    "METRICAS_MAX_EVENTOS": 5000,
+    "CONSULTA_LENTA_MS": 500,
+    # Auditoría: los eventos se insertan en lotes desde un hilo; si no hay servidor, van a este archivo
+    "LOGS_PENDIENTES_RUTA": "logs_pendientes.ndjson",
+    "LOGS_TAM_COLA": 10000,
+    "LOGS_TAM_LOTE": 200,
+    "LOGS_INTERVALO_SEG": 2.0,
+    # Retención de logs: días en la base, carpeta del archivo y cada cuántas horas corre sola (0 = nunca)
+    "RETENCION_LOGS_DIAS": 90,
+    "DIR_ARCHIVO_LOGS": "archivo_logs",
+    "RETENCION_CADA_HORAS": 0,
+}
+
+
+def _secreto(nombre):
+    try:
+        return st.secrets[nombre] if nombre in st.secrets else None
+    except Exception:
+        # Sin archivo secrets.toml Streamlit lanza una excepción al consultarlo
+        return None
+
+
+def leer(nombre, defecto=None):
+    """Busca un ajuste en st.secrets, luego en el entorno y por último en los valores por defecto."""
+    valor = _secreto(nombre)
+    if valor is None:
+        valor = os.environ.get(nombre)
+    if valor is None:
+        return _DEFECTOS.get(nombre, defecto)
+
+    # Convertimos al tipo del valor por defecto (las variables de entorno siempre son texto)
+    base = _DEFECTOS.get(nombre, defecto)
+    if isinstance(base, bool):
+        return str(valor).strip().lower() in ("1", "true", "si", "sí", "yes")
+    if isinstance(base, int):
+        return int(valor)
+    if isinstance(base, float):
+        return float(valor)
+    return valor
+
+
+def requerido(nombre):
+    """Como leer(), para ajustes sin valor por defecto: si falta, un error que dice dónde definirlo."""
+    valor = leer(nombre)
+    if valor in (None, ""):
+        raise RuntimeError(f"Falta el ajuste {nombre}: defínalo en .streamlit/secrets.toml "
+                           "o como variable de entorno.")
+    return valor
@@ -0,0 +1,238 @@
+# almacen_sqlite.py (Copia local de tablas en SQLite)
+import json
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+
+_IDENTIFICADOR = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Columnas que guardan JSON (listas o diccionarios): se decodifican al leer
+TABLA_JSON = "_columnas_json"
+
+
+def _nombre(identificador):
+    """Valida y entrecomilla un nombre de tabla o columna (no aceptamos SQL arbitrario)."""
+    if not _IDENTIFICADOR.match(str(identificador)):
+        raise ValueError(f"Nombre no válido: {identificador!r}")
+    return f'"{identificador}"'
+
+
+def _valor(valor):
+    # SQLite no tiene tipos anidados: listas y diccionarios se guardan como JSON
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, bool):
+        return int(valor)
+    return valor
+
+
+@lru_cache(maxsize=256)
+def _patron_like(patron, sensible):
+    """Traduce un patrón LIKE de Postgres (% _ y \\ como escape) a una expresión regular."""
+    partes, escapado = [], False
+    for c in patron:
+        if escapado:
+            partes.append(re.escape(c))
+            escapado = False
+        elif c == "\\":
+            escapado = True
+        elif c == "%":
+            partes.append(".*")
+        elif c == "_":
+            partes.append(".")
+        else:
+            partes.append(re.escape(c))
+    return re.compile("".join(partes), re.DOTALL if sensible else re.DOTALL | re.IGNORECASE)
+
+
+def _like(valor, patron, sensible):
+    # LIKE de SQLite ignora mayúsculas solo en ASCII: ILIKE de Postgres también en "Ñ" o "É"
+    if valor is None or patron is None:
+        return None
+    return int(_patron_like(patron, bool(sensible)).fullmatch(str(valor)) is not None)
+
+
+def _condicion(campo, operador, valor):
+    """(sql, parámetros) de un filtro con la misma semántica que DBManager.fetch."""
+    if operador in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        simbolo = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}[operador]
+        return f"{campo} {simbolo} ?", [_valor(valor)]
+    if operador == "in":
+        valores = [_valor(v) for v in valor]
+        if not valores:
+            return "0", []
+        return f"{campo} IN ({', '.join('?' for _ in valores)})", valores
+    if operador in ("like", "ilike"):
+        return f"pg_like({campo}, ?, ?)", [valor, int(operador == "like")]
+    if operador == "is":
+        if valor is None or str(valor).lower() == "null":
+            return f"{campo} IS NULL", []
+        return f"{campo} IS ?", [_valor(valor)]
+    raise ValueError(f"Operador de filtro no soportado: {operador}")
+
+
+def _where(existentes, condiciones):
+    """Cláusula WHERE (con su espacio inicial, o vacía) y sus parámetros."""
+    partes, parametros = [], []
+    for campo, operador, valor in condiciones:
+        if campo not in existentes:
+            # Columna que nunca llegó: todas sus filas son NULL
+            partes.append("1" if operador == "is" and valor is None else "0")
+            continue
+        texto, params = _condicion(_nombre(campo), operador, valor)
+        partes.append(texto)
+        parametros.extend(params)
+    return (" WHERE " + " AND ".join(partes) if partes else ""), parametros
+
+
+class AlmacenSQLite:
+    """
+    Guarda filas de cualquier tabla sin conocer su esquema de antemano: la tabla
+    se crea con la llave primaria y las columnas se agregan a medida que aparecen.
+    """
+
+    def __init__(self, ruta=":memory:", clave="id"):
+        self.ruta = ruta
+        self.clave = clave
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("pg_like", 3, _like, deterministic=True)
+        if ruta != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._columnas = {}
+        self._json = {}
+        self._lock = threading.RLock()
+
+    def columnas(self, tabla):
+        with self._lock:
+            if tabla not in self._columnas:
+                filas = self.conn.execute(f"PRAGMA table_info({_nombre(tabla)})").fetchall()
+                if not filas:
+                    return []
+                self._columnas[tabla] = [f["name"] for f in filas]
+            return list(self._columnas[tabla])
+
+    def tablas(self):
+        filas = self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        # Las tablas que empiezan con "_" son del propio almacén (columnas JSON, marcas)
+        return [f["name"] for f in filas if not f["name"].startswith("_")]
+
+    def asegurar_tabla(self, tabla, columnas):
+        with self._lock:
+            existentes = self.columnas(tabla)
+            if not existentes:
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_nombre(tabla)} ({_nombre(self.clave)} PRIMARY KEY)")
+                existentes = [self.clave]
+            for col in columnas:
+                if col not in existentes:
+                    self.conn.execute(f"ALTER TABLE {_nombre(tabla)} ADD COLUMN {_nombre(col)}")
+                    existentes.append(col)
+            self._columnas[tabla] = existentes
+
+    def upsert(self, tabla, filas):
+        """Inserta o reemplaza por llave primaria; devuelve cuántas filas se escribieron."""
+        filas = list(filas)
+        if not filas:
+            return 0
+        with self._lock:
+            columnas = list(dict.fromkeys(c for f in filas for c in f))
+            self.asegurar_tabla(tabla, columnas)
+            self._marcar_json(tabla, {c for f in filas for c, v in f.items() if isinstance(v, (dict, list))})
+            lista = ", ".join(_nombre(c) for c in columnas)
+            marcas = ", ".join("?" for _ in columnas)
+            cambios = ", ".join(f"{_nombre(c)} = excluded.{_nombre(c)}" for c in columnas if c != self.clave)
+            sql = f"INSERT INTO {_nombre(tabla)} ({lista}) VALUES ({marcas})"
+            sql += f" ON CONFLICT({_nombre(self.clave)}) DO UPDATE SET {cambios}" if cambios else " ON CONFLICT DO NOTHING"
+            with self.conn:
+                self.conn.executemany(sql, [[_valor(f.get(c)) for c in columnas] for f in filas])
+            return len(filas)
+
+    def columnas_json(self, tabla):
+        with self._lock:
+            if tabla not in self._json:
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLA_JSON} (tabla, columna, PRIMARY KEY (tabla, columna))")
+                filas = self.conn.execute(f"SELECT columna FROM {TABLA_JSON} WHERE tabla = ?", (tabla,))
+                self._json[tabla] = {f["columna"] for f in filas}
+            return self._json[tabla]
+
+    def _marcar_json(self, tabla, columnas):
+        nuevas = set(columnas) - self.columnas_json(tabla)
+        if nuevas:
+            with self.conn:
+                self.conn.executemany(f"INSERT OR IGNORE INTO {TABLA_JSON} VALUES (?, ?)",
+                                      [(tabla, c) for c in nuevas])
+            self._json[tabla] |= nuevas
+
+    def crear_indice(self, tabla, columna):
+        with self._lock:
+            self.asegurar_tabla(tabla, [columna])
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_nombre(f'{tabla}_{columna}_idx')} "
+                              f"ON {_nombre(tabla)} ({_nombre(columna)})")
+
+    def borrar(self, tabla, ids):
+        """Elimina filas por llave primaria; devuelve cuántas se borraron."""
+        ids = list(ids)
+        if not ids or not self.columnas(tabla):
+            return 0
+        with self._lock, self.conn:
+            sql = f"DELETE FROM {_nombre(tabla)} WHERE {_nombre(self.clave)} = ?"
+            return self.conn.executemany(sql, [(i,) for i in ids]).rowcount
+
+    def ids(self, tabla):
+        if not self.columnas(tabla):
+            return set()
+        with self._lock:
+            return {f[0] for f in self.conn.execute(f"SELECT {_nombre(self.clave)} FROM {_nombre(tabla)}")}
+
+    def contar(self, tabla, condiciones=()):
+        """Cantidad de filas que cumplen las condiciones (mismo formato que consultar)."""
+        with self._lock:
+            existentes = self.columnas(tabla)
+            if not existentes:
+                return 0
+            where, parametros = _where(existentes, condiciones)
+            return self.conn.execute(f"SELECT COUNT(*) FROM {_nombre(tabla)}{where}", parametros).fetchone()[0]
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        """
+        Lee filas con la misma semántica que DBManager.fetch. condiciones es una lista
+        de (campo, operador, valor) con los operadores de la base remota; orden acepta
+        "campo" o "-campo". Las columnas que la tabla aún no tiene vuelven como None.
+        """
+        with self._lock:
+            existentes = self.columnas(tabla)
+            if not existentes:
+                return []
+            pedidas = list(columnas) if columnas else existentes
+            seleccion = ", ".join(_nombre(c) if c in existentes else f"NULL AS {_nombre(c)}" for c in pedidas)
+            where, parametros = _where(existentes, condiciones)
+            sql = f"SELECT {seleccion} FROM {_nombre(tabla)}{where}"
+
+            if orden:
+                partes = []
+                for campo in [orden] if isinstance(orden, str) else orden:
+                    nombre = campo.lstrip("-")
+                    if nombre in existentes:
+                        # Postgres ordena los NULL al final en ASC y al principio en DESC
+                        partes.append(f"{_nombre(nombre)} DESC NULLS FIRST" if campo.startswith("-")
+                                      else f"{_nombre(nombre)} ASC NULLS LAST")
+                if partes:
+                    sql += " ORDER BY " + ", ".join(partes)
+            if limite:
+                sql += f" LIMIT {int(limite)}"
+
+            filas = self.conn.execute(sql, parametros).fetchall()
+            decodificar = self.columnas_json(tabla) & set(pedidas)
+
+        resultado = []
+        for f in filas:
+            fila = dict(f)
+            for c in decodificar:
+                if isinstance(fila.get(c), str):
+                    fila[c] = json.loads(fila[c])
+            resultado.append(fila)
+        return resultado
+
+    def cerrar(self):
+        self.conn.close()
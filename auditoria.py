@@ -0,0 +1,175 @@
+# auditoria.py (Registro de actividad en logs_sistema sin demorar la acción del usuario)
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import streamlit as st
+
+import ajustes
+from database import DBManager
+
+TABLA_LOGS = "logs_sistema"
+# Valores que usan los registrar() de los módulos (filtros del visor de logs)
+MODULOS = ["Inventario", "Ventas", "Cotizaciones", "Clientes", "Contabilidad", "Configuración",
+           "Datos", "Mantenimiento", "Administración"]
+ACCIONES = ["Creación", "Edición", "Eliminación", "Cambio de rol", "Venta", "Cotización", "Recibo",
+            "Gasto", "Depósito", "Importación", "Respaldo", "Reconstrucción", "Retención"]
+
+
+class EscritorLogs:
+    """
+    Escribe los eventos de auditoría desde un hilo de fondo. registrar() solo los
+    pone en una cola acotada; el hilo los junta y los inserta de a varios por
+    petición cuando hay tam_lote eventos o pasan intervalo segundos.
+
+    Si el servidor falla (o la cola se llena) los eventos van a un archivo NDJSON
+    local y se reenvían, en orden, en cuanto una inserción vuelve a funcionar.
+    La fecha se fija al registrar, no al insertar, así el orden no depende de la demora.
+    """
+
+    def __init__(self, db, ruta_pendientes, tam_cola=10000, tam_lote=200, intervalo=2.0, reintentar_seg=30):
+        self.db = db
+        self.ruta_pendientes = ruta_pendientes
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        self.reintentar_seg = reintentar_seg
+        self.enviados = 0
+        self.ultimo_error = None
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._archivo_lock = threading.Lock()
+        self._reintentar_en = 0
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ciclo, name="escritor-logs", daemon=True)
+            self._hilo.start()
+            atexit.register(self.vaciar)
+
+    def registrar(self, accion, modulo, detalle="", usuario="Desconocido", rol="N/A"):
+        """Encola el evento y vuelve de inmediato; nunca lanza excepciones a la pantalla."""
+        evento = {
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "usuario": usuario,
+            "rol": rol,
+            "accion": accion,
+            "modulo": modulo,
+            "detalle": str(detalle),
+        }
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            # El hilo no da abasto o el servidor no responde: mejor al disco que perderlo
+            self._guardar_pendientes([evento])
+
+    # --- Hilo de escritura ---
+
+    def _tomar_lote(self, espera):
+        lote = []
+        limite = time.monotonic() + espera
+        while len(lote) < self.tam_lote:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(self._cola.get(timeout=max(restante, 0)) if restante > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _ciclo(self):
+        while True:
+            lote = self._tomar_lote(self.intervalo)
+            self._enviar(lote)
+
+    def _enviar(self, lote):
+        # Tras una falla no se insiste en cada ciclo: se acumula en disco hasta reintentar
+        if time.monotonic() < self._reintentar_en:
+            if lote:
+                self._guardar_pendientes(lote)
+            return
+        # Primero lo que quedó en disco, para conservar el orden de los eventos
+        if self.hay_pendientes():
+            lote = self._tomar_pendientes() + lote
+        if not lote:
+            return
+        for i in range(0, len(lote), self.tam_lote):
+            parte = lote[i:i + self.tam_lote]
+            try:
+                self.db.insert(TABLA_LOGS, parte, avisar=False)
+                self.enviados += len(parte)
+                self.ultimo_error = None
+            except Exception as e:
+                self.ultimo_error = f"{datetime.now():%H:%M:%S} {e}"
+                self._reintentar_en = time.monotonic() + self.reintentar_seg
+                self._guardar_pendientes(lote[i:])
+                return
+
+    def vaciar(self):
+        """Envía todo lo encolado (al cerrar la app); lo que no se pueda queda en disco."""
+        while True:
+            lote = self._tomar_lote(0)
+            if not lote:
+                return
+            self._enviar(lote)
+
+    # --- Archivo de pendientes ---
+
+    def _guardar_pendientes(self, eventos):
+        with self._archivo_lock:
+            with open(self.ruta_pendientes, "a", encoding="utf-8") as f:
+                for evento in eventos:
+                    f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+
+    def _tomar_pendientes(self):
+        with self._archivo_lock:
+            try:
+                with open(self.ruta_pendientes, encoding="utf-8") as f:
+                    eventos = [json.loads(linea) for linea in f if linea.strip()]
+            except FileNotFoundError:
+                return []
+            os.remove(self.ruta_pendientes)
+        return eventos
+
+    def hay_pendientes(self):
+        return os.path.exists(self.ruta_pendientes)
+
+    def pendientes_en_disco(self):
+        with self._archivo_lock:
+            try:
+                with open(self.ruta_pendientes, encoding="utf-8") as f:
+                    return sum(1 for linea in f if linea.strip())
+            except FileNotFoundError:
+                return 0
+
+    def en_cola(self):
+        return self._cola.qsize()
+
+
+# Un solo escritor por proceso, compartido por todas las sesiones
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def escritor_logs():
+    """El escritor del proceso, con su hilo en marcha."""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorLogs(DBManager(), ajustes.leer("LOGS_PENDIENTES_RUTA"),
+                                         tam_cola=ajustes.leer("LOGS_TAM_COLA"),
+                                         tam_lote=ajustes.leer("LOGS_TAM_LOTE"),
+                                         intervalo=ajustes.leer("LOGS_INTERVALO_SEG"))
+                _escritor.iniciar()
+    return _escritor
+
+
+def registrar(accion, modulo, detalle=""):
+    """Anota una acción del usuario de la sesión actual en logs_sistema (en segundo plano)."""
+    datos = st.session_state.get("user_data") or {}
+    escritor_logs().registrar(accion, modulo, detalle,
+                              usuario=datos.get("usuario", "Desconocido"),
+                              rol=st.session_state.get("rol") or "N/A")
@@ -1,22 +1,89 @@
+import hashlib
+import hmac
+import secrets
+
 import streamlit as st
-import pandas as pd
+
+# Formato guardado en perfiles.clave: pbkdf2_sha256$<iteraciones>$<sal hex>$<hash hex>
+ALGORITMO = "pbkdf2_sha256"
+ITERACIONES = 200_000
+
+
+def hash_clave(clave, sal=None, iteraciones=ITERACIONES):
+    """Genera el hash con sal que se guarda en la tabla perfiles."""
+    sal = sal or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", clave.encode("utf-8"), bytes.fromhex(sal), iteraciones)
+    return f"{ALGORITMO}${iteraciones}${sal}${digest.hex()}"
+
+
+def es_hash(guardada):
+    return str(guardada or "").startswith(ALGORITMO + "$")
+
+
+def verificar_clave(clave, guardada):
+    """Compara en tiempo constante; acepta claves antiguas guardadas en texto plano."""
+    guardada = str(guardada or "")
+    if not es_hash(guardada):
+        return hmac.compare_digest(clave.encode("utf-8"), guardada.encode("utf-8"))
+    try:
+        _, iteraciones, sal, esperado = guardada.split("$")
+        calculado = hash_clave(clave, sal, int(iteraciones)).split("$")[3]
+    except ValueError:
+        return False
+    return hmac.compare_digest(calculado, esperado)
+
+
+# Hash de relleno para que un usuario inexistente tarde lo mismo que uno real
+_HASH_FICTICIO = hash_clave(secrets.token_hex(8))
+
 
 class ModuloAuth:
     def __init__(self, db):
         self.db = db
 
+    def autenticar(self, usuario, clave):
+        """
+        Busca un único perfil por su usuario (columna indexada) y valida la clave.
+        Devuelve los datos de sesión del usuario, sin la clave, o None. El usuario se
+        compara en minúsculas, como se guarda al crearlo en Configuración.
+        Si la base no responde, el error de get_user sube hasta la pantalla de ingreso.
+        """
+        perfil = self.db.get_user(usuario.strip().lower())
+        if not perfil:
+            verificar_clave(clave, _HASH_FICTICIO)
+            return None
+        if not verificar_clave(clave, perfil.get('clave')):
+            return None
+
+        # Las claves antiguas en texto plano se migran al hash en el primer ingreso
+        if not es_hash(perfil.get('clave')):
+            try:
+                self.db.update("perfiles", {"clave": hash_clave(clave)}, perfil['id'])
+            except Exception:
+                pass
+
+        return {k: v for k, v in perfil.items() if k != 'clave'}
+
+    @staticmethod
+    def iniciar_sesion(principal):
+        """Guarda el usuario en la sesión; los reruns siguientes no vuelven a consultar."""
+        st.session_state.autenticado = True
+        st.session_state.user_data = principal
+        st.session_state.rol = principal.get('rol', 'usuario')
+
     def login(self):
         st.title("🛡️ CIR PANAMÁ OS")
         with st.container(border=True):
             u = st.text_input("Usuario")
             p = st.text_input("Contraseña", type="password")
             if st.button("Ingresar", use_container_width=True):
-                df = pd.DataFrame(self.db.fetch("perfiles"))
-                user_match = df[df['usuario'] == u] if not df.empty else pd.DataFrame()
-                if not user_match.empty:
-                    st.session_state.auth = True
-                    st.session_state.user = u
-                    st.session_state.rol = str(user_match.iloc[0]['rol']).lower()
+                try:
+                    principal = self.autenticar(u, p)
+                except Exception:
+                    # get_user ya mostró el error de la base: no son credenciales incorrectas
+                    return
+                if principal:
+                    self.iniciar_sesion(principal)
                     st.rerun()
                 else:
-                    st.error("Credenciales incorrectas")
\ No newline at end of file
+                    st.error("Credenciales incorrectas")
@@ -0,0 +1,469 @@
+# backends.py (Dónde viven los datos: Supabase o una base SQLite local)
+import json
+import threading
+from datetime import datetime, timezone
+
+import httpx
+from postgrest.types import CountMethod, ReturnMethod
+from supabase import ClientOptions, create_client
+
+import ajustes
+from almacen_sqlite import AlmacenSQLite
+from folios import TIPO_VENTA
+
+OPERADORES = ("eq", "neq", "gt", "gte", "lt", "lte", "in", "like", "ilike", "is")
+
+
+class StockInsuficiente(Exception):
+    """La venta pide más unidades de las que hay; no se aplicó ningún cambio."""
+
+
+class Backend:
+    """
+    Lo que DBManager necesita de un almacén de datos. Las condiciones llegan como
+    lista de (campo, operador, valor) con los operadores de OPERADORES y la misma
+    semántica de PostgREST; orden es "campo", "-campo" o una lista de ellos.
+    DBManager pone encima la caché, la réplica y los mensajes de error.
+    """
+
+    nombre = None
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        """Lista de filas (dict)."""
+        raise NotImplementedError
+
+    def contar(self, tabla, condiciones=()):
+        """Cantidad de filas que cumplen las condiciones, sin traerlas."""
+        raise NotImplementedError
+
+    def insertar(self, tabla, datos):
+        """datos es una fila o una lista de filas; devuelve las filas guardadas (con id y valores por defecto)."""
+        raise NotImplementedError
+
+    def upsert(self, tabla, filas, on_conflict="id"):
+        """Inserta o actualiza por la columna única on_conflict; no devuelve filas."""
+        raise NotImplementedError
+
+    def actualizar(self, tabla, datos, condiciones):
+        """Aplica datos a las filas que cumplen las condiciones; devuelve las filas actualizadas."""
+        raise NotImplementedError
+
+    def borrar(self, tabla, condiciones, devolver=True):
+        """Borra las filas que cumplen las condiciones; devuelve las filas o, con devolver=False, cuántas fueron."""
+        raise NotImplementedError
+
+    def rpc(self, funcion, params=None):
+        """Funciones del servidor (sql/): siguiente_folio, registrar_venta, reconstruir_resumen_diario."""
+        raise NotImplementedError
+
+    def es_falla_de_red(self, error):
+        return False
+
+
+# --- Supabase ---
+
+# Cliente Supabase compartido por todas las sesiones del proceso
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def obtener_cliente():
+    """
+    Devuelve el cliente Supabase del proceso, creándolo la primera vez.
+    Usa un pool HTTP con keep-alive y compresión para no repetir el
+    handshake TLS en cada rerun de Streamlit.
+    """
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            timeout = httpx.Timeout(
+                ajustes.leer("DB_TIMEOUT_SEG"),
+                connect=ajustes.leer("DB_TIMEOUT_CONEXION_SEG"),
+            )
+            http = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=ajustes.leer("DB_POOL_MAX"),
+                    max_keepalive_connections=ajustes.leer("DB_POOL_KEEPALIVE"),
+                    keepalive_expiry=ajustes.leer("DB_KEEPALIVE_SEG"),
+                ),
+                timeout=timeout,
+                headers={"Accept-Encoding": "gzip, deflate"},
+                http2=ajustes.leer("DB_HTTP2"),
+                follow_redirects=True,
+            )
+            _cliente = create_client(
+                ajustes.requerido("SUPABASE_URL"),
+                ajustes.requerido("SUPABASE_KEY"),
+                options=ClientOptions(httpx_client=http),
+            )
+        return _cliente
+
+
+def reiniciar_cliente():
+    """Descarta el cliente compartido; el siguiente acceso abre conexiones nuevas."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is not None:
+            try:
+                _cliente.options.httpx_client.close()
+            except Exception:
+                pass
+        _cliente = None
+
+
+def _es_falla_de_red(error):
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+def _aplicar_filtro(query, campo, operador, valor):
+    if operador not in OPERADORES:
+        raise ValueError(f"Operador de filtro no soportado: {operador}")
+    if operador == "in":
+        return query.in_(campo, list(valor))
+    if operador == "is":
+        return query.is_(campo, "null" if valor is None else valor)
+    return getattr(query, operador)(campo, valor)
+
+
+def _filtrar(query, condiciones):
+    for campo, operador, valor in condiciones:
+        query = _aplicar_filtro(query, campo, operador, valor)
+    return query
+
+
+class BackendSupabase(Backend):
+    """PostgREST sobre HTTP. Las lecturas se reintentan una vez si se cayó la conexión."""
+
+    nombre = "supabase"
+
+    def __init__(self):
+        # Sin credenciales no hay base: mejor avisar al arrancar que en la primera consulta
+        ajustes.requerido("SUPABASE_URL")
+        ajustes.requerido("SUPABASE_KEY")
+
+    @property
+    def cliente(self):
+        return obtener_cliente()
+
+    def _ejecutar(self, construir, reintentar=False):
+        try:
+            return construir().execute()
+        except Exception as e:
+            if not _es_falla_de_red(e):
+                raise
+            # Conexión caída: la próxima petición abre conexiones nuevas
+            reiniciar_cliente()
+            if not reintentar:
+                raise
+            return construir().execute()
+
+    def _select(self, tabla, condiciones, columnas, orden, limite):
+        query = _filtrar(self.cliente.table(tabla).select(",".join(columnas) if columnas else "*"), condiciones)
+        if orden:
+            for campo in [orden] if isinstance(orden, str) else orden:
+                query = query.order(campo.lstrip("-"), desc=campo.startswith("-"))
+        if limite:
+            query = query.limit(limite)
+        return query
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        # La lectura es idempotente: se puede reintentar tras reconectar
+        res = self._ejecutar(lambda: self._select(tabla, condiciones, columnas, orden, limite), reintentar=True)
+        return res.data or []
+
+    def contar(self, tabla, condiciones=()):
+        # HEAD con count=exact: Postgres cuenta (con los índices de los filtros) y no viaja ninguna fila
+        res = self._ejecutar(lambda: _filtrar(self.cliente.table(tabla).select("*", count=CountMethod.exact, head=True),
+                                              condiciones), reintentar=True)
+        return res.count or 0
+
+    def insertar(self, tabla, datos):
+        return self._ejecutar(lambda: self.cliente.table(tabla).insert(datos)).data or []
+
+    def upsert(self, tabla, filas, on_conflict="id"):
+        # No pide de vuelta las filas guardadas para no duplicar el tráfico
+        self._ejecutar(lambda: self.cliente.table(tabla)
+                       .upsert(filas, on_conflict=on_conflict, returning=ReturnMethod.minimal))
+
+    def actualizar(self, tabla, datos, condiciones):
+        return self._ejecutar(lambda: _filtrar(self.cliente.table(tabla).update(datos), condiciones)).data or []
+
+    def borrar(self, tabla, condiciones, devolver=True):
+        if devolver:
+            return self._ejecutar(lambda: _filtrar(self.cliente.table(tabla).delete(), condiciones)).data or []
+        res = self._ejecutar(lambda: _filtrar(
+            self.cliente.table(tabla).delete(count=CountMethod.exact, returning=ReturnMethod.minimal), condiciones))
+        return res.count or 0
+
+    def rpc(self, funcion, params=None):
+        return self._ejecutar(lambda: self.cliente.rpc(funcion, params or {})).data
+
+    def es_falla_de_red(self, error):
+        return _es_falla_de_red(error)
+
+
+# --- SQLite local (archivo o memoria) ---
+
+def _ahora():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _dia(fila):
+    """Día del movimiento, igual que dia_movimiento() en sql/006."""
+    return str(fila.get("fecha") or fila.get("created_at") or "")[:10] or None
+
+
+# Columnas de resumen_diario que suma cada tabla (campos_resumen() en sql/006)
+CAMPOS_RESUMEN = {
+    "ventas": {"ingresos": "total", "itbms": "itbms", "descuentos": "descuento", "fletes": "flete"},
+    "gastos": {"gastos": "monto"},
+    "depositos": {"depositos": "monto"},
+    "recibos": {"recibos_total": "monto"},
+}
+COLUMNAS_RESUMEN = ["ingresos", "itbms", "descuentos", "fletes", "num_ventas", "gastos", "depositos", "recibos_total"]
+
+
+def _acumular(resumen, tabla, fila, signo):
+    """Suma (signo 1) o resta (signo -1) un movimiento en la fila de su día, como acumular_resumen() en sql/006."""
+    for columna, campo in CAMPOS_RESUMEN[tabla].items():
+        resumen[columna] = _numero(resumen.get(columna)) + signo * _numero(fila.get(campo))
+    if tabla == "ventas":
+        resumen["num_ventas"] = int(_numero(resumen.get("num_ventas"))) + signo
+    if tabla == "recibos":
+        metodos = dict(resumen.get("recibos") or {})
+        metodo = fila.get("metodo_pago") or "Otro"
+        metodos[metodo] = _numero(metodos.get(metodo)) + signo * _numero(fila.get("monto"))
+        resumen["recibos"] = metodos
+    return resumen
+
+
+class BackendSQLite(Backend):
+    """
+    Toda la base en un archivo SQLite, o en memoria con ruta ":memory:", sin red.
+    Los filtros se resuelven con AlmacenSQLite.consultar (misma semántica que
+    PostgREST) y lo que en Supabase hacen los triggers y funciones de sql/ se
+    reproduce aquí: id, created_at y updated_at, folios, registrar_venta, saldo
+    de cada factura y resumen_diario. Un solo candado serializa las escrituras,
+    así cada una se valida y aplica completa como en una transacción.
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, ruta=":memory:"):
+        self.almacen = AlmacenSQLite(ruta)
+        self._lock = threading.RLock()
+        with self.almacen._lock, self.almacen.conn:
+            conn = self.almacen.conn
+            conn.execute("CREATE TABLE IF NOT EXISTS folios (tipo, anio, ultimo, PRIMARY KEY (tipo, anio))")
+            conn.execute("CREATE TABLE IF NOT EXISTS resumen_diario (dia PRIMARY KEY, "
+                         + ", ".join(f"{c} DEFAULT 0" for c in COLUMNAS_RESUMEN) + ", recibos DEFAULT '{}')")
+        self.almacen._marcar_json("resumen_diario", {"recibos"})
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        return self.almacen.consultar(tabla, condiciones, columnas, orden, limite)
+
+    def contar(self, tabla, condiciones=()):
+        return self.almacen.contar(tabla, condiciones)
+
+    def _siguiente_id(self, tabla):
+        if "id" not in self.almacen.columnas(tabla):
+            return 1
+        with self.almacen._lock:
+            return (self.almacen.conn.execute(f'SELECT MAX("id") FROM "{tabla}"').fetchone()[0] or 0) + 1
+
+    def insertar(self, tabla, datos):
+        filas = datos if isinstance(datos, list) else [datos]
+        with self._lock:
+            siguiente, ahora, nuevas = self._siguiente_id(tabla), _ahora(), []
+            for datos_fila in filas:
+                fila = dict(datos_fila)
+                if fila.get("id") is None:
+                    fila["id"], siguiente = siguiente, siguiente + 1
+                fila.setdefault("created_at", ahora)
+                fila["updated_at"] = ahora
+                nuevas.append(self._antes_de_guardar(tabla, fila))
+            self.almacen.upsert(tabla, nuevas)
+            self._despues(tabla, [], nuevas)
+            return [dict(f) for f in nuevas]
+
+    def upsert(self, tabla, filas, on_conflict="id"):
+        with self._lock:
+            existentes = {}
+            if on_conflict != "id":
+                # Las filas que ya existen conservan su id; las demás reciben uno nuevo
+                valores = [f.get(on_conflict) for f in filas if f.get(on_conflict) is not None]
+                for f in self.consultar(tabla, [(on_conflict, "in", valores)]) if valores else []:
+                    existentes[f[on_conflict]] = f
+            else:
+                ids = [f["id"] for f in filas if f.get("id") is not None]
+                existentes = {f["id"]: f for f in self.consultar(tabla, [("id", "in", ids)])} if ids else {}
+
+            siguiente, ahora, viejas, nuevas = self._siguiente_id(tabla), _ahora(), [], []
+            for datos_fila in filas:
+                fila = dict(datos_fila)
+                vieja = existentes.get(fila.get(on_conflict))
+                if vieja is not None:
+                    fila["id"] = vieja["id"]
+                    viejas.append(vieja)
+                    fila = dict(vieja, **fila)
+                else:
+                    if fila.get("id") is None:
+                        fila["id"], siguiente = siguiente, siguiente + 1
+                    fila.setdefault("created_at", ahora)
+                fila["updated_at"] = ahora
+                nuevas.append(self._antes_de_guardar(tabla, fila))
+            self.almacen.upsert(tabla, nuevas)
+            self._despues(tabla, viejas, nuevas)
+
+    def actualizar(self, tabla, datos, condiciones):
+        with self._lock:
+            viejas = self.consultar(tabla, condiciones)
+            ahora = _ahora()
+            nuevas = [self._antes_de_guardar(tabla, dict(f, **datos, updated_at=ahora)) for f in viejas]
+            self.almacen.upsert(tabla, nuevas)
+            self._despues(tabla, viejas, nuevas)
+            return [dict(f) for f in nuevas]
+
+    def borrar(self, tabla, condiciones, devolver=True):
+        with self._lock:
+            viejas = self.consultar(tabla, condiciones)
+            self.almacen.borrar(tabla, [f["id"] for f in viejas])
+            self._despues(tabla, viejas, [])
+            return viejas if devolver else len(viejas)
+
+    # --- Equivalentes de los triggers de sql/ ---
+
+    def _antes_de_guardar(self, tabla, fila):
+        if tabla == "ventas":
+            # pagado lo mantienen los recibos; saldo es columna generada (sql/007)
+            fila["pagado"] = _numero(fila.get("pagado"))
+            fila["saldo"] = _numero(fila.get("total")) - fila["pagado"]
+        return fila
+
+    def _despues(self, tabla, viejas, nuevas):
+        if tabla == "recibos":
+            for signo, filas in ((-1, viejas), (1, nuevas)):
+                for f in filas:
+                    if f.get("id_venta") is not None:
+                        self._sumar_pagado(f["id_venta"], signo * _numero(f.get("monto")))
+        if tabla in CAMPOS_RESUMEN:
+            for signo, filas in ((-1, viejas), (1, nuevas)):
+                for f in filas:
+                    self._acumular_resumen(tabla, f, signo)
+
+    def _sumar_pagado(self, id_venta, monto):
+        venta = self.consultar("ventas", [("id", "eq", id_venta)])
+        if venta:
+            pagado = _numero(venta[0].get("pagado")) + monto
+            self.almacen.upsert("ventas", [{"id": id_venta, "pagado": pagado, "updated_at": _ahora(),
+                                            "saldo": _numero(venta[0].get("total")) - pagado}])
+
+    def _acumular_resumen(self, tabla, fila, signo):
+        dia = _dia(fila)
+        if dia:
+            actual = (self.consultar("resumen_diario", [("dia", "eq", dia)]) or [{"dia": dia}])[0]
+            self._guardar_resumen([_acumular(actual, tabla, fila, signo)])
+
+    def _guardar_resumen(self, filas):
+        columnas = ["dia"] + COLUMNAS_RESUMEN + ["recibos"]
+        valores = [[json.dumps(f.get(c) or {}) if c == "recibos" else f.get(c, 0) for c in columnas] for f in filas]
+        with self.almacen._lock, self.almacen.conn:
+            self.almacen.conn.executemany(f"INSERT OR REPLACE INTO resumen_diario ({', '.join(columnas)}) "
+                                          f"VALUES ({', '.join('?' for _ in columnas)})", valores)
+
+    # --- Equivalentes de las funciones de sql/ ---
+
+    def rpc(self, funcion, params=None):
+        params = params or {}
+        with self._lock:
+            if funcion == "siguiente_folio":
+                return self._siguiente_folio(params["p_tipo"], params["p_anio"])
+            if funcion == "registrar_venta":
+                return self._registrar_venta(params["p_venta"], params["p_lineas"], params.get("p_id_cotizacion"))
+            if funcion == "reconstruir_resumen_diario":
+                return self._reconstruir_resumen()
+        raise ValueError(f"Función no disponible en la base local: {funcion}")
+
+    def _siguiente_folio(self, tipo, anio):
+        with self.almacen._lock, self.almacen.conn:
+            return self.almacen.conn.execute(
+                "INSERT INTO folios (tipo, anio, ultimo) VALUES (?, ?, 1) "
+                "ON CONFLICT (tipo, anio) DO UPDATE SET ultimo = ultimo + 1 RETURNING ultimo",
+                (tipo, int(anio))).fetchone()[0]
+
+    def _registrar_venta(self, venta, lineas, id_cotizacion=None):
+        """Equivalente de registrar_venta() en sql/003_registrar_venta.sql: se valida todo antes de escribir."""
+        pedido = {}
+        for linea in lineas:
+            if linea.get("id") not in (None, ""):
+                pedido[int(linea["id"])] = pedido.get(int(linea["id"]), 0) + int(linea["cantidad"])
+
+        productos = {p["id"]: p for p in self.consultar("productos", [("id", "in", list(pedido))], ["id", "stock"])} if pedido else {}
+        faltantes = []
+        for id_prod, cantidad in sorted(pedido.items()):
+            stock = int(_numero((productos.get(id_prod) or {}).get("stock")))
+            if id_prod not in productos or stock < cantidad:
+                faltantes.append({"id": id_prod, "pedido": cantidad, "stock": stock})
+        if faltantes:
+            raise StockInsuficiente(f"Stock insuficiente: {json.dumps(faltantes)}")
+
+        if id_cotizacion is not None:
+            cotizacion = self.consultar("cotizaciones", [("id", "eq", id_cotizacion)], ["estado"])
+            if not cotizacion or cotizacion[0].get("estado") != "Pendiente":
+                raise ValueError(f"La cotización {id_cotizacion} ya fue facturada")
+
+        for id_prod, cantidad in pedido.items():
+            self.actualizar("productos", {"stock": int(_numero(productos[id_prod].get("stock"))) - cantidad},
+                            [("id", "eq", id_prod)])
+        if id_cotizacion is not None:
+            self.actualizar("cotizaciones", {"estado": "Facturado"}, [("id", "eq", id_cotizacion)])
+
+        anio = int(venta.get("anio") or datetime.now().year)
+        campos = ("cliente", "subtotal", "itbms", "descuento", "flete", "total", "detalle", "fecha")
+        fila = {c: venta.get(c) for c in campos}
+        fila.update(anio=anio, num_fact=self._siguiente_folio(TIPO_VENTA, anio))
+        return self.insertar("ventas", fila)[0]
+
+    def _reconstruir_resumen(self):
+        with self.almacen._lock, self.almacen.conn:
+            self.almacen.conn.execute("DELETE FROM resumen_diario")
+        dias = {}
+        for tabla in CAMPOS_RESUMEN:
+            for fila in self.consultar(tabla):
+                dia = _dia(fila)
+                if dia:
+                    _acumular(dias.setdefault(dia, {"dia": dia}), tabla, fila, 1)
+        self._guardar_resumen(dias.values())
+        return len(dias)
+
+
+# Un backend por proceso, compartido por todas las sesiones (como el cliente Supabase)
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def crear_backend(tipo, ruta=None):
+    """tipo: "supabase", "sqlite" (archivo DB_SQLITE_RUTA) o "memoria" (SQLite en memoria)."""
+    if tipo == "supabase":
+        return BackendSupabase()
+    if tipo == "sqlite":
+        return BackendSQLite(ruta or ajustes.leer("DB_SQLITE_RUTA"))
+    if tipo == "memoria":
+        return BackendSQLite(":memory:")
+    raise ValueError(f"DB_BACKEND no reconocido: {tipo}")
+
+
+def backend_configurado():
+    """El backend elegido con el ajuste DB_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = crear_backend(ajustes.leer("DB_BACKEND"))
+        return _backend
@@ -0,0 +1,338 @@
+# benchmark.py (Tiempos de cada módulo contra bases sintéticas de distintos tamaños)
+#
+# Uso:
+#   python benchmark.py                                  -> 1k, 10k y 100k filas por tabla, todos los módulos
+#   python benchmark.py --tamanos 1000 10000 --modulos inventario ventas
+#   python benchmark.py --comparar benchmarks/base.json  -> falla (código 1) si algo empeoró
+#
+# Cada módulo se dibuja sin navegador con streamlit.testing (AppTest) sobre una
+# base SQLite en memoria (backends.BackendSQLite) llena de datos sintéticos. Por
+# cada rerun se mide el tiempo, las llamadas a la base, los bytes que habría
+# devuelto o recibido el servidor (JSON) y el pico de memoria de Python.
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+from streamlit import logger as streamlit_logger
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backends  # noqa: E402
+import busqueda  # noqa: E402
+import database  # noqa: E402
+from backends import Backend, BackendSQLite  # noqa: E402
+
+TAMANOS = [1_000, 10_000, 100_000]
+TABLAS = ["productos", "clientes", "ventas", "cotizaciones", "recibos", "gastos", "depositos", "perfiles", "logs_sistema"]
+DIR_RESULTADOS = "benchmarks"
+# Por debajo de este tiempo las diferencias entre corridas son ruido
+PISO_SEGUNDOS = 0.05
+
+SCRIPT = """
+import streamlit as st
+from database import DBManager
+from {modulo} import {clase}
+
+st.session_state.setdefault("rol", "master_it")
+st.session_state.setdefault("usuario", "benchmark")
+{clase}(DBManager()).render()
+"""
+
+
+# --- Medición de la base ---
+
+def _tamano(datos):
+    return len(json.dumps(datos, ensure_ascii=False, default=str)) if datos is not None else 0
+
+
+class BackendMedido(Backend):
+    """Envuelve otro backend y cuenta llamadas y bytes (lo que viajaría como JSON)."""
+
+    def __init__(self, base):
+        self.base = base
+        self.nombre = base.nombre
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.llamadas = 0
+        self.bytes = 0
+
+    def _medir(self, resultado, *enviado):
+        self.llamadas += 1
+        self.bytes += _tamano(resultado) + sum(_tamano(e) for e in enviado)
+        return resultado
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        return self._medir(self.base.consultar(tabla, condiciones, columnas, orden, limite))
+
+    def contar(self, tabla, condiciones=()):
+        return self._medir(self.base.contar(tabla, condiciones))
+
+    def insertar(self, tabla, datos):
+        return self._medir(self.base.insertar(tabla, datos), datos)
+
+    def upsert(self, tabla, filas, on_conflict="id"):
+        return self._medir(self.base.upsert(tabla, filas, on_conflict), filas)
+
+    def actualizar(self, tabla, datos, condiciones):
+        return self._medir(self.base.actualizar(tabla, datos, condiciones), datos)
+
+    def borrar(self, tabla, condiciones, devolver=True):
+        return self._medir(self.base.borrar(tabla, condiciones, devolver))
+
+    def rpc(self, funcion, params=None):
+        return self._medir(self.base.rpc(funcion, params), params)
+
+
+# --- Datos sintéticos ---
+
+PALABRAS = ["Tubo", "Codo", "Válvula", "Llave", "Unión", "Tee", "Adaptador", "Reductor", "Niple", "Brida",
+            "PVC", "Cobre", "Galvanizado", "Presión", "Roscado", "Soldable", "Ñandú", "Industrial"]
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Pedro", "Lucía", "Jorge", "Sofía", "Raúl"]
+APELLIDOS = ["Pérez", "González", "Rodríguez", "Castillo", "Núñez", "Herrera", "Vega", "Ríos"]
+METODOS = ["Efectivo", "ACH", "Cheque", "Yappy", "Tarjeta"]
+
+
+def _fecha(azar, hoy):
+    return (hoy - timedelta(days=azar.randrange(365))).isoformat()
+
+
+def generar(tabla, n, azar, hoy):
+    """n filas sintéticas de la tabla, con las columnas que leen los módulos."""
+    marca = datetime.now(timezone.utc).isoformat()
+    for i in range(1, n + 1):
+        if tabla == "productos":
+            costo = round(azar.uniform(0.5, 200), 2)
+            fila = {"nombre": f"{azar.choice(PALABRAS)} {azar.choice(PALABRAS)} {i}", "barcode": str(7_500_000_000 + i),
+                    "referencia": f"CIR-{i:06d}", "stock": azar.randrange(0, 500), "stock_minimo": azar.randrange(0, 20),
+                    "precio_costo": costo, "precio_venta": round(costo * 1.10, 2),
+                    "p5": round(costo * 1.05, 2), "p7": round(costo * 1.07, 2), "p10": round(costo * 1.10, 2)}
+        elif tabla == "clientes":
+            fila = {"nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {i}", "identificacion": f"8-{i}-{azar.randrange(1000)}",
+                    "telefono": f"6{azar.randrange(10**7):07d}", "email": f"cliente{i}@correo.com", "direccion": "Colón"}
+        elif tabla == "ventas":
+            total = round(azar.uniform(5, 2000), 2)
+            pagado = azar.choice([0, total, round(total / 2, 2)])
+            fila = {"num_fact": i, "anio": hoy.year, "fecha": _fecha(azar, hoy), "cliente": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.randrange(1, n + 1)}",
+                    "detalle": [{"id": azar.randrange(1, n + 1), "nombre": "Producto", "cantidad": 1, "precio": total, "subtotal": total}],
+                    "subtotal": total, "descuento": 0, "itbms": round(total * 0.07, 2), "flete": 0, "total": total,
+                    "pagado": pagado, "saldo": round(total - pagado, 2)}
+        elif tabla == "cotizaciones":
+            total = round(azar.uniform(5, 2000), 2)
+            fila = {"numero": i, "anio": hoy.year, "fecha": _fecha(azar, hoy), "cliente": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+                    "detalles": [{"id": None, "nombre": "Servicio", "cantidad": 1, "precio": total, "subtotal": total, "tipo": "manual"}],
+                    "total": total, "estado": azar.choice(["Pendiente", "Facturado"])}
+        elif tabla == "recibos":
+            fila = {"id_venta": azar.randrange(1, n + 1), "cliente": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+                    "monto": round(azar.uniform(5, 500), 2), "metodo_pago": azar.choice(METODOS), "fecha": _fecha(azar, hoy)}
+        elif tabla == "gastos":
+            fila = {"monto": round(azar.uniform(1, 300), 2), "descripcion": f"Gasto {i}", "fecha": _fecha(azar, hoy)}
+        elif tabla == "depositos":
+            fila = {"banco": azar.choice(["Banco General", "Banistmo", "BAC"]), "referencia": f"DEP-{i}",
+                    "monto": round(azar.uniform(50, 5000), 2), "fecha": _fecha(azar, hoy)}
+        elif tabla == "perfiles":
+            fila = {"usuario": f"usuario{i}", "rol": azar.choice(["usuario", "supervisor", "administrador"]),
+                    "clave": "pbkdf2_sha256$sintetico", "email": f"usuario{i}@cir.com"}
+        else:  # logs_sistema
+            fila = {"fecha": f"{_fecha(azar, hoy)}T{azar.randrange(24):02d}:{azar.randrange(60):02d}:00+00:00",
+                    "usuario": f"usuario{azar.randrange(1, 20)}", "rol": "usuario", "accion": azar.choice(["Creación", "Venta", "Eliminación"]),
+                    "modulo": azar.choice(["Ventas", "Inventario", "Clientes"]), "detalle": f"Registro {i}"}
+        yield dict(fila, id=i, created_at=marca, updated_at=marca)
+
+
+def base_sintetica(filas_por_tabla, semilla=42, lote=5000):
+    """BackendSQLite en memoria con filas_por_tabla filas en cada tabla del negocio."""
+    backend = BackendSQLite(":memory:")
+    azar, hoy = random.Random(semilla), date.today()
+    for tabla in TABLAS:
+        pendientes = []
+        for fila in generar(tabla, filas_por_tabla, azar, hoy):
+            pendientes.append(fila)
+            if len(pendientes) >= lote:
+                backend.almacen.upsert(tabla, pendientes)
+                pendientes = []
+        backend.almacen.upsert(tabla, pendientes)
+    backend.rpc("reconstruir_resumen_diario")
+    return backend
+
+
+# --- Escenarios: qué se hace en cada rerun de cada módulo ---
+
+def _escribir(texto, clave=None, etiqueta=None):
+    def paso(at):
+        if clave:
+            campo = at.text_input(key=clave)
+        else:
+            campo = next(c for c in at.text_input if c.label.startswith(etiqueta))
+        campo.set_value(texto)
+    return paso
+
+
+ESCENARIOS = {
+    "inventario": ("inventario", "ModuloInventario", [
+        ("inicial", None), ("rerun", None), ("buscar", _escribir("tubo pvc", etiqueta="🔍 Buscar")),
+    ]),
+    "ventas": ("ventas", "ModuloVentas", [
+        ("inicial", None), ("buscar_cliente", _escribir("ana", clave="venta_cli_buscar")),
+        ("buscar_producto", _escribir("tubo", clave="venta_prod_buscar")),
+    ]),
+    "cotizaciones": ("cotizaciones", "ModuloCotizaciones", [
+        ("inicial", None), ("rerun", None), ("buscar_cliente", _escribir("ana", clave="cot_cli_buscar")),
+    ]),
+    "clientes": ("clientes", "ModuloClientes", [
+        ("inicial", None), ("rerun", None), ("buscar", _escribir("ana", clave="bus_clientes")),
+    ]),
+    "contabilidad": ("contabilidad", "ModuloContabilidad", [
+        ("inicial", None), ("rerun", None),
+    ]),
+    "configuracion": ("configuracion", "ModuloConfiguracion", [
+        ("inicial", None), ("rerun", None),
+    ]),
+}
+
+
+def _reiniciar_proceso():
+    """Cada módulo empieza en frío: sin caché de lecturas ni índices de búsqueda del anterior."""
+    database._CACHE = database.CacheLectura(ttl=database._CACHE.ttl, max_entradas=database._CACHE.max_entradas)
+    busqueda._indices.clear()
+
+
+def _correr(nombre, medido, timeout, memoria):
+    """Una pasada por los pasos del escenario; devuelve una medición por paso."""
+    modulo, clase, pasos = ESCENARIOS[nombre]
+    _reiniciar_proceso()
+    at = AppTest.from_string(SCRIPT.format(modulo=modulo, clase=clase), default_timeout=timeout)
+    mediciones = []
+    for paso, accion in pasos:
+        registro = {"paso": paso}
+        try:
+            if accion:
+                accion(at)
+            medido.reiniciar()
+            if memoria:
+                tracemalloc.reset_peak()
+            inicio = time.perf_counter()
+            at.run()
+            registro["segundos"] = round(time.perf_counter() - inicio, 4)
+            registro["errores"] = [str(e.value) for e in at.exception]
+        except Exception as e:
+            # AppTest avisa el vencimiento con RuntimeError: los pasos siguientes ya no tienen sentido
+            registro["segundos"] = None
+            registro["errores"] = [f"{type(e).__name__}: {e}"]
+        registro["llamadas"] = medido.llamadas
+        registro["bytes"] = medido.bytes
+        if memoria:
+            registro["memoria_pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        mediciones.append(registro)
+        if registro["segundos"] is None:
+            break
+    return mediciones
+
+
+def medir_modulo(nombre, medido, filas, timeout, memoria):
+    """
+    Tiempos, llamadas y bytes salen de una pasada sin tracemalloc (que hace todo varias
+    veces más lento); si se pide memoria, el pico sale de una segunda pasada aparte.
+    """
+    resultados = [dict(r, modulo=nombre, filas=filas, memoria_pico_mb=None)
+                  for r in _correr(nombre, medido, timeout, memoria=False)]
+    if memoria:
+        tracemalloc.start()
+        try:
+            for r, m in zip(resultados, _correr(nombre, medido, timeout, memoria=True)):
+                r["memoria_pico_mb"] = m["memoria_pico_mb"]
+        finally:
+            tracemalloc.stop()
+    return [{k: r[k] for k in ("modulo", "filas", "paso", "segundos", "llamadas", "bytes", "memoria_pico_mb", "errores")}
+            for r in resultados]
+
+
+def ejecutar(tamanos, modulos, timeout=300, memoria=True, informe=print):
+    resultados = []
+    for filas in tamanos:
+        inicio = time.perf_counter()
+        medido = BackendMedido(base_sintetica(filas))
+        informe(f"Base sintética de {filas} filas por tabla lista en {time.perf_counter() - inicio:.1f} s")
+        backends._backend = medido
+        try:
+            for nombre in modulos:
+                for r in medir_modulo(nombre, medido, filas, timeout, memoria):
+                    informe(f"  {r['modulo']:<14} {r['paso']:<16} {r['segundos'] if r['segundos'] is not None else 'vencido':>9} s "
+                            f"{r['llamadas']:>5} llamadas {r['bytes'] / 1e6:>9.3f} MB"
+                            + (f" {r['memoria_pico_mb']:>8} MB pico" if memoria else "")
+                            + (f"  ⚠ {r['errores'][0][:80]}" if r['errores'] else ""))
+                    resultados.append(r)
+        finally:
+            backends._backend = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "tamanos": tamanos,
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, base, tolerancia=0.2):
+    """Lista de textos con lo que empeoró más que la tolerancia respecto de la corrida base."""
+    previos = {(r["modulo"], r["filas"], r["paso"]): r for r in base["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        antes = previos.get((r["modulo"], r["filas"], r["paso"]))
+        if not antes:
+            continue
+        clave = f"{r['modulo']}/{r['filas']}/{r['paso']}"
+        if r["segundos"] is None and antes["segundos"] is not None:
+            regresiones.append(f"{clave}: venció el tiempo (antes {antes['segundos']} s)")
+            continue
+        if (r["segundos"] is not None and antes["segundos"] is not None and r["segundos"] > PISO_SEGUNDOS
+                and r["segundos"] > antes["segundos"] * (1 + tolerancia)):
+            regresiones.append(f"{clave}: {antes['segundos']} s -> {r['segundos']} s")
+        if r["llamadas"] > antes["llamadas"]:
+            regresiones.append(f"{clave}: {antes['llamadas']} -> {r['llamadas']} llamadas a la base")
+        if r["bytes"] > antes["bytes"] * (1 + tolerancia):
+            regresiones.append(f"{clave}: {antes['bytes']} -> {r['bytes']} bytes")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los módulos de SGE-CIR sobre datos sintéticos.")
+    parser.add_argument("--tamanos", nargs="+", type=int, default=TAMANOS, help="Filas por tabla de cada base")
+    parser.add_argument("--modulos", nargs="+", choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument("--timeout", type=float, default=300, help="Segundos máximos por rerun")
+    parser.add_argument("--sin-memoria", action="store_true", help="No hacer la pasada extra que mide el pico de memoria")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto benchmarks/benchmark_<fecha>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior contra la cual buscar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento aceptado en tiempo y bytes (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    # Los avisos de Streamlit (use_container_width, ScriptRunContext) taparían la tabla de resultados
+    streamlit_logger.set_log_level("error")
+
+    resultado = ejecutar(args.tamanos, args.modulos, args.timeout, memoria=not args.sin_memoria)
+
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = comparar(resultado, json.load(f), args.tolerancia)
+        for texto in regresiones:
+            print(f"REGRESIÓN {texto}", file=sys.stderr)
+        if regresiones:
+            return 1
+        print("Sin regresiones respecto de la corrida base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
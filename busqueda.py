@@ -0,0 +1,369 @@
+# busqueda.py (Índices de búsqueda en memoria: códigos exactos y trigramas de texto)
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+import ajustes
+from folios import formatear_folio
+
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y sin signos: 'Válvula 1/2"' -> 'valvula 1 2'."""
+    if texto is None:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return _NO_ALFANUMERICO.sub(" ", texto.lower()).strip()
+
+
+def _codigo(valor):
+    """Forma canónica de un código (barcode, referencia): sin espacios ni signos."""
+    return normalizar(valor).replace(" ", "")
+
+
+def _trigramas(palabra):
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+def _union(conjuntos):
+    return set().union(*conjuntos)
+
+
+class IndiceTexto:
+    """
+    Índice invertido sobre filas identificadas por id:
+    - campos exactos (barcode, referencia...): diccionario código -> ids, O(1)
+    - campos de texto: palabra normalizada -> ids, con el vocabulario ordenado
+      (para prefijos) y trigramas de cada palabra (para términos contenidos)
+    Los trigramas van sobre el vocabulario y no sobre las filas: hay muchas menos
+    palabras distintas que productos, y cada término se resuelve con uniones e
+    intersecciones de conjuntos en vez de recorrer el catálogo.
+    """
+
+    def __init__(self, campos_texto, campos_exactos=()):
+        self.campos_texto = list(campos_texto)
+        self.campos_exactos = list(campos_exactos)
+        self.filas = {}
+        self._orden = {}  # id -> (largo, texto): desempate y orden alfabético
+        self._palabras = {}  # palabra -> ids
+        self._primeras = {}  # primera palabra del texto -> ids
+        self._gramas = {}  # trigrama -> palabras del vocabulario
+        self._vocabulario = None  # lista ordenada; None cuando hay que rehacerla
+        self._ordenados = None  # (ids ordenados, posición de cada id); None tras un cambio
+        self._exactos = {campo: {} for campo in self.campos_exactos}
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __contains__(self, id_fila):
+        return id_fila in self.filas
+
+    def agregar(self, id_fila, fila):
+        """Agrega o reemplaza una fila (si ya estaba, primero se quitan sus entradas viejas)."""
+        if id_fila in self.filas:
+            self.quitar(id_fila)
+        self.filas[id_fila] = fila
+        self._ordenados = None
+        texto = normalizar(" ".join(str(fila.get(c) or "") for c in self.campos_texto))
+        self._orden[id_fila] = (len(texto), texto)
+        palabras = texto.split()
+        for palabra in set(palabras):
+            ids = self._palabras.get(palabra)
+            if ids is None:
+                ids = self._palabras[palabra] = set()
+                for grama in _trigramas(palabra):
+                    self._gramas.setdefault(grama, set()).add(palabra)
+                self._vocabulario = None
+            ids.add(id_fila)
+        if palabras:
+            self._primeras.setdefault(palabras[0], set()).add(id_fila)
+        for campo in self.campos_exactos:
+            codigo = _codigo(fila.get(campo))
+            if codigo:
+                self._exactos[campo].setdefault(codigo, set()).add(id_fila)
+
+    def quitar(self, id_fila):
+        fila = self.filas.pop(id_fila, None)
+        if fila is None:
+            return
+        self._ordenados = None
+        palabras = self._orden.pop(id_fila)[1].split()
+        for palabra in set(palabras):
+            ids = self._palabras[palabra]
+            ids.discard(id_fila)
+            if not ids:
+                del self._palabras[palabra]
+                for grama in _trigramas(palabra):
+                    self._gramas[grama].discard(palabra)
+                    if not self._gramas[grama]:
+                        del self._gramas[grama]
+                self._vocabulario = None
+        if palabras:
+            self._primeras[palabras[0]].discard(id_fila)
+            if not self._primeras[palabras[0]]:
+                del self._primeras[palabras[0]]
+        for campo in self.campos_exactos:
+            codigo = _codigo(fila.get(campo))
+            ids = self._exactos[campo].get(codigo)
+            if ids is not None:
+                ids.discard(id_fila)
+                if not ids:
+                    del self._exactos[campo][codigo]
+
+    def exacto(self, campo, valor):
+        """Ids cuyo campo coincide exactamente con el código (lectura del escáner)."""
+        return set(self._exactos[campo].get(_codigo(valor), ()))
+
+    def _ordenar(self):
+        """(ids en orden de desempate, id -> posición); se rehace solo tras un cambio."""
+        if self._ordenados is None:
+            ids = sorted(self._orden, key=self._orden.__getitem__)
+            self._ordenados = (ids, {i: n for n, i in enumerate(ids)})
+        return self._ordenados
+
+    def _con_prefijo(self, termino):
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self._palabras)
+        inicio = bisect.bisect_left(self._vocabulario, termino)
+        fin = bisect.bisect_left(self._vocabulario, termino + "\uffff")
+        return self._vocabulario[inicio:fin]
+
+    def _que_contienen(self, termino):
+        """Palabras que contienen el término sin empezar con él (solo términos de 3+ letras)."""
+        if len(termino) < 3:
+            return []
+        conjuntos = sorted((self._gramas.get(g, set()) for g in _trigramas(termino)), key=len)
+        candidatas = set(conjuntos[0]).intersection(*conjuntos[1:])
+        return [p for p in candidatas if termino in p and not p.startswith(termino)]
+
+    def buscar(self, consulta, limite=50):
+        """
+        Lista de (puntaje, fila) ordenada de mejor a peor. Cada término debe aparecer
+        en el texto. Primero van las coincidencias exactas de código, luego los textos
+        que empiezan con la consulta, luego las palabras que empiezan con cada término
+        y por último los términos contenidos dentro de una palabra.
+        """
+        consulta_norm = normalizar(consulta)
+        if not consulta_norm:
+            return [(0, self.filas[i]) for i in self._ordenar()[0][:limite]]
+
+        exactos = _union(self.exacto(campo, consulta) for campo in self.campos_exactos)
+        terminos = consulta_norm.split()
+        coinciden, prefijos, primeras = None, [], None
+        for termino in terminos:
+            con_prefijo = self._con_prefijo(termino)
+            prefijo = _union(map(self._palabras.__getitem__, con_prefijo))
+            todos = prefijo | _union(map(self._palabras.__getitem__, self._que_contienen(termino)))
+            coinciden = todos if coinciden is None else coinciden & todos
+            prefijos.append(prefijo)
+            if primeras is None:
+                primeras = _union(filter(None, map(self._primeras.get, con_prefijo)))
+            if not coinciden:
+                break
+
+        grupos = {1000: exactos}
+        if coinciden:
+            coinciden -= exactos
+            inicio = primeras & coinciden
+            if len(terminos) == 1:
+                grupos[60] = inicio
+                grupos[10] = prefijos[0] & coinciden - inicio
+                grupos[3] = coinciden - prefijos[0]
+            else:
+                inicio = {i for i in inicio if self._orden[i][1].startswith(consulta_norm)}
+                # niveles[n]: ids donde n términos son inicio de palabra (solo operaciones de conjuntos)
+                niveles = [coinciden] + [set() for _ in terminos]
+                for prefijo in prefijos:
+                    for n in range(len(terminos) - 1, -1, -1):
+                        suben = niveles[n] & prefijo
+                        niveles[n] -= suben
+                        niveles[n + 1] |= suben
+                for n, ids in enumerate(niveles):
+                    puntaje = 10 * n + 3 * (len(terminos) - n)
+                    grupos[puntaje + 50] = ids & inicio
+                    grupos[puntaje] = ids - inicio
+
+        posicion = self._ordenar()[1]
+        resultado = []
+        for puntaje in sorted(grupos, reverse=True):
+            if len(resultado) >= limite:
+                break
+            for i in heapq.nsmallest(limite - len(resultado), grupos[puntaje], key=posicion.__getitem__):
+                resultado.append((puntaje, self.filas[i]))
+        return resultado
+
+
+def _con_folio(campo_numero):
+    """Agrega el folio impreso (2025-007) para encontrar el documento tal como se lee en papel."""
+    def preparar(fila):
+        anio = fila.get("anio") or str(fila.get("fecha") or "")[:4]
+        if anio:
+            fila["folio"] = formatear_folio(anio, fila.get(campo_numero) or fila.get("id"))
+        return fila
+    return preparar
+
+
+# Qué se indexa de cada tabla: columnas que se guardan, campos de texto (búsqueda
+# parcial), campos exactos (códigos) y un ajuste opcional de cada fila
+INDICES = {
+    "productos": {
+        "columnas": ["id", "nombre", "barcode", "referencia", "stock", "stock_minimo",
+                     "precio_venta", "precio_costo", "updated_at"],
+        "texto": ["nombre", "referencia"],
+        "exactos": ["barcode", "referencia"],
+    },
+    "clientes": {
+        "columnas": ["id", "nombre", "identificacion", "telefono", "email", "direccion", "updated_at"],
+        "texto": ["nombre", "identificacion"],
+        "exactos": ["identificacion"],
+    },
+    "ventas": {
+        "columnas": ["id", "num_fact", "anio", "fecha", "cliente", "total", "saldo", "updated_at"],
+        "texto": ["cliente"],
+        "exactos": ["id", "folio"],
+        "preparar": _con_folio("num_fact"),
+    },
+    "cotizaciones": {
+        "columnas": ["id", "numero", "anio", "fecha", "cliente", "total", "estado", "updated_at"],
+        "texto": ["cliente"],
+        "exactos": ["id", "folio"],
+        "preparar": _con_folio("numero"),
+    },
+    "recibos": {
+        "columnas": ["id", "id_venta", "fecha", "cliente", "monto", "metodo_pago", "updated_at"],
+        "texto": ["cliente"],
+        "exactos": ["id", "id_venta"],
+    },
+}
+# Solapamiento al pedir cambios por updated_at: cubre relojes y transacciones en vuelo
+MARGEN_DELTA = timedelta(seconds=5)
+
+
+class IndiceTabla:
+    """
+    Una tabla indexada en memoria, compartida por todas las sesiones del proceso.
+    La primera vez se carga completa; después solo se piden las filas con
+    updated_at posterior a la última marca (cuando la caché registra una escritura
+    o vence el TTL). Cada reconstruir_seg se recarga entera para reflejar borrados.
+    """
+
+    def __init__(self, tabla, ttl=None, reconstruir_seg=600):
+        config = INDICES[tabla]
+        self.tabla = tabla
+        self.columnas = config["columnas"]
+        self.campos_texto = config["texto"]
+        self.campos_exactos = config.get("exactos", [])
+        self.preparar = config.get("preparar")
+        self.ttl = ttl if ttl is not None else ajustes.leer("CACHE_TTL_SEG")
+        self.reconstruir_seg = reconstruir_seg
+        self.indice = self._nuevo_indice()
+        self.marca = None
+        self._cargado_en = None
+        self._revisado_en = 0.0
+        self._generacion = None
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+
+    def _nuevo_indice(self):
+        return IndiceTexto(self.campos_texto, self.campos_exactos)
+
+    def _leer(self, db, desde=None):
+        filtros = None
+        if desde:
+            inicio = datetime.fromisoformat(desde) - MARGEN_DELTA
+            filtros = {"updated_at": ("gt", inicio.isoformat())}
+        for fila in db.iter_rows(self.tabla, filters=filtros, columnas=self.columnas):
+            yield self.preparar(fila) if self.preparar else fila
+
+    def _avanzar_marca(self, marca, fila):
+        valor = fila.get("updated_at")
+        return str(valor) if valor and (marca is None or str(valor) > marca) else marca
+
+    def sincronizar(self, db, forzar=False):
+        """
+        Pone el índice al día. Si otra sesión ya está sincronizando y hay un índice
+        cargado, vuelve de inmediato y se busca en ese: solo la primera carga espera.
+        """
+        if not self._lock_sync.acquire(blocking=False):
+            if self._cargado_en is not None:
+                return
+            self._lock_sync.acquire()
+        try:
+            self._sincronizar(db, forzar)
+        finally:
+            self._lock_sync.release()
+
+    def _sincronizar(self, db, forzar):
+        ahora = time.monotonic()
+        generacion = db.cache.generacion(self.tabla)
+        completa = forzar or self._cargado_en is None or ahora - self._cargado_en > self.reconstruir_seg
+        if not completa and generacion == self._generacion and ahora - self._revisado_en < self.ttl:
+            return
+        # Sin marca (tabla vacía o sin updated_at) no hay delta posible: se recarga entera
+        completa = completa or self.marca is None
+        try:
+            # La lectura va fuera de self._lock: mientras llega, las búsquedas siguen con el índice actual
+            if completa:
+                indice, marca = self._nuevo_indice(), None
+                for fila in self._leer(db):
+                    indice.agregar(fila["id"], fila)
+                    marca = self._avanzar_marca(marca, fila)
+                indice.buscar("", limite=0)  # deja listo el orden de desempate
+                with self._lock:
+                    self.indice, self.marca, self._cargado_en = indice, marca, ahora
+            else:
+                cambios = list(self._leer(db, self.marca))
+                with self._lock:
+                    for fila in cambios:
+                        self.indice.agregar(fila["id"], fila)
+                        self.marca = self._avanzar_marca(self.marca, fila)
+        except Exception:
+            # iter_rows ya mostró el error; seguimos con el índice que teníamos
+            return
+        self._revisado_en = ahora
+        self._generacion = generacion
+
+    def buscar(self, consulta, limite=50):
+        with self._lock:
+            return self.indice.buscar(consulta, limite)
+
+    def quitar(self, id_fila):
+        with self._lock:
+            self.indice.quitar(id_fila)
+
+    def __len__(self):
+        return len(self.indice)
+
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def indice_tabla(db, tabla):
+    """Índice de la tabla para todo el proceso, al día con la base."""
+    with _indices_lock:
+        if tabla not in _indices:
+            _indices[tabla] = IndiceTabla(tabla)
+        indice = _indices[tabla]
+    indice.sincronizar(db)
+    return indice
+
+
+def indice_productos(db):
+    return indice_tabla(db, "productos")
+
+
+def buscar_en_todo(db, consulta, tablas=("clientes", "ventas", "cotizaciones", "recibos"), por_tabla=5):
+    """Resultados agrupados por tabla: {tabla: [(puntaje, fila), ...]} (solo las que tienen algo)."""
+    grupos = {}
+    for tabla in tablas:
+        resultados = indice_tabla(db, tabla).buscar(consulta, por_tabla)
+        if resultados:
+            grupos[tabla] = resultados
+    return grupos
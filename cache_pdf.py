@@ -0,0 +1,83 @@
+# cache_pdf.py (Caché en disco de PDFs generados, por huella del contenido)
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import ajustes
+
+# Subir este número cuando cambie el diseño de los PDFs: invalida todo lo guardado
+VERSION_PLANTILLA = 2
+
+
+class CachePDF:
+    """
+    Guarda cada PDF con el SHA-256 de su contenido como nombre. Si el documento
+    cambia, cambia la huella y se genera de nuevo; los viejos salen por tamaño
+    (se descartan primero los menos usados).
+    """
+
+    def __init__(self, directorio=None, max_mb=None, max_archivos=2000):
+        self.directorio = directorio or ajustes.leer("DIR_CACHE_PDF")
+        self.max_bytes = int((max_mb or ajustes.leer("CACHE_PDF_MAX_MB")) * 1024 * 1024)
+        self.max_archivos = max_archivos
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    @staticmethod
+    def huella(tipo, contenido):
+        texto = json.dumps([VERSION_PLANTILLA, tipo, contenido], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def _ruta(self, huella):
+        return os.path.join(self.directorio, f"{huella}.pdf")
+
+    def obtener(self, tipo, contenido, generar):
+        """Devuelve el PDF guardado para este contenido o lo genera con generar() y lo guarda."""
+        ruta = self._ruta(self.huella(tipo, contenido))
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            os.utime(ruta)  # marca de uso para descartar primero los menos pedidos
+            return datos
+        except FileNotFoundError:
+            pass
+
+        datos = generar()
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        os.replace(temporal, ruta)
+        self._podar()
+        return datos
+
+    def _podar(self):
+        with self._lock:
+            archivos = []
+            for entrada in os.scandir(self.directorio):
+                if entrada.name.endswith(".pdf"):
+                    info = entrada.stat()
+                    archivos.append((info.st_mtime, info.st_size, entrada.path))
+            total = sum(a[1] for a in archivos)
+            archivos.sort()
+            while archivos and (total > self.max_bytes or len(archivos) > self.max_archivos):
+                _, tamano, ruta = archivos.pop(0)
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= tamano
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_pdf():
+    """Caché compartida por todas las sesiones del proceso."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CachePDF()
+        return _cache
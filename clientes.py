@@ -1,5 +1,10 @@
 import streamlit as st
-import pandas as pd
+from busqueda import indice_tabla
+from omnibox import tomar_foco
+import auditoria
+
+# Fichas que se dibujan por búsqueda: el resto se alcanza afinando la consulta
+LIMITE_RESULTADOS = 50
 
 class ModuloClientes:
     def __init__(self, db):
@@ -11,60 +16,62 @@ class ModuloClientes:
 
         st.header("👥 Gestión de Clientes - CIR")
 
-        # 1. Carga de datos
-        clientes = self.db.fetch("clientes")
+        # 1. Búsqueda sobre el índice de clientes (en memoria, al día con la base)
+        indice = indice_tabla(self.db, "clientes")
+        # Si se llegó desde el buscador global, el cliente elegido queda como búsqueda
+        foco = tomar_foco("clientes")
+        if foco:
+            st.session_state.bus_clientes = foco["fila"].get("identificacion") or foco["fila"].get("nombre")
         
-        if clientes:
-            df = pd.DataFrame(clientes)
-            st.info(f"Total de clientes registrados: {len(df)}")
+        if len(indice):
+            st.info(f"Total de clientes registrados: {len(indice)}")
             
             # 2. Buscador
-            busqueda = st.text_input("🔍 Buscar cliente por nombre o RUC/Cédula...", "").lower()
+            busqueda = st.text_input("🔍 Buscar cliente por nombre o RUC/Cédula...", key="bus_clientes")
             
             st.divider()
 
             # 3. Listado en Fichas Estilizadas (Tu formato favorito)
-            for c in clientes:
-                nombre_c = c['nombre'].lower()
-                id_c = str(c.get('identificacion', '')).lower()
-                
-                if busqueda in nombre_c or busqueda in id_c:
-                    with st.container(border=True):
-                        col_info, col_contacto, col_acc = st.columns([2.5, 2.5, 1])
-                        
-                        with col_info:
-                            st.subheader(c['nombre'])
-                            st.write(f"🆔 **ID/RUC:** {c.get('identificacion', 'N/A')}")
-                            st.write(f"📍 **Dirección:** {c.get('direccion', 'S/D')}")
+            for _, c in indice.buscar(busqueda, limite=LIMITE_RESULTADOS):
+                with st.container(border=True):
+                    col_info, col_contacto, col_acc = st.columns([2.5, 2.5, 1])
+                    
+                    with col_info:
+                        st.subheader(c['nombre'])
+                        st.write(f"🆔 **ID/RUC:** {c.get('identificacion', 'N/A')}")
+                        st.write(f"📍 **Dirección:** {c.get('direccion', 'S/D')}")
+                    
+                    with col_contacto:
+                        st.markdown("**Datos de Contacto:**")
+                        st.write(f"📞 **Teléfono:** {c.get('telefono', 'S/D')}")
+                        st.write(f"📧 **Email:** {c.get('email', 'S/D')}")
+                    
+                    with col_acc:
+                        st.write("Acciones")
+                        # Aquí se aplicará la lógica que quieres dejar para el final, 
+                        # por ahora habilitamos los botones si el rol existe
+                        c_edit, c_del = st.columns(2)
                         
-                        with col_contacto:
-                            st.markdown("**Datos de Contacto:**")
-                            st.write(f"📞 **Teléfono:** {c.get('telefono', 'S/D')}")
-                            st.write(f"📧 **Email:** {c.get('email', 'S/D')}")
+                        if c_edit.button("✏️", key=f"ed_cli_{c['id']}"):
+                            st.session_state[f"edit_cli_{c['id']}"] = True
                         
-                        with col_acc:
-                            st.write("Acciones")
-                            # Aquí se aplicará la lógica que quieres dejar para el final, 
-                            # por ahora habilitamos los botones si el rol existe
-                            c_edit, c_del = st.columns(2)
-                            
-                            if c_edit.button("✏️", key=f"ed_cli_{c['id']}"):
-                                st.session_state[f"edit_cli_{c['id']}"] = True
-                            
-                            if c_del.button("🗑️", key=f"del_cli_{c['id']}"):
-                                self.db.delete("clientes", c['id'])
-                                st.success("Cliente eliminado")
-                                st.rerun()
+                        if c_del.button("🗑️", key=f"del_cli_{c['id']}"):
+                            self.db.delete("clientes", c['id'])
+                            auditoria.registrar("Eliminación", "Clientes", f"Cliente {c['id']}: {c.get('nombre')}")
+                            indice.quitar(c['id'])  # los borrados no llegan con la sincronización por updated_at
+                            st.success("Cliente eliminado")
+                            st.rerun()
 
-                            # Formulario de edición rápida
-                            if st.session_state.get(f"edit_cli_{c['id']}", False):
-                                with st.form(f"f_ed_cli_{c['id']}"):
-                                    nuevo_tel = st.text_input("Nuevo Teléfono", value=c.get('telefono', ''))
-                                    nueva_dir = st.text_input("Nueva Dirección", value=c.get('direccion', ''))
-                                    if st.form_submit_button("Guardar Cambios"):
-                                        self.db.update("clientes", {"telefono": nuevo_tel, "direccion": nueva_dir}, c['id'])
-                                        st.session_state[f"edit_cli_{c['id']}"] = False
-                                        st.rerun()
+                        # Formulario de edición rápida
+                        if st.session_state.get(f"edit_cli_{c['id']}", False):
+                            with st.form(f"f_ed_cli_{c['id']}"):
+                                nuevo_tel = st.text_input("Nuevo Teléfono", value=c.get('telefono', ''))
+                                nueva_dir = st.text_input("Nueva Dirección", value=c.get('direccion', ''))
+                                if st.form_submit_button("Guardar Cambios"):
+                                    self.db.update("clientes", {"telefono": nuevo_tel, "direccion": nueva_dir}, c['id'])
+                                    auditoria.registrar("Edición", "Clientes", f"Cliente {c['id']}: {c.get('nombre')}")
+                                    st.session_state[f"edit_cli_{c['id']}"] = False
+                                    st.rerun()
 
         # 4. Formulario de Registro (Expander inferior)
         st.divider()
@@ -85,6 +92,7 @@ class ModuloClientes:
                             "direccion": f_dir,
                             "email": f_ema
                         })
+                        auditoria.registrar("Creación", "Clientes", f"Cliente: {f_nom} ({f_ruc})")
                         st.success("¡Cliente registrado!")
                         st.rerun()
                     else:
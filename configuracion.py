@@ -2,6 +2,16 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 import datetime
+import os
+import metricas
+from auth import hash_clave
+from importacion import ImportadorInventario
+from respaldo import FORMATOS, MotorRespaldo, formatos_disponibles
+from finanzas import ResumenFinanciero
+import ajustes
+import auditoria
+from visor_logs import VisorLogs
+from retencion import FORMATOS_ARCHIVO, MotorRetencion, RetencionEnCurso, politicas
 
 class ModuloConfiguracion:
     def __init__(self, db):
@@ -12,27 +22,19 @@ class ModuloConfiguracion:
         self.roles_disponibles = ["usuario", "supervisor", "administrador", "master_it"]
 
     def registrar_log(self, accion, modulo, detalle):
-        """Guarda movimientos en la base de datos"""
-        usuario_actual = st.session_state.get('usuario', 'Desconocido')
-        rol_actual = st.session_state.get('rol', 'N/A')
-        log_data = {
-            "usuario": usuario_actual,
-            "rol": rol_actual,
-            "accion": accion,
-            "modulo": modulo,
-            "detalle": detalle
-        }
-        try:
-            self.db.insert(self.tabla_logs, log_data)
-        except:
-            pass
+        """Guarda movimientos en logs_sistema (en segundo plano, ver auditoria.py)"""
+        auditoria.registrar(accion, modulo, detalle)
+
+    @staticmethod
+    def _cambiar_umbral_lento():
+        metricas.REGISTRO.lenta_ms = st.session_state.cfg_lenta_ms
 
     def render(self):
         st.markdown("<h2 style='color: #707070; font-weight: bold;'>⚙️ Panel de Control Maestro</h2>", unsafe_allow_html=True)
         
         # Creamos pestañas para organizar todo y que no sea una pared de texto
-        tab_usuarios, tab_datos, tab_logs, tab_mantenimiento = st.tabs([
-            "👥 Usuarios", "📊 Importar/Exportar", "📜 Auditoría (Logs)", "🛡️ Mantenimiento"
+        tab_usuarios, tab_datos, tab_logs, tab_mantenimiento, tab_rendimiento = st.tabs([
+            "👥 Usuarios", "📊 Importar/Exportar", "📜 Auditoría (Logs)", "🛡️ Mantenimiento", "⏱️ Rendimiento"
         ])
 
         # --- PESTAÑA 1: GESTIÓN DE USUARIOS ---
@@ -47,14 +49,14 @@ class ModuloConfiguracion:
                     
                     if st.form_submit_button("✅ Guardar Usuario"):
                         if u and p:
-                            self.db.insert(self.tabla_perfiles, {"usuario": u.lower().strip(), "clave": p, "rol": r})
+                            self.db.insert(self.tabla_perfiles, {"usuario": u.lower().strip(), "clave": hash_clave(p), "rol": r})
                             self.registrar_log("Creación", "Configuración", f"Nuevo usuario: {u}")
                             st.success(f"Usuario {u} creado.")
                             st.rerun()
 
             st.markdown("---")
             st.markdown("### Usuarios Activos")
-            usuarios = self.db.fetch(self.tabla_perfiles)
+            usuarios = self.db.fetch(self.tabla_perfiles, columnas=["id", "usuario", "rol"], orden="usuario")
             for user in usuarios:
                 with st.container(border=True):
                     col_info, col_rol, col_acc = st.columns([2, 2, 1])
@@ -68,6 +70,7 @@ class ModuloConfiguracion:
                     with col_acc:
                         if st.button("💾", key=f"btn_save_{user['id']}"):
                             self.db.update(self.tabla_perfiles, {"rol": nuevo_rol}, user['id'])
+                            self.registrar_log("Cambio de rol", "Configuración", f"{user['usuario']}: {user['rol']} -> {nuevo_rol}")
                             st.toast("Rol actualizado")
                             st.rerun()
 
@@ -80,13 +83,42 @@ class ModuloConfiguracion:
                 st.info("Subir Inventario desde Excel")
                 archivo = st.file_uploader("Archivo .xlsx", type=["xlsx"])
                 if archivo:
-                    df = pd.read_excel(archivo)
-                    if st.button("🚀 Procesar Importación"):
-                        registros = df.to_dict(orient='records')
-                        for reg in registros:
-                            self.db.insert(self.tabla_inventario, reg)
-                        self.registrar_log("Importación", "Datos", f"Carga masiva: {len(registros)} items")
-                        st.success("¡Importación exitosa!")
+                    df = pd.read_excel(archivo, dtype={"barcode": str, "referencia": str})
+                    importador = ImportadorInventario(self.db, self.tabla_inventario)
+                    try:
+                        validos, errores = importador.validar(df)
+                    except ValueError as e:
+                        st.error(str(e))
+                        validos, errores = None, None
+
+                    if validos is not None:
+                        st.write(f"✅ {len(validos)} filas válidas | ⚠️ {len(errores)} problemas")
+                        if not errores.empty:
+                            with st.expander("Ver errores por fila"):
+                                st.dataframe(errores, use_container_width=True, hide_index=True)
+                                st.download_button("📥 Descargar reporte de errores", errores.to_csv(index=False),
+                                                   "errores_importacion.csv", "text/csv")
+
+                        c_sim, c_lote = st.columns(2)
+                        simulacro = c_sim.checkbox("Simulacro (no guarda nada)")
+                        importador.tam_lote = c_lote.number_input("Filas por lote", min_value=50, max_value=5000, value=500, step=50)
+
+                        if st.button("🚀 Procesar Importación", disabled=validos.empty):
+                            barra = st.progress(0.0, text="Preparando...")
+                            resumen = importador.importar(validos, dry_run=simulacro,
+                                                          progreso=lambda f, t: barra.progress(f, text=t))
+                            if simulacro:
+                                st.info(f"Simulacro: {resumen['nuevos']} productos nuevos y "
+                                        f"{resumen['actualizados']} actualizaciones. No se guardó nada.")
+                            else:
+                                barra.progress(1.0, text="Terminado")
+                                self.registrar_log("Importación", "Datos",
+                                                   f"Carga masiva: {resumen['guardados']} de {resumen['total']} items")
+                                if resumen['lotes_fallidos']:
+                                    st.error(f"{len(resumen['lotes_fallidos'])} lotes fallaron; puede volver a importar el archivo sin duplicar.")
+                                    st.dataframe(pd.DataFrame(resumen['lotes_fallidos']), use_container_width=True, hide_index=True)
+                                else:
+                                    st.success(f"¡Importación exitosa! {resumen['nuevos']} nuevos, {resumen['actualizados']} actualizados.")
 
             with col_down:
                 st.info("Descargar Plantilla")
@@ -101,16 +133,11 @@ class ModuloConfiguracion:
         # --- PESTAÑA 3: LOGS (AUDITORÍA) ---
         with tab_logs:
             st.subheader("Historial de Actividad 24/7")
-            try:
-                logs_data = self.db.fetch(self.tabla_logs)
-                if logs_data:
-                    df_logs = pd.DataFrame(logs_data)
-                    df_logs['fecha'] = pd.to_datetime(df_logs['fecha']).dt.strftime('%d/%m/%Y %H:%M')
-                    st.dataframe(df_logs.sort_values('fecha', ascending=False), use_container_width=True, hide_index=True)
-                else:
-                    st.warning("No hay registros de actividad.")
-            except:
-                st.error("Tabla de logs no encontrada en la base de datos.")
+            escritor = auditoria.escritor_logs()
+            if escritor.ultimo_error or escritor.hay_pendientes():
+                st.warning(f"{escritor.pendientes_en_disco()} eventos guardados en disco esperando al servidor. "
+                           f"Último error: {escritor.ultimo_error or 'ninguno'}")
+            VisorLogs(self.db, clave="cfg_logs").render()
 
         # --- PESTAÑA 4: MANTENIMIENTO Y BACKUP (TU GANANCIA) ---
         with tab_mantenimiento:
@@ -121,28 +148,164 @@ class ModuloConfiguracion:
                 st.markdown("#### 💾 Generar Backup del Sistema")
                 st.write("Descarga un archivo maestro con toda la información de la base de datos.")
                 
-                if st.button("🛠️ Preparar Respaldo Completo", use_container_width=True):
-                    # Recolección de datos
-                    data_prod = self.db.fetch("productos")
-                    data_ventas = self.db.fetch("ventas")
-                    data_perfiles = self.db.fetch("perfiles")
-                    
-                    output_bak = BytesIO()
-                    with pd.ExcelWriter(output_bak, engine='xlsxwriter') as writer:
-                        pd.DataFrame(data_prod).to_excel(writer, sheet_name='Inventario', index=False)
-                        pd.DataFrame(data_ventas).to_excel(writer, sheet_name='Ventas', index=False)
-                        pd.DataFrame(data_perfiles).to_excel(writer, sheet_name='Usuarios', index=False)
-                    
-                    st.download_button(
-                        label="⬇️ Descargar Backup (.xlsx)",
-                        data=output_bak.getvalue(),
-                        file_name=f"BACKUP_SGE_CIR_{datetime.date.today()}.xlsx",
-                        mime="application/vnd.ms-excel",
-                        use_container_width=True
-                    )
+                tipo_bak = st.radio("Tipo de respaldo", ["Completo", "Incremental"], horizontal=True,
+                                    help="Incremental: solo lo creado o modificado desde el último respaldo de la cadena (NDJSON), "
+                                         "más la lista de ids de cada tabla para reproducir los borrados al restaurar.")
+                c_fmt, c_pag = st.columns(2)
+                if tipo_bak == "Incremental":
+                    formato = c_fmt.selectbox("Formato", ["ndjson"], format_func=FORMATOS.get)
+                else:
+                    formato = c_fmt.selectbox("Formato", formatos_disponibles(), format_func=FORMATOS.get)
+                tam_pagina = c_pag.number_input("Filas por página", min_value=100, max_value=10000, value=1000, step=100)
+
+                motor = MotorRespaldo(self.db, tam_pagina=tam_pagina)
+                estado_bak = motor.leer_estado()
+                if estado_bak:
+                    st.caption(f"Cadena actual: base `{estado_bak['base']}` + {len(estado_bak['cadena']) - 1} incrementales. "
+                               "Para verificarla: `python restaurar.py respaldos/ copia.sqlite`")
+                elif tipo_bak == "Incremental":
+                    st.warning("Aún no hay respaldo base: genere primero uno completo en NDJSON.")
+
+                if st.button(f"🛠️ Preparar Respaldo {tipo_bak}", use_container_width=True,
+                             disabled=(tipo_bak == "Incremental" and not estado_bak)):
+                    barra = st.progress(0.0, text="Iniciando respaldo...")
+                    try:
+                        ruta, manifiesto = motor.generar(formato, progreso=lambda f, t: barra.progress(f, text=t),
+                                                         incremental=(tipo_bak == "Incremental"))
+                        st.session_state.respaldo_listo = (ruta, manifiesto)
+                        self.registrar_log("Respaldo", "Mantenimiento", f"Respaldo {tipo_bak.lower()} {formato}: {os.path.basename(ruta)}")
+                    except Exception as e:
+                        # generar() ya borró el archivo a medias y no avanzó la cadena de respaldos
+                        st.error(f"No se pudo generar el respaldo: {e}")
+
+                if "respaldo_listo" in st.session_state:
+                    ruta, manifiesto = st.session_state.respaldo_listo
+                    st.dataframe(pd.DataFrame([
+                        {"tabla": t, "filas": r["filas"], "sha256": r["sha256"]} for t, r in manifiesto["tablas"].items()
+                    ]), use_container_width=True, hide_index=True)
+                    with open(ruta, "rb") as f_bak:
+                        st.download_button(
+                            label=f"⬇️ Descargar Backup ({os.path.basename(ruta)})",
+                            data=f_bak,
+                            file_name=os.path.basename(ruta),
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" if ruta.endswith(".xlsx") else "application/zip",
+                            use_container_width=True
+                        )
             
+            with st.container(border=True):
+                st.markdown("#### 📊 Resumen Financiero Diario")
+                st.write("Los triggers lo mantienen al día; recalcúlelo si se corrigieron datos directamente en la base.")
+                if st.button("🔄 Reconstruir resumen diario", use_container_width=True):
+                    dias = ResumenFinanciero(self.db).reconstruir()
+                    self.registrar_log("Reconstrucción", "Mantenimiento", f"Resumen diario recalculado: {dias} días")
+                    st.success(f"Resumen recalculado: {dias} días con movimientos.")
+
+            motor_ret = MotorRetencion(self.db)
+            politica = politicas()[self.tabla_logs]
             with st.expander("🚨 Zona de Peligro"):
                 st.warning("Estas acciones son irreversibles.")
-                if st.button("Borrar Logs Antiguos"):
-                    # Aquí iría la lógica de limpieza
-                    st.error("Función protegida por seguridad.")
\ No newline at end of file
+                st.markdown("#### 🗄️ Retención de Logs")
+                c_dias, c_fmt_ret = st.columns(2)
+                dias_ret = c_dias.number_input("Días que se conservan en la base", min_value=7, max_value=3650,
+                                               value=politica["dias"], step=1)
+                formato_ret = c_fmt_ret.selectbox("Formato del archivo", [f for f in FORMATOS_ARCHIVO if f in formatos_disponibles()],
+                                                  format_func=FORMATOS_ARCHIVO.get)
+                corte = motor_ret.corte(dias_ret)
+                cada = ajustes.leer("RETENCION_CADA_HORAS")
+                st.caption(f"Los logs anteriores al {corte[:10]} (UTC) se guardan comprimidos por día en "
+                           f"`{motor_ret.directorio}/` y luego se borran de la base por tramos. "
+                           + (f"Corre sola cada {cada} h." if cada else "Programable con cron: `python retencion.py`"))
+
+                c_sim, c_arch = st.columns(2)
+                if c_sim.button("🔍 Simular (no borra nada)", use_container_width=True):
+                    simulacro = motor_ret.simular(self.tabla_logs, dias_ret, politica["columna"])
+                    st.info(f"Se archivarían {simulacro['filas']:,} registros de {len(simulacro['por_dia'])} días.")
+                    if simulacro["por_dia"]:
+                        st.dataframe(pd.DataFrame(list(simulacro["por_dia"].items()), columns=["día", "registros"]),
+                                     use_container_width=True, hide_index=True)
+                confirmar = c_arch.checkbox("Confirmo borrar de la base los logs ya archivados")
+                if c_arch.button("🗄️ Archivar y Borrar Logs Antiguos", type="primary", disabled=not confirmar,
+                                 use_container_width=True):
+                    barra = st.progress(0.0, text="Archivando...")
+                    try:
+                        res = motor_ret.archivar(self.tabla_logs, dias_ret, formato_ret, politica["columna"],
+                                                 progreso=lambda f, t: barra.progress(f, text=t))
+                        self.registrar_log("Retención", "Mantenimiento",
+                                           f"{res['archivadas']} logs archivados y {res['borradas']} borrados (antes de {corte[:10]})")
+                        st.success(f"{res['archivadas']:,} registros archivados en {len(res['archivos'])} archivos; "
+                                   f"{res['borradas']:,} borrados de la base.")
+                    except RetencionEnCurso as e:
+                        st.warning(str(e))
+                    except Exception as e:
+                        st.error(f"La retención se detuvo: {e}. Lo ya archivado se terminará de borrar en la próxima ejecución.")
+
+            with st.container(border=True):
+                st.markdown("#### 🔎 Buscar en Logs Archivados")
+                indice_ret = motor_ret.leer_indice(self.tabla_logs)
+                if not indice_ret:
+                    st.caption("Todavía no hay logs archivados.")
+                else:
+                    primero = datetime.date.fromisoformat(min(e["dia"] for e in indice_ret))
+                    ultimo = datetime.date.fromisoformat(max(e["dia"] for e in indice_ret))
+                    st.caption(f"{sum(e['filas'] for e in indice_ret):,} registros en {len(indice_ret)} archivos, "
+                               f"del {primero:%d/%m/%Y} al {ultimo:%d/%m/%Y}.")
+                    with st.form("form_buscar_archivo"):
+                        c_rango, c_usu, c_mod, c_txt = st.columns([2, 1, 1, 2])
+                        rango = c_rango.date_input("Fechas", value=(primero, ultimo), min_value=primero, max_value=ultimo)
+                        usuario_b = c_usu.text_input("Usuario")
+                        modulo_b = c_mod.selectbox("Módulo", [None] + auditoria.MODULOS,
+                                                   format_func=lambda m: "Todos" if m is None else m)
+                        texto_b = c_txt.text_input("Texto en el detalle")
+                        if st.form_submit_button("🔎 Buscar"):
+                            desde_b, hasta_b = (rango[0], rango[-1]) if isinstance(rango, (tuple, list)) and rango else (primero, ultimo)
+                            halladas = motor_ret.buscar(self.tabla_logs, desde_b, hasta_b, usuario=usuario_b.strip() or None,
+                                                        modulo=modulo_b, texto=texto_b)
+                            if halladas:
+                                st.caption(f"{len(halladas)} registros (máximo 500, los más recientes primero).")
+                                st.dataframe(pd.DataFrame(halladas), use_container_width=True, hide_index=True)
+                            else:
+                                st.info("Sin coincidencias en el archivo.")
+
+        # --- PESTAÑA 5: RENDIMIENTO (LLAMADAS A LA BASE POR PANTALLA) ---
+        with tab_rendimiento:
+            st.subheader("Llamadas a la Base de Datos")
+            registro = metricas.REGISTRO
+            st.caption(f"Últimas {registro.max_eventos} llamadas de todas las sesiones de este proceso "
+                       "(se pierden al reiniciar la app).")
+            c_ven, c_lenta, c_vaciar = st.columns([2, 2, 1])
+            ventanas = {"Últimos 5 minutos": 300, "Última hora": 3600, "Últimas 24 horas": 86400}
+            ventana = c_ven.selectbox("Ventana", list(ventanas), index=1)
+            # El umbral es de todo el proceso: solo se escribe cuando alguien lo cambia, no en cada rerun
+            c_lenta.number_input("Consulta lenta desde (ms)", min_value=50, max_value=60000,
+                                 value=int(registro.lenta_ms), step=50, key="cfg_lenta_ms",
+                                 on_change=self._cambiar_umbral_lento)
+            if c_vaciar.button("🧹 Vaciar registro", use_container_width=True):
+                registro.vaciar()
+
+            eventos = registro.recientes(ventanas[ventana])
+            if not eventos:
+                st.info("No hay llamadas registradas en esta ventana.")
+            else:
+                servidor = [e["ms"] for e in eventos if e["origen"] not in metricas.LOCALES]
+                p50, p95 = metricas.percentil(servidor, 50), metricas.percentil(servidor, 95)
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Llamadas", len(eventos))
+                m2.metric("Resueltas en caché/réplica", f"{1 - len(servidor) / len(eventos):.0%}")
+                m3.metric("p50 servidor", f"{p50:.0f} ms" if p50 is not None else "—")
+                m4.metric("p95 servidor", f"{p95:.0f} ms" if p95 is not None else "—")
+
+                st.markdown("#### Por pantalla")
+                st.dataframe(pd.DataFrame(registro.por_modulo(eventos)), use_container_width=True, hide_index=True)
+                st.markdown("#### Consultas más pesadas")
+                st.caption("Misma pantalla, tabla y filtros agrupados; ordenadas por tiempo total en el servidor.")
+                st.dataframe(pd.DataFrame(registro.mas_pesadas(eventos)), use_container_width=True, hide_index=True)
+
+            st.markdown(f"#### Consultas lentas (≥ {registro.lenta_ms} ms)")
+            lentas = registro.lentas()
+            if lentas:
+                df_lentas = pd.DataFrame(lentas[::-1])
+                df_lentas['momento'] = pd.to_datetime(df_lentas['momento'], unit='s').dt.strftime('%d/%m/%Y %H:%M:%S')
+                st.dataframe(df_lentas[["momento", "modulo", "rerun", "operacion", "tabla", "filtros", "filas", "ms", "error"]],
+                             use_container_width=True, hide_index=True)
+            else:
+                st.success("Ninguna consulta superó el umbral.")
@@ -1,15 +1,28 @@
+import os
 import streamlit as st
 import pandas as pd
 import streamlit.components.v1 as components
+from datetime import date
+from finanzas import ResumenFinanciero, inicio_de_mes
+from folios import folio_documento
+from cxc import TRAMOS, CuentasPorCobrar
+from ventas import ModuloVentas
+from exportacion import ExportadorDocumentos, formatos_disponibles
+from busqueda import indice_tabla
+from omnibox import foco_actual, soltar_foco
+import auditoria
+
+# Facturas que se listan en el historial por búsqueda
+LIMITE_HISTORIAL = 50
 
 class ModuloContabilidad:
     def __init__(self, db):
         self.db = db
 
-    def generar_formato_impresion(self, titulo, datos):
-        """Genera HTML para impresión en tamaño Letter (Original y Copia)"""
+    def generar_formato_impresion(self, titulo, datos, folio=None):
+        """Genera HTML para impresión en tamaño Letter (Original y Copia); folio por defecto: el id"""
         fecha = datos.get('fecha') or pd.Timestamp.now().strftime("%d/%m/%Y")
-        folio = datos.get('id', '000')
+        folio = folio or datos.get('id', '000')
         sujeto = datos.get('cliente') or datos.get('descripcion') or datos.get('banco') or "S/N"
         monto = float(datos.get('total') or datos.get('monto') or 0)
         concepto = datos.get('nota') or datos.get('descripcion') or datos.get('referencia') or "Registro Contable"
@@ -42,42 +55,131 @@ class ModuloContabilidad:
             """
         return f"<div>{html_content}</div><script>window.print();</script>"
 
+    def pdf_factura(self, id_venta):
+        """Trae la venta completa y su cliente solo para la factura pedida."""
+        venta = self.db.fetch("ventas", filters={"id": id_venta})[0]
+        clientes = self.db.fetch("clientes", filters={"nombre": venta.get('cliente')}, columnas=["nombre", "identificacion"], limite=1)
+        cliente = clientes[0] if clientes else {"nombre": venta.get('cliente')}
+        return ModuloVentas(self.db).pdf_factura(venta, cliente)
+
+    def vista_exportar_lote(self):
+        """Todas las facturas o cotizaciones de un período en un ZIP o un solo PDF."""
+        with st.expander("📦 Exportar PDFs del período"):
+            c1, c2, c3 = st.columns(3)
+            tipo = c1.radio("Documentos", ["ventas", "cotizaciones"], format_func=str.capitalize, key="lote_tipo")
+            rango = c2.date_input("Período", (inicio_de_mes(), date.today()), key="lote_rango")
+            etiquetas = {"zip": "ZIP (un PDF por documento)", "pdf": "Un solo PDF"}
+            formato = c3.radio("Formato", formatos_disponibles(), format_func=etiquetas.get, key="lote_formato")
+
+            if st.button("Generar exportación", key="lote_generar") and len(rango) == 2:
+                barra = st.progress(0.0, text="Preparando...")
+                try:
+                    ruta, stats = ExportadorDocumentos(self.db).exportar(
+                        tipo, rango[0], rango[1], formato, progreso=lambda f, t: barra.progress(f, text=t))
+                    st.session_state.lote_pdf = ruta
+                    st.success(f"{stats['documentos']} documentos en {stats['segundos']} s "
+                               f"({stats['docs_por_seg']} docs/s con {stats['procesos']} procesos)")
+                except Exception as e:
+                    st.error(f"No se pudo exportar: {e}")
+
+            ruta = st.session_state.get("lote_pdf")
+            if ruta and os.path.exists(ruta):
+                mime = "application/zip" if ruta.endswith(".zip") else "application/pdf"
+                with open(ruta, "rb") as f:
+                    st.download_button("📥 Descargar", f, os.path.basename(ruta), mime, key="lote_descargar")
+
+    def ficha_factura(self, v, prefijo=""):
+        with st.container(border=True):
+            c1, c2 = st.columns([4, 1])
+            c1.write(f"🧾 Factura {folio_documento(v)} | {v['cliente']} | **Total: ${float(v.get('total') or 0):.2f}**")
+            if c2.button("🖨️ Reimprimir", key=f"{prefijo}reim_{v['id']}"):
+                st.session_state.print_html = self.generar_formato_impresion("FACTURA DE VENTA", v, folio_documento(v))
+            # Factura en PDF: se arma al pedirla. La sesión guarda solo la marca; los bytes
+            # salen de la caché en disco en cada rerun (y se rehacen si la venta cambió)
+            clave_pdf = f"pdf_fact_{v['id']}"
+            if st.session_state.get(clave_pdf):
+                c2.download_button("📥 PDF", self.pdf_factura(v['id']), f"Factura_{v['id']}.pdf", "application/pdf", key=f"{prefijo}dl_{v['id']}")
+            elif c2.button("📄 PDF", key=f"{prefijo}pdf_{v['id']}"):
+                self.pdf_factura(v['id'])
+                st.session_state[clave_pdf] = True
+                st.rerun()
+
+    def ficha_recibo(self, r, prefijo=""):
+        with st.container(border=True):
+            c1, c2 = st.columns([4, 1])
+            c1.write(f"📄 Recibo #{r['id']} | Cliente: **{r.get('cliente')}** | ${float(r.get('monto') or 0):.2f}")
+            if c2.button("🖨️", key=f"{prefijo}pr_{r['id']}"):
+                st.session_state.print_html = self.generar_formato_impresion("RECIBO DE CAJA", r)
+
+    def vista_foco(self):
+        """Factura o recibo elegido en el buscador global, arriba de todo hasta cerrarlo."""
+        foco = foco_actual("ventas", "recibos")
+        if not foco:
+            return
+        c1, c2 = st.columns([5, 1])
+        c1.caption("📌 Resultado del buscador")
+        if c2.button("✖ Cerrar", key="cerrar_foco"):
+            soltar_foco()
+            st.rerun()
+        if foco["tabla"] == "ventas":
+            self.ficha_factura(foco["fila"], prefijo="foco_")
+        else:
+            self.ficha_recibo(foco["fila"], prefijo="foco_")
+
     def render(self):
         st.header("📊 Contabilidad y Finanzas CIR")
+        self.vista_foco()
         
         # 1. CARGA DE DATOS
-        ventas = self.db.fetch("ventas")
         recibos = self.db.fetch("recibos")
         gastos = self.db.fetch("gastos")
         depositos = self.db.fetch("depositos")
 
-        # 2. MÉTRICAS DE BALANCE
-        t_ingresos = sum(v.get('total', 0) for v in ventas) if ventas else 0.0
-        t_gastos = sum(g.get('monto', 0) for g in gastos) if gastos else 0.0
-        
+        # 2. MÉTRICAS DE BALANCE (desde el resumen diario: una fila por día del rango)
+        rango = st.date_input("Período", value=(inicio_de_mes(), date.today()), format="DD/MM/YYYY")
+        desde, hasta = (rango[0], rango[-1]) if isinstance(rango, (tuple, list)) and rango else (inicio_de_mes(), date.today())
+        actual, anterior, diario = ResumenFinanciero(self.db).comparar(desde, hasta)
+
+        def variacion(clave):
+            return f"{actual[clave] - anterior[clave]:+,.2f} vs período anterior"
+
         col1, col2, col3 = st.columns(3)
-        col1.metric("Ingresos (Ventas)", f"${t_ingresos:,.2f}")
-        col2.metric("Gastos", f"${t_gastos:,.2f}", delta_color="inverse")
-        col3.metric("Utilidad Neta", f"${(t_ingresos - t_gastos):,.2f}")
+        col1.metric("Ingresos (Ventas)", f"${actual['ingresos']:,.2f}", variacion('ingresos'))
+        col2.metric("Gastos", f"${actual['gastos']:,.2f}", variacion('gastos'), delta_color="inverse")
+        col3.metric("Utilidad Neta", f"${actual['utilidad']:,.2f}", variacion('utilidad'))
+
+        with st.expander("📈 Detalle del período"):
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Facturas", f"{int(actual['num_ventas'])}", f"{int(actual['num_ventas'] - anterior['num_ventas']):+d}")
+            c2.metric("ITBMS", f"${actual['itbms']:,.2f}", variacion('itbms'))
+            c3.metric("Descuentos", f"${actual['descuentos']:,.2f}", variacion('descuentos'), delta_color="inverse")
+            c4.metric("Fletes", f"${actual['fletes']:,.2f}", variacion('fletes'))
+            c1, c2 = st.columns(2)
+            c1.metric("Depósitos", f"${actual['depositos']:,.2f}", variacion('depositos'))
+            c2.metric("Recibos cobrados", f"${actual['recibos_total']:,.2f}", variacion('recibos_total'))
+            if actual['recibos_por_metodo']:
+                st.write("**Cobros por método de pago**")
+                st.dataframe(pd.DataFrame([{"Método": m, "Monto": f"${v:,.2f}"} for m, v in actual['recibos_por_metodo'].items()]),
+                             hide_index=True, use_container_width=True)
+            st.line_chart(diario[['ingresos', 'gastos']])
 
         # 3. CUENTAS POR COBRAR (CXC)
         st.divider()
         st.subheader("🔍 Cuentas por Cobrar (CXC)")
-        if ventas:
-            df_v = pd.DataFrame(ventas)
-            df_r = pd.DataFrame(recibos) if recibos else pd.DataFrame(columns=['id_venta', 'monto'])
-            p_pagos = df_r.groupby('id_venta')['monto'].sum().reset_index() if not df_r.empty else pd.DataFrame(columns=['id_venta', 'monto'])
-            p_pagos.columns = ['id_venta', 'total_pagado']
-            cxc_df = pd.merge(df_v, p_pagos, left_on='id', right_on='id_venta', how='left').fillna(0)
-            cxc_df['saldo'] = cxc_df['total'] - cxc_df['total_pagado']
-            pendientes = cxc_df[cxc_df['saldo'] > 0.01]
-            if not pendientes.empty:
-                st.error(f"Pendiente de cobro: ${pendientes['saldo'].sum():,.2f}")
-                with st.expander("Ver detalle CXC"):
-                    for _, p in pendientes.iterrows():
-                        st.write(f"📌 {p['cliente']} | Factura #{p['id']} | **Saldo: ${p['saldo']:.2f}**")
-            else:
-                st.success("✅ Cartera al día.")
+        cxc = CuentasPorCobrar(self.db)
+        pendientes = cxc.pendientes()
+        if not pendientes.empty:
+            st.error(f"Pendiente de cobro: ${pendientes['saldo'].sum():,.2f}")
+            tramos = cxc.por_tramo(pendientes)
+            for col, tramo in zip(st.columns(len(TRAMOS)), TRAMOS):
+                col.metric(f"{tramo} días", f"${tramos[tramo]:,.2f}")
+            with st.expander("Antigüedad por cliente"):
+                st.dataframe(cxc.antiguedad(pendientes), use_container_width=True, hide_index=True)
+            with st.expander("Ver detalle CXC"):
+                st.dataframe(pendientes[['folio', 'cliente', 'fecha', 'total', 'pagado', 'saldo', 'dias', 'tramo']]
+                             .rename(columns={'folio': 'Factura'}), use_container_width=True, hide_index=True)
+        else:
+            st.success("✅ Cartera al día.")
 
         # 4. PESTAÑAS DE TRABAJO
         st.divider()
@@ -91,6 +193,7 @@ class ModuloContabilidad:
                     desc_g = st.text_input("Descripción del Gasto")
                     if st.form_submit_button("💾 Guardar Gasto"):
                         self.db.insert("gastos", {"monto": monto_g, "descripcion": desc_g, "fecha": pd.Timestamp.now().strftime("%Y-%m-%d")})
+                        auditoria.registrar("Gasto", "Contabilidad", f"{desc_g}: ${monto_g:,.2f}")
                         st.rerun()
             if gastos:
                 for g in gastos:
@@ -115,6 +218,7 @@ class ModuloContabilidad:
                             "referencia": ref_d, 
                             "fecha": str(fecha_d)
                         })
+                        auditoria.registrar("Depósito", "Contabilidad", f"{banco} ref. {ref_d}: ${monto_d:,.2f}")
                         st.success("Depósito registrado correctamente")
                         st.rerun()
             
@@ -131,37 +235,44 @@ class ModuloContabilidad:
         # --- TAB 3: RECIBOS DE CAJA ---
         with tabs[2]:
             with st.expander("📝 Generar Recibo de Pago"):
-                if ventas:
-                    df_v_rec = pd.DataFrame(ventas)
-                    opciones = [f"Factura #{x['id']} - {x['cliente']} (${x['total']})" for _, x in df_v_rec.iterrows()]
+                if not pendientes.empty:
+                    # Etiquetas armadas por columnas (sin iterrows) y búsqueda por id
+                    etiquetas = dict(zip(pendientes['id'], "Factura " + pendientes['folio'] + " - "
+                                         + pendientes['cliente'].astype(str) + " (saldo $" + pendientes['saldo'].map("{:,.2f}".format) + ")"))
+                    clientes_fact = dict(zip(pendientes['id'], pendientes['cliente']))
+                    folios_fact = dict(zip(pendientes['id'], pendientes['folio']))
+                    id_sel = st.selectbox("Factura a pagar", list(etiquetas), format_func=etiquetas.get)
+                    saldo_sel = cxc.saldo(id_sel)
                     with st.form("f_recibo_f"):
-                        sel = st.selectbox("Factura a pagar", opciones)
-                        idx = opciones.index(sel)
-                        f_sel = df_v_rec.iloc[idx]
-                        m_rec = st.number_input("Monto Recibido $", value=float(f_sel['total']))
+                        m_rec = st.number_input("Monto Recibido $", min_value=0.0, value=saldo_sel)
                         met = st.selectbox("Método", ["Efectivo", "ACH", "Yappy", "Cheque"])
                         if st.form_submit_button("✅ Procesar Recibo"):
-                            self.db.insert("recibos", {"cliente": f_sel['cliente'], "monto": m_rec, "metodo_pago": met, "id_venta": int(f_sel['id']), "fecha": pd.Timestamp.now().strftime("%Y-%m-%d")})
-                            st.rerun()
+                            if m_rec - saldo_sel > 0.01:
+                                st.error(f"El monto supera el saldo pendiente (${saldo_sel:,.2f}).")
+                            else:
+                                self.db.insert("recibos", {"cliente": clientes_fact[id_sel], "monto": m_rec, "metodo_pago": met, "id_venta": int(id_sel), "fecha": pd.Timestamp.now().strftime("%Y-%m-%d")})
+                                auditoria.registrar("Recibo", "Contabilidad", f"Factura {folios_fact[id_sel]}: ${m_rec:,.2f} ({met})")
+                                st.rerun()
+                else:
+                    st.info("No hay facturas con saldo pendiente.")
             if recibos:
                 for r in recibos:
-                    with st.container(border=True):
-                        c1, c2 = st.columns([4, 1])
-                        c1.write(f"📄 Recibo #{r['id']} | Cliente: **{r.get('cliente')}** | ${r.get('monto'):.2f}")
-                        if c2.button("🖨️", key=f"pr_{r['id']}"):
-                            st.session_state.print_html = self.generar_formato_impresion("RECIBO DE CAJA", r)
+                    self.ficha_recibo(r)
 
         # --- TAB 4: HISTORIAL FACTURAS ---
         with tabs[3]:
-            if ventas:
-                bus = st.text_input("🔍 Buscar Factura...").lower()
-                for v in ventas:
-                    if bus in str(v['id']) or bus in v['cliente'].lower():
-                        with st.container(border=True):
-                            c1, c2 = st.columns([4, 1])
-                            c1.write(f"🧾 Factura #{v['id']} | {v['cliente']} | **Total: ${v['total']:.2f}**")
-                            if c2.button("🖨️ Reimprimir", key=f"reim_{v['id']}"):
-                                st.session_state.print_html = self.generar_formato_impresion("FACTURA DE VENTA", v)
+            self.vista_exportar_lote()
+            # Con búsqueda: índice de ventas en memoria. Sin ella: las últimas facturas
+            bus = st.text_input("🔍 Buscar Factura...", key="bus_facturas")
+            if bus.strip():
+                ventas = [v for _, v in indice_tabla(self.db, "ventas").buscar(bus, limite=LIMITE_HISTORIAL)]
+            else:
+                ventas = self.db.fetch("ventas", columnas=["id", "num_fact", "anio", "cliente", "total", "fecha"],
+                                       orden="-id", limite=LIMITE_HISTORIAL)
+                if len(ventas) == LIMITE_HISTORIAL:
+                    st.caption(f"Últimas {LIMITE_HISTORIAL} facturas. Use la búsqueda para encontrar anteriores.")
+            for v in ventas:
+                self.ficha_factura(v)
 
         # 5. DISPARADOR DE IMPRESIÓN
         if "print_html" in st.session_state:
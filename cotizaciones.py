@@ -1,70 +1,51 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from fpdf import FPDF
+from folios import TIPO_COTIZACION
+from cache_pdf import cache_pdf
+from documentos import renderizar_cotizacion
+from omnibox import foco_actual, soltar_foco
+from selectores import selector
+import auditoria
+
+# Campos que aparecen impresos en la cotización: solo ellos forman la huella del PDF
+CAMPOS_COTIZACION = ["id", "numero", "anio", "cliente", "detalles", "total"]
 
 class ModuloCotizaciones:
     def __init__(self, db):
         self.db = db
 
+    def pdf_cotizacion(self, datos, cliente_info, tipo="COTIZACIÓN"):
+        """PDF desde la caché en disco; se genera solo si la cotización cambió."""
+        contenido = {
+            "tipo": tipo,
+            "cotizacion": {k: datos.get(k) for k in CAMPOS_COTIZACION},
+            "cliente": {k: cliente_info.get(k) for k in ("nombre", "identificacion")},
+        }
+        return cache_pdf().obtener("cotizacion", contenido, lambda: self.generar_pdf(datos, cliente_info, tipo))
+
     def generar_pdf(self, datos, cliente_info, tipo="COTIZACIÓN"):
         """Genera el PDF con el formato oficial de CIR PANAMÁ"""
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # --- ENCABEZADO ---
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 8, "CIR PANAMÁ", ln=True, align="C")
-        pdf.set_font("Arial", "", 9)
-        pdf.cell(0, 5, "RUC: 3-716-1500 DV. 97", ln=True, align="C")
-        pdf.cell(0, 5, "Ciudad de Colón, Calle 1, Paseo Washington, Edificio 13, Ap. 19 b", ln=True, align="C")
-        pdf.cell(0, 5, "TEL: (507) 6865-7082 | Email: hola.cirpanama@gmail.com", ln=True, align="C")
-        pdf.ln(10)
-
-        # --- INFO CLIENTE Y DOCUMENTO ---
-        pdf.set_font("Arial", "B", 10)
-        nombre_cli = str(cliente_info.get('nombre', 'CLIENTE GENERAL')).upper()
-        pdf.cell(100, 6, f"CLIENTE: {nombre_cli}", 0)
-        pdf.set_font("Arial", "B", 12)
-        pdf.cell(0, 6, tipo, 0, 1, "R")
-        
-        pdf.set_font("Arial", "", 10)
-        ident = cliente_info.get('identificacion', 'N/A')
-        pdf.cell(100, 6, f"ID/RUC: {ident}", 0)
-        num_cot = f"{datetime.now().year}-{datos.get('id', 0):03d}"
-        pdf.cell(0, 6, f"NÚMERO: {num_cot}", 0, 1, "R")
-        pdf.ln(8)
-
-        # --- TABLA DE ITEMS ---
-        pdf.set_fill_color(230, 230, 230)
-        pdf.set_font("Arial", "B", 10)
-        pdf.cell(90, 8, " Descripcion", 1, 0, "L", True)
-        pdf.cell(20, 8, " Cant.", 1, 0, "C", True)
-        pdf.cell(35, 8, " Precio", 1, 0, "C", True)
-        pdf.cell(35, 8, " Total", 1, 1, "C", True)
-
-        pdf.set_font("Arial", "", 10)
-        detalles = datos.get('detalles', [])
-        for item in detalles:
-            pdf.cell(90, 7, f" {item.get('nombre', 'S/D')}", 1)
-            pdf.cell(20, 7, f" {item.get('cantidad', 1)}", 1, 0, "C")
-            p_unit = float(item.get('precio', 0))
-            pdf.cell(35, 7, f" ${p_unit:.2f}", 1, 0, "C")
-            p_sub = float(item.get('subtotal', 0))
-            pdf.cell(35, 7, f" ${p_sub:.2f}", 1, 1, "C")
-        
-        # --- TOTALES ---
-        pdf.ln(5)
-        pdf.set_x(130)
-        total = float(datos.get('total', 0))
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(30, 7, "TOTAL:", 0)
-        pdf.cell(35, 7, f"${total:.2f}", 0, 1, "R")
-        
-        return pdf.output(dest='S').encode('latin-1')
+        return renderizar_cotizacion(datos, cliente_info, tipo)
+
+    def vista_foco(self):
+        """Cotización elegida en el buscador global, arriba de las pestañas hasta cerrarla."""
+        foco = foco_actual("cotizaciones")
+        if not foco:
+            return
+        c1, c2 = st.columns([5, 1])
+        c1.caption("📌 Resultado del buscador")
+        if c2.button("✖ Cerrar", key="cerrar_foco_cot"):
+            soltar_foco()
+            st.rerun()
+        # La fila del índice no trae el detalle: se lee la cotización completa por id
+        cot = self.db.fetch("cotizaciones", filters={"id": foco["id"]}, limite=1)
+        if cot:
+            self.ficha(cot[0], prefijo="foco_")
 
     def render(self):
         st.header("📄 Módulo de Cotizaciones")
+        self.vista_foco()
         tab1, tab2 = st.tabs(["🆕 Crear Cotización", "📂 Historial"])
 
         with tab1:
@@ -77,27 +58,20 @@ class ModuloCotizaciones:
         if 'cart_cot' not in st.session_state:
             st.session_state.cart_cot = []
 
-        # Selector de Cliente
-        clientes = self.db.fetch("clientes")
-        if not clientes:
-            st.warning("⚠️ Debe registrar clientes primero.")
-            return
-
-        df_c = pd.DataFrame(clientes)
-        cli_sel = st.selectbox("👤 Seleccionar Cliente", df_c['nombre'].tolist())
-        cliente_full = df_c[df_c['nombre'] == cli_sel].iloc[0].to_dict()
+        # Selector de Cliente (búsqueda en el servidor; la elección queda por id)
+        cliente_full = selector(self.db, "clientes", "👤 Buscar Cliente (nombre o RUC/Cédula)", "cot_cli",
+                                ["id", "nombre", "identificacion"], campos=("nombre", "identificacion"),
+                                formato=lambda c: f"{c['nombre']} · {c.get('identificacion') or 'S/ID'}")
 
         # Selector de Ítems
         with st.container(border=True):
             tipo_item = st.radio("Tipo de Ítem:", ["Producto Inventario", "Manual / Mano de Obra"], horizontal=True)
             
             if tipo_item == "Producto Inventario":
-                prods = self.db.fetch("productos")
-                if prods:
-                    df_p = pd.DataFrame(prods)
-                    p_sel = st.selectbox("Producto", df_p['nombre'].tolist())
-                    item_p = df_p[df_p['nombre'] == p_sel].iloc[0]
-                    
+                item_p = selector(self.db, "productos", "Buscar Producto (nombre o referencia)", "cot_prod",
+                                  ["id", "nombre", "referencia", "p5", "p7", "p10"], campos=("nombre", "referencia"),
+                                  formato=lambda p: f"{p['nombre']} · Ref. {p.get('referencia') or 'N/A'}")
+                if item_p:
                     c1, c2, c3 = st.columns([2, 1, 1])
                     precio_op = c1.radio("Precio", [f"P5: {item_p['p5']}", f"P7: {item_p['p7']}", f"P10: {item_p['p10']}"], horizontal=True)
                     valor_p = float(precio_op.split(": ")[1])
@@ -125,7 +99,14 @@ class ModuloCotizaciones:
             total_cot = sum(i['subtotal'] for i in st.session_state.cart_cot)
             
             if st.button("💾 Guardar y Generar PDF"):
+                if not cliente_full:
+                    st.error("Seleccione un cliente")
+                    return
+                cli_sel = cliente_full['nombre']
+                anio = datetime.now().year
                 payload = {
+                    "numero": self.db.siguiente_folio(TIPO_COTIZACION, anio),
+                    "anio": anio,
                     "cliente": cli_sel,
                     "total": total_cot,
                     "detalles": st.session_state.cart_cot,
@@ -133,42 +114,57 @@ class ModuloCotizaciones:
                     "estado": "Pendiente"
                 }
                 res = self.db.insert("cotizaciones", payload)
+                auditoria.registrar("Cotización", "Cotizaciones", f"N° {payload['numero']} a {cli_sel}: ${total_cot:,.2f}")
                 st.success("Cotización Guardada")
                 
-                pdf_bytes = self.generar_pdf(payload, cliente_full)
+                pdf_bytes = self.pdf_cotizacion(payload, cliente_full)
                 st.download_button("📥 Descargar PDF", pdf_bytes, f"Cotizacion_{cli_sel}.pdf", "application/pdf")
                 st.session_state.cart_cot = []
 
     def vista_historial(self):
-        cots = self.db.fetch("cotizaciones")
+        estado = st.radio("Estado", ["Todas", "Pendiente", "Facturado"], horizontal=True)
+        filtros = {"estado": estado} if estado != "Todas" else None
+        cots = self.db.fetch("cotizaciones", filters=filtros, orden="-id")
         if not cots:
             st.info("No hay cotizaciones registradas.")
             return
 
         for c in cots:
-            with st.container(border=True):
-                col1, col2, col3 = st.columns([2, 1, 1])
-                
-                # Manejo seguro de nulos para evitar el error de formato
-                v_total = float(c.get('total', 0) if c.get('total') is not None else 0)
-                v_cliente = c.get('cliente', 'Desconocido')
-                
-                col1.write(f"**Cliente:** {v_cliente}")
-                col1.caption(f"📅 Fecha: {c.get('fecha', 'S/F')}")
-                
-                col2.write(f"Total: **${v_total:.2f}**")
-                col2.write(f"Estado: `{c.get('estado', 'Pendiente')}`")
-                
-                # Botón de PDF en historial
+            self.ficha(c)
+
+    def ficha(self, c, prefijo=""):
+        with st.container(border=True):
+            col1, col2, col3 = st.columns([2, 1, 1])
+            
+            # Manejo seguro de nulos para evitar el error de formato
+            v_total = float(c.get('total', 0) if c.get('total') is not None else 0)
+            v_cliente = c.get('cliente', 'Desconocido')
+            
+            col1.write(f"**Cliente:** {v_cliente}")
+            col1.caption(f"📅 Fecha: {c.get('fecha', 'S/F')}")
+            
+            col2.write(f"Total: **${v_total:.2f}**")
+            col2.write(f"Estado: `{c.get('estado', 'Pendiente')}`")
+            
+            # El PDF se arma solo cuando se pide. La sesión guarda solo la marca: los bytes
+            # salen de la caché en disco, que los rehace si la cotización cambió
+            clave_pdf = f"pdf_cot_{c.get('id')}"
+            if st.session_state.get(clave_pdf):
                 try:
-                    pdf_h = self.generar_pdf(c, {"nombre": v_cliente})
-                    col3.download_button("📥 PDF", pdf_h, f"Cot_{c.get('id')}.pdf", key=f"btn_{c.get('id')}")
+                    col3.download_button("📥 PDF", self.pdf_cotizacion(c, {"nombre": v_cliente}), f"Cot_{c.get('id')}.pdf", key=f"{prefijo}btn_{c.get('id')}")
+                except Exception as e:
+                    col3.error("Error PDF")
+            elif col3.button("📄 Preparar PDF", key=f"{prefijo}prep_{c.get('id')}"):
+                try:
+                    self.pdf_cotizacion(c, {"nombre": v_cliente})
+                    st.session_state[clave_pdf] = True
+                    st.rerun()
                 except Exception as e:
                     col3.error("Error PDF")
 
-                if c.get('estado') == "Pendiente":
-                    if col3.button("🚀 Facturar", key=f"fact_{c.get('id')}"):
-                        self.convertir_a_factura(c)
+            if c.get('estado') == "Pendiente":
+                if col3.button("🚀 Facturar", key=f"{prefijo}fact_{c.get('id')}"):
+                    self.convertir_a_factura(c)
 
     def convertir_a_factura(self, cot):
         # Lógica para mover a ventas y descontar stock
@@ -176,18 +172,15 @@ class ModuloCotizaciones:
             nueva_venta = {
                 "cliente": cot['cliente'],
                 "total": cot['total'],
-                "detalles": cot['detalles'],
+                "detalle": cot['detalles'],
+                "anio": datetime.now().year,
                 "fecha": datetime.now().isoformat()
             }
-            self.db.insert("ventas", nueva_venta)
-            
-            # Descontar stock solo de productos de inventario
-            for item in cot['detalles']:
-                if item['id'] is not None:
-                    p = self.db.fetch("productos", filters={"id": item['id']})[0]
-                    self.db.update("productos", {"stock": p['stock'] - item['cantidad']}, item['id'])
-            
-            self.db.update("cotizaciones", {"estado": "Facturado"}, cot['id'])
+            # Inserta la venta, descuenta el stock de los productos de inventario (las
+            # líneas manuales no tienen id) y marca la cotización, todo o nada
+            venta = self.db.registrar_venta(nueva_venta, cot['detalles'], id_cotizacion=cot['id'])
+            auditoria.registrar("Venta", "Cotizaciones", f"Cotización {cot['id']} facturada como #{venta.get('num_fact')} "
+                                                         f"({cot['cliente']}, ${float(cot['total'] or 0):,.2f})")
             st.success("✅ ¡Cotización convertida en factura con éxito!")
             st.rerun()
         except Exception as e:
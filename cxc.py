@@ -0,0 +1,71 @@
+# cxc.py (Cuentas por cobrar: saldos por factura y antigüedad por cliente)
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from folios import folio_documento
+
+TRAMOS = ["0-30", "31-60", "61-90", "90+"]
+_LIMITES = [-np.inf, 30, 60, 90, np.inf]
+COLUMNAS_PENDIENTES = ["id", "num_fact", "anio", "cliente", "fecha", "total", "pagado", "saldo"]
+# Diferencias de centavos por redondeo no cuentan como deuda
+SALDO_MINIMO = 0.01
+
+
+class CuentasPorCobrar:
+    """
+    Motor de CXC sobre las columnas ventas.pagado / ventas.saldo (sql/007), que
+    el servidor actualiza con cada recibo. El saldo de una factura es una lectura
+    por id y los reportes se calculan con operaciones de pandas sobre columnas.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def saldo(self, id_venta):
+        """Saldo pendiente de una factura (lectura por llave primaria, sin caché)."""
+        filas = self.db.fetch("ventas", filters={"id": int(id_venta)}, columnas=["saldo"], fresh=True)
+        return float(filas[0]["saldo"] or 0) if filas else 0.0
+
+    def pendientes(self, cliente=None):
+        """Facturas con saldo, recorridas por páginas usando el índice parcial de pendientes."""
+        filtros = {"saldo": ("gt", SALDO_MINIMO)}
+        if cliente:
+            filtros["cliente"] = cliente
+        paginas = list(self.db.iter_rows("ventas", filters=filtros, columnas=COLUMNAS_PENDIENTES, como_df=True))
+        if not paginas:
+            return pd.DataFrame(columns=COLUMNAS_PENDIENTES + ["folio", "dias", "tramo"])
+        df = pd.concat(paginas, ignore_index=True).reindex(columns=COLUMNAS_PENDIENTES)
+        for col in ["total", "pagado", "saldo"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+        # El folio impreso en la factura (2025-007), para mostrarlo en vez del id
+        datos = df[["id", "num_fact", "anio", "fecha"]]
+        df["folio"] = [folio_documento(f) for f in datos.astype(object).where(datos.notna(), None).to_dict("records")]
+        return self._clasificar(df)
+
+    @staticmethod
+    def _clasificar(df, hoy=None):
+        hoy = pd.Timestamp(hoy or date.today())
+        fechas = pd.to_datetime(df["fecha"].astype("string").str[:10], errors="coerce")
+        df["dias"] = (hoy - fechas).dt.days.fillna(0).clip(lower=0).astype(int)
+        df["tramo"] = pd.cut(df["dias"], bins=_LIMITES, labels=TRAMOS)
+        return df
+
+    @staticmethod
+    def antiguedad(pendientes):
+        """Saldo por cliente y tramo de días (0-30 / 31-60 / 61-90 / 90+) más el total."""
+        if pendientes.empty:
+            return pd.DataFrame(columns=["cliente"] + TRAMOS + ["total"])
+        reporte = pendientes.pivot_table(index="cliente", columns="tramo", values="saldo",
+                                         aggfunc="sum", fill_value=0.0, observed=False)
+        reporte = reporte.reindex(columns=TRAMOS, fill_value=0.0)
+        reporte["total"] = reporte.sum(axis=1)
+        reporte.columns.name = None
+        return reporte.sort_values("total", ascending=False).reset_index()
+
+    @staticmethod
+    def por_tramo(pendientes):
+        if pendientes.empty:
+            return pd.Series(0.0, index=TRAMOS)
+        return pendientes.groupby("tramo", observed=False)["saldo"].sum().reindex(TRAMOS, fill_value=0.0)
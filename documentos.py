@@ -0,0 +1,301 @@
+# documentos.py (Diseño de los PDF de facturas y cotizaciones de CIR PANAMÁ)
+#
+# Este módulo no importa Streamlit: lo usan tanto los módulos de la app como los
+# procesos de exportación por lote (exportacion.py).
+import io
+import os
+from datetime import datetime
+
+from fpdf import FPDF
+
+from folios import formatear_folio
+
+RUTA_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logo.png")
+
+MEMBRETE = [
+    "RUC: 3-716-1500 DV. 97",
+    "Ciudad de Colón, Calle 1, Paseo Washington, Edificio 13, Ap. 19 b",
+    "TEL: (507) 6865-7082 | Email: hola.cirpanama@gmail.com",
+]
+
+# Recursos que se preparan una sola vez por proceso y se reutilizan en cada documento
+_RECURSOS = {}
+
+
+def preparar_plantilla():
+    """Carga el logo en memoria (una vez por proceso); se usa como initializer del pool."""
+    if "logo" not in _RECURSOS:
+        try:
+            with open(RUTA_LOGO, "rb") as f:
+                _RECURSOS["logo"] = f.read()
+        except OSError:
+            _RECURSOS["logo"] = None
+    return _RECURSOS
+
+
+class PlantillaCIR(FPDF):
+    """Hoja con el membrete de la empresa repetido en cada página."""
+
+    def __init__(self, orientacion="P"):
+        super().__init__(orientation=orientacion)
+        self.recursos = preparar_plantilla()
+        self.set_auto_page_break(auto=True, margin=15)
+
+    def header(self):
+        logo = self.recursos.get("logo")
+        if logo:
+            self.image(io.BytesIO(logo), x=10, y=8, w=22)
+        self.set_font("Helvetica", "B", 16)
+        self.cell(0, 8, "CIR PANAMÁ", new_x="LMARGIN", new_y="NEXT", align="C")
+        self.set_font("Helvetica", "", 9)
+        for linea in MEMBRETE:
+            self.cell(0, 5, linea, new_x="LMARGIN", new_y="NEXT", align="C")
+        self.ln(10)
+
+
+def _tabla_items(pdf, items, ancho_cant):
+    pdf.set_fill_color(230, 230, 230)
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(90, 8, " Descripcion", 1, 0, "L", True)
+    pdf.cell(ancho_cant, 8, " Cant.", 1, 0, "C", True)
+    pdf.cell(35, 8, " Precio", 1, 0, "C", True)
+    pdf.cell(35, 8, " Total", 1, 1, "C", True)
+
+    pdf.set_font("Helvetica", "", 10)
+    for item in items:
+        pdf.cell(90, 7, f" {item.get('nombre', 'S/D')}", 1)
+        pdf.cell(ancho_cant, 7, f" {item.get('cantidad', 1)}", 1, 0, "C")
+        pdf.cell(35, 7, f" ${float(item.get('precio') or 0):.2f}", 1, 0, "C")
+        pdf.cell(35, 7, f" ${float(item.get('subtotal') or 0):.2f}", 1, 1, "C")
+
+
+def renderizar_factura(datos_venta, cliente_info, num_fact=None):
+    """PDF de una factura de venta (bytes)."""
+    num_fact = num_fact if num_fact is not None else (datos_venta.get('num_fact') or 0)
+    # Reimpresiones: la fecha es la de la venta, no la de hoy
+    fecha = datos_venta.get('fecha')
+    fecha = datetime.fromisoformat(str(fecha)[:19]) if fecha else datetime.now()
+
+    pdf = PlantillaCIR()
+    pdf.add_page()
+
+    # --- INFO CLIENTE Y FACTURA ---
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(100, 6, f"CLIENTE: {str(cliente_info.get('nombre') or datos_venta.get('cliente', '')).upper()}", 0)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 6, "FACTURA", 0, 1, "R")
+
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(100, 6, f"ID/RUC: {cliente_info.get('identificacion', 'N/A')}", 0)
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(0, 6, f"FACTURA: {formatear_folio(datos_venta.get('anio') or fecha.year, num_fact)}", 0, 1, "R")
+
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(100, 6, "", 0)
+    pdf.cell(0, 6, f"FECHA: {fecha.strftime('%d/%m/%Y')}", 0, 1, "R")
+    pdf.ln(8)
+
+    # --- TABLA DE PRODUCTOS ---
+    # Las ventas que vinieron de cotizaciones antiguas guardaron las líneas en 'detalles'
+    _tabla_items(pdf, datos_venta.get('detalle') or datos_venta.get('detalles') or [], 25)
+    pdf.ln(5)
+
+    # --- TOTALES (DERECHA) ---
+    for etiqueta, campo, signo in [("SUBTOTAL:", 'subtotal', ""), ("DESCUENTO:", 'descuento', "-"),
+                                   ("ITBMS (7%):", 'itbms', ""), ("FLETE:", 'flete', "")]:
+        pdf.set_x(120)
+        pdf.cell(40, 7, etiqueta, 0)
+        pdf.cell(30, 7, f"{signo}${float(datos_venta.get(campo) or 0):.2f}", 0, 1, "R")
+
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.set_x(120)
+    pdf.cell(40, 10, "TOTAL:", 0)
+    pdf.cell(30, 10, f"${float(datos_venta.get('total') or 0):.2f}", 0, 1, "R")
+
+    return bytes(pdf.output())
+
+
+def renderizar_cotizacion(datos, cliente_info, tipo="COTIZACIÓN"):
+    """PDF de una cotización (bytes)."""
+    pdf = PlantillaCIR()
+    pdf.add_page()
+
+    # --- INFO CLIENTE Y DOCUMENTO ---
+    pdf.set_font("Helvetica", "B", 10)
+    nombre_cli = str(cliente_info.get('nombre', 'CLIENTE GENERAL')).upper()
+    pdf.cell(100, 6, f"CLIENTE: {nombre_cli}", 0)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 6, tipo, 0, 1, "R")
+
+    pdf.set_font("Helvetica", "", 10)
+    ident = cliente_info.get('identificacion', 'N/A')
+    pdf.cell(100, 6, f"ID/RUC: {ident}", 0)
+    # Las cotizaciones anteriores al contador no tienen número propio: usamos su id
+    num_cot = formatear_folio(datos.get('anio') or datetime.now().year, datos.get('numero') or datos.get('id', 0))
+    pdf.cell(0, 6, f"NÚMERO: {num_cot}", 0, 1, "R")
+    pdf.ln(8)
+
+    # --- TABLA DE ITEMS ---
+    _tabla_items(pdf, datos.get('detalles', []), 20)
+
+    # --- TOTALES ---
+    pdf.ln(5)
+    pdf.set_x(130)
+    total = float(datos.get('total', 0) or 0)
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.cell(30, 7, "TOTAL:", 0)
+    pdf.cell(35, 7, f"${total:.2f}", 0, 1, "R")
+
+    return bytes(pdf.output())
+
+
+def renderizar(trabajo):
+    """Punto de entrada de los procesos de exportación: (tipo, datos, cliente) -> bytes."""
+    tipo, datos, cliente = trabajo
+    if tipo == "ventas":
+        return renderizar_factura(datos, cliente)
+    return renderizar_cotizacion(datos, cliente)
+
+
+def latin1(texto):
+    """Las fuentes base del PDF solo cubren Latin-1: lo demás se reemplaza por '?'."""
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
+
+
+# Columnas del reporte de inventario: (título, ancho en mm, alineación)
+COLUMNAS_INVENTARIO = [
+    ("Barcode", 35, "L"), ("Ref.", 28, "L"), ("Producto", 90, "L"), ("Stock", 18, "C"),
+    ("Costo", 22, "R"), ("Precio", 22, "R"), ("Valor costo", 30, "R"), ("Valor venta", 30, "R"),
+]
+ALTO_FILA = 5
+# Ancho del carácter más ancho de Helvetica (en milésimas del tamaño de la fuente)
+ANCHO_MAX_CARACTER = 1015
+
+
+class HojaInventario(PlantillaCIR):
+    """
+    Reporte de inventario apaisado: en cada página se repiten el membrete y el
+    encabezado de la tabla, y el pie lleva la valorización de esa página.
+    """
+
+    def __init__(self, subtitulo=""):
+        super().__init__(orientacion="L")
+        self.subtitulo = subtitulo
+        self.fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
+        self.pagina = {"costo": 0.0, "venta": 0.0, "filas": 0}
+        self.total = {"costo": 0.0, "venta": 0.0, "filas": 0, "unidades": 0}
+
+    def header(self):
+        # Membrete completo en la primera página; en las demás, una línea para dejar lugar a la tabla
+        if self.page_no() == 1:
+            super().header()
+            self.set_font("Helvetica", "B", 12)
+            self.cell(0, 6, "REPORTE DE INVENTARIO", new_x="LMARGIN", new_y="NEXT", align="C")
+            self.set_font("Helvetica", "", 9)
+            self.cell(0, 5, latin1(f"Fecha: {self.fecha}  {self.subtitulo}".strip()), new_x="LMARGIN", new_y="NEXT", align="C")
+        else:
+            self.set_font("Helvetica", "B", 9)
+            self._linea(latin1(f"CIR PANAMÁ - REPORTE DE INVENTARIO - {self.fecha}  {self.subtitulo}".strip()), 6)
+        self.ln(3)
+        self.set_font("Helvetica", "B", 9)
+        self._celdas([(titulo, ancho, "C") for titulo, ancho, _ in COLUMNAS_INVENTARIO], 7, relleno=True)
+        self.set_font("Helvetica", "", 8)
+        self.pagina = {"costo": 0.0, "venta": 0.0, "filas": 0}
+
+    def footer(self):
+        self.set_y(-14)
+        self.set_font("Helvetica", "I", 8)
+        self._linea(f"Productos en la página: {self.pagina['filas']} | Valor costo: ${self.pagina['costo']:,.2f}"
+                    f" | Valor venta: ${self.pagina['venta']:,.2f}", 5, avanzar=False)
+        # cell() para que fpdf reemplace {nb} por el total de páginas al cerrar
+        self.cell(0, 5, f"Página {self.page_no()}/{{nb}}", align="R")
+
+    # --- Escritura directa al contenido de la página ---
+    # Con decenas de miles de productos, cell() domina el tiempo del reporte: las filas,
+    # el encabezado de la tabla y el pie se escriben como operadores PDF (texto y bordes).
+    # Usa partes internas de fpdf2 (_out, _set_font_for_page, current_font_is_set_on_page,
+    # current_font.cw); por eso requirements.txt fija fpdf2 a 2.8.x, la versión probada.
+
+    def _ancho(self, texto):
+        # Ancho con la tabla de la fuente base (get_string_width es ~50 veces más lento);
+        # el texto ya pasó por latin1(), así que todos sus caracteres están en la tabla
+        return sum(map(self.current_font.cw.__getitem__, texto)) * self.font_size / 1000
+
+    def _recortar(self, texto, ancho):
+        disponible = ancho - 2 * self.c_margin
+        if len(texto) * ANCHO_MAX_CARACTER * self.font_size / 1000 <= disponible:
+            return texto
+        while texto and self._ancho(texto) > disponible:
+            texto = texto[:-1]
+        return texto
+
+    def _fuente_en_pagina(self):
+        # Lo mismo que hace fpdf antes de escribir texto: declarar la fuente en la página
+        if not self.current_font_is_set_on_page:
+            self._out(self._set_font_for_page(self.current_font, self.font_size_pt))
+
+    def _texto(self, x, ancho, alto, texto, alineacion):
+        """Operadores para escribir el texto dentro de la celda que empieza en x (fila actual)."""
+        texto = self._recortar(texto, ancho)
+        if alineacion == "L":
+            tx = x + self.c_margin
+        elif alineacion == "R":
+            tx = x + ancho - self.c_margin - self._ancho(texto)
+        else:
+            tx = x + (ancho - self._ancho(texto)) / 2
+        base = (self.h - (self.y + alto / 2 + 0.3 * self.font_size)) * self.k
+        texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        return f"BT {tx * self.k:.2f} {base:.2f} Td ({texto}) Tj ET"
+
+    def _celdas(self, celdas, alto, relleno=False):
+        """Una fila de celdas con borde: celdas = [(texto, ancho, alineación), ...]."""
+        self._fuente_en_pagina()
+        k, y = self.k, (self.h - self.y) * self.k
+        x = self.l_margin
+        operaciones = ["0.902 g"] if relleno else []
+        for texto, ancho, alineacion in celdas:
+            operaciones.append(f"{x * k:.2f} {y:.2f} {ancho * k:.2f} {-alto * k:.2f} re {'B' if relleno else 'S'}")
+            if relleno:
+                operaciones.append("0 g")
+            operaciones.append(self._texto(x, ancho, alto, texto, alineacion))
+            if relleno:
+                operaciones.append("0.902 g")
+            x += ancho
+        if relleno:
+            operaciones.append("0 g")
+        self._out(" ".join(operaciones))
+        self.y += alto
+
+    def _linea(self, texto, alto, alineacion="L", avanzar=True):
+        self._fuente_en_pagina()
+        self._out(self._texto(self.l_margin, self.epw, alto, texto, alineacion))
+        if avanzar:
+            self.y += alto
+
+    def fila(self, barcode, referencia, nombre, stock, costo, venta):
+        valor_costo, valor_venta = stock * costo, stock * venta
+        # Saltamos antes de escribir la fila: así sus importes suman en la página donde queda
+        if self.will_page_break(ALTO_FILA):
+            self.add_page()
+        valores = [latin1(barcode or "S/B"), latin1(referencia or "S/R"), latin1(nombre or "N/A"), str(stock),
+                   f"${costo:,.2f}", f"${venta:,.2f}", f"${valor_costo:,.2f}", f"${valor_venta:,.2f}"]
+        self._celdas([(valor, ancho, alineacion) for valor, (_, ancho, alineacion) in zip(valores, COLUMNAS_INVENTARIO)],
+                     ALTO_FILA)
+
+        for acumulado in (self.pagina, self.total):
+            acumulado["costo"] += valor_costo
+            acumulado["venta"] += valor_venta
+            acumulado["filas"] += 1
+        self.total["unidades"] += stock
+
+    def cierre(self):
+        """Totales generales al final del reporte."""
+        if self.will_page_break(20):
+            self.add_page()
+        self.ln(4)
+        self.set_font("Helvetica", "B", 10)
+        self.cell(0, 6, f"TOTAL: {self.total['filas']} productos, {self.total['unidades']:,} unidades",
+                  new_x="LMARGIN", new_y="NEXT", align="R")
+        self.cell(0, 6, f"Valorización al costo: ${self.total['costo']:,.2f}   |   "
+                        f"Valorización a precio de venta: ${self.total['venta']:,.2f}",
+                  new_x="LMARGIN", new_y="NEXT", align="R")
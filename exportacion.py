@@ -0,0 +1,148 @@
+# exportacion.py (Exportación por lote de facturas y cotizaciones en PDF)
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import ajustes
+from documentos import preparar_plantilla, renderizar
+from folios import folio_documento
+
+# Tipo de documento -> (tabla, columnas que se imprimen)
+TIPOS = {
+    "ventas": ("ventas", ["id", "num_fact", "anio", "fecha", "cliente", "detalle", "detalles",
+                          "subtotal", "descuento", "itbms", "flete", "total"]),
+    "cotizaciones": ("cotizaciones", ["id", "numero", "anio", "fecha", "cliente", "detalles", "total"]),
+}
+
+
+def formatos_disponibles():
+    disponibles = ["zip"]
+    try:
+        import pypdf  # noqa: F401
+        disponibles.append("pdf")
+    except ImportError:
+        pass
+    return disponibles
+
+
+def nombre_documento(tipo, datos):
+    if tipo == "ventas":
+        return f"Factura_{folio_documento(datos)}.pdf"
+    return f"Cotizacion_{folio_documento(datos, 'numero')}.pdf"
+
+
+class ExportadorDocumentos:
+    """
+    Genera en paralelo los PDF de un rango de fechas. Cada proceso del pool carga
+    el membrete y el logo una sola vez (preparar_plantilla) y los reutiliza en
+    todos sus documentos; el proceso principal solo lee páginas de la base y va
+    escribiendo los resultados al archivo en disco.
+    """
+
+    def __init__(self, db, procesos=None, tam_pagina=200, directorio=None):
+        self.db = db
+        self.procesos = procesos or ajustes.leer("EXPORT_PROCESOS") or os.cpu_count() or 1
+        self.tam_pagina = tam_pagina
+        self.directorio = directorio or ajustes.leer("DIR_EXPORTACIONES")
+        self._clientes = {}
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _filtros(self, desde, hasta):
+        # "fecha" puede ser fecha o fecha-hora: el límite superior es el día siguiente
+        return {"fecha": [("gte", str(desde)), ("lt", str(hasta + timedelta(days=1)))]}
+
+    def contar(self, tipo, desde, hasta):
+        tabla, _ = TIPOS[tipo]
+        return self.db.contar(tabla, filters=self._filtros(desde, hasta), fresh=True)
+
+    def _completar_clientes(self, documentos):
+        """Trae en una sola consulta los clientes de la página que aún no conocemos."""
+        faltan = {d.get("cliente") for d in documentos if d.get("cliente")} - set(self._clientes)
+        if faltan:
+            for c in self.db.fetch("clientes", filters={"nombre": ("in", sorted(faltan))},
+                                   columnas=["nombre", "identificacion"]):
+                self._clientes.setdefault(c["nombre"], c)
+            for nombre in faltan:
+                self._clientes.setdefault(nombre, {"nombre": nombre})
+
+    def _paginas(self, tipo, desde, hasta):
+        tabla, columnas = TIPOS[tipo]
+        pagina = []
+        for fila in self.db.iter_rows(tabla, filters=self._filtros(desde, hasta), tam_pagina=self.tam_pagina):
+            pagina.append({k: fila.get(k) for k in columnas})
+            if len(pagina) >= self.tam_pagina:
+                yield pagina
+                pagina = []
+        if pagina:
+            yield pagina
+
+    def _documentos(self, tipo, desde, hasta, pool):
+        """Entrega (nombre, pdf) en orden, renderizando cada página en el pool."""
+        for pagina in self._paginas(tipo, desde, hasta):
+            self._completar_clientes(pagina)
+            trabajos = [(tipo, d, self._clientes.get(d.get("cliente"), {"nombre": d.get("cliente")})) for d in pagina]
+            lote = max(1, len(trabajos) // (self.procesos * 4))
+            for datos, pdf in zip(pagina, pool.map(renderizar, trabajos, chunksize=lote)):
+                yield nombre_documento(tipo, datos), pdf
+
+    def exportar(self, tipo, desde, hasta, formato="zip", progreso=None):
+        """
+        Genera el archivo y devuelve (ruta, estadisticas).
+        formato "zip" guarda un PDF por documento; "pdf" los une en uno solo (requiere pypdf).
+        progreso(fraccion, texto) se llama al terminar cada documento.
+        """
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de documento no soportado: {tipo}")
+        if formato not in formatos_disponibles():
+            raise RuntimeError("Unir en un solo PDF requiere el paquete pypdf")
+
+        total = self.contar(tipo, desde, hasta)
+        base = f"{tipo.upper()}_{desde:%Y%m%d}_{hasta:%Y%m%d}"
+        ruta = os.path.join(self.directorio, f"{base}.{formato}")
+        temporal = ruta + ".tmp"
+        estadisticas = {"documentos": 0, "bytes": 0, "procesos": self.procesos}
+        inicio = time.perf_counter()
+
+        try:
+            self._escribir(tipo, desde, hasta, formato, temporal, total, estadisticas, progreso)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        os.replace(temporal, ruta)
+
+        estadisticas["segundos"] = round(time.perf_counter() - inicio, 2)
+        estadisticas["docs_por_seg"] = round(estadisticas["documentos"] / max(estadisticas["segundos"], 0.001), 1)
+        return ruta, estadisticas
+
+    def _escribir(self, tipo, desde, hasta, formato, temporal, total, estadisticas, progreso):
+        # spawn: Streamlit corre con varios hilos y fork podría copiar un lock tomado
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.procesos, mp_context=contexto,
+                                 initializer=preparar_plantilla) as pool:
+            if formato == "zip":
+                # Los PDF ya vienen comprimidos: ZIP_STORED evita gastar CPU en recomprimirlos
+                with zipfile.ZipFile(temporal, "w", compression=zipfile.ZIP_STORED) as archivo:
+                    for nombre, pdf in self._documentos(tipo, desde, hasta, pool):
+                        archivo.writestr(nombre, pdf)
+                        self._avance(estadisticas, pdf, total, progreso)
+            else:
+                from pypdf import PdfWriter
+                unido = PdfWriter()
+                for nombre, pdf in self._documentos(tipo, desde, hasta, pool):
+                    unido.append(io.BytesIO(pdf), outline_item=nombre[:-4])
+                    self._avance(estadisticas, pdf, total, progreso)
+                with open(temporal, "wb") as f:
+                    unido.write(f)
+
+    @staticmethod
+    def _avance(estadisticas, pdf, total, progreso):
+        estadisticas["documentos"] += 1
+        estadisticas["bytes"] += len(pdf)
+        if progreso:
+            hechos = estadisticas["documentos"]
+            progreso(min(hechos / max(total, 1), 1.0), f"{hechos} de {total} documentos")
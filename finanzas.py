@@ -0,0 +1,62 @@
+# finanzas.py (Resumen financiero diario para el tablero de Contabilidad)
+from datetime import date, timedelta
+
+import pandas as pd
+
+TABLA_RESUMEN = "resumen_diario"
+COLUMNAS_IMPORTE = ["ingresos", "itbms", "descuentos", "fletes", "num_ventas",
+                    "gastos", "depositos", "recibos_total"]
+
+
+class ResumenFinanciero:
+    """
+    Lee la tabla resumen_diario (una fila por día) en vez de sumar todas las
+    ventas y gastos: el costo depende de los días del rango, no de los movimientos.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def rango(self, desde, hasta):
+        """DataFrame con una fila por día del rango (los días sin movimiento en cero)."""
+        filas = self.db.fetch(TABLA_RESUMEN, filters={"dia": [("gte", str(desde)), ("lte", str(hasta))]}, orden="dia")
+        dias = pd.Index(pd.date_range(desde, hasta, freq="D").date, name="dia")
+        if not filas:
+            df = pd.DataFrame(0.0, index=dias, columns=COLUMNAS_IMPORTE)
+            df["recibos"] = [{} for _ in range(len(df))]
+            return df
+
+        df = pd.DataFrame(filas)
+        df["dia"] = pd.to_datetime(df["dia"]).dt.date
+        df = df.set_index("dia")
+        df[COLUMNAS_IMPORTE] = df[COLUMNAS_IMPORTE].apply(pd.to_numeric, errors="coerce")
+        df = df.reindex(dias)
+        df[COLUMNAS_IMPORTE] = df[COLUMNAS_IMPORTE].fillna(0)
+        df["recibos"] = df["recibos"].apply(lambda x: x if isinstance(x, dict) else {})
+        return df
+
+    @staticmethod
+    def totales(df):
+        tot = {c: float(df[c].sum()) for c in COLUMNAS_IMPORTE}
+        tot["utilidad"] = tot["ingresos"] - tot["gastos"]
+        metodos = pd.DataFrame(list(df["recibos"])).fillna(0)
+        tot["recibos_por_metodo"] = {k: float(v) for k, v in metodos.sum().items()} if not metodos.empty else {}
+        return tot
+
+    def comparar(self, desde, hasta):
+        """Totales del rango y del período anterior de igual duración: (actual, anterior, df_actual)."""
+        duracion = (hasta - desde).days + 1
+        previo_hasta = desde - timedelta(days=1)
+        previo_desde = previo_hasta - timedelta(days=duracion - 1)
+        actual = self.rango(desde, hasta)
+        anterior = self.rango(previo_desde, previo_hasta)
+        return self.totales(actual), self.totales(anterior), actual
+
+    def reconstruir(self):
+        """Recalcula el resumen desde cero en el servidor; devuelve cuántos días quedaron."""
+        return self.db.rpc("reconstruir_resumen_diario", invalida=[TABLA_RESUMEN])
+
+
+def inicio_de_mes(hoy=None):
+    hoy = hoy or date.today()
+    return hoy.replace(day=1)
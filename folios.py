@@ -0,0 +1,19 @@
+# folios.py (Numeración de documentos AAAA-NNN por tipo y año)
+from datetime import datetime
+
+TIPO_VENTA = "venta"
+TIPO_COTIZACION = "cotizacion"
+
+
+def formatear_folio(anio, numero):
+    """Formato impreso en facturas y cotizaciones: 2025-007"""
+    return f"{anio}-{int(numero or 0):03d}"
+
+
+def folio_documento(datos, campo="num_fact"):
+    """
+    Folio impreso de una fila de ventas (campo num_fact) o cotizaciones (numero): su año,
+    o el de su fecha; sin número, el id.
+    """
+    anio = datos.get("anio") or str(datos.get("fecha") or "")[:4] or datetime.now().year
+    return formatear_folio(int(anio), datos.get(campo) or datos.get("id"))
@@ -0,0 +1,121 @@
+# importacion.py (Carga masiva de inventario desde la plantilla Excel)
+import pandas as pd
+
+COLUMNAS_PLANTILLA = ["barcode", "nombre", "referencia", "stock", "precio_costo", "p5", "p10"]
+# Columnas que se aceptan si vienen en el archivo, aunque la plantilla no las trae
+COLUMNAS_OPCIONALES = ["p7", "stock_minimo", "precio_venta"]
+COLUMNAS_NUMERICAS = ["stock", "precio_costo", "p5", "p7", "p10", "stock_minimo", "precio_venta"]
+COLUMNAS_ENTERAS = ["stock", "stock_minimo"]
+
+
+def _texto(serie):
+    """Normaliza códigos: Excel entrega 7501234 como 7501234.0 si la celda es numérica."""
+    return (serie.astype("string")
+            .str.strip()
+            .str.replace(r"\.0$", "", regex=True)
+            .fillna(""))
+
+
+class ImportadorInventario:
+    """
+    Valida la plantilla con operaciones de pandas sobre columnas completas (sin
+    recorrer fila por fila) y la envía por lotes como UPSERT por barcode: si el
+    producto existe se actualiza, si no se crea. Volver a importar el mismo
+    archivo es seguro.
+    """
+
+    def __init__(self, db, tabla="productos", tam_lote=500):
+        self.db = db
+        self.tabla = tabla
+        self.tam_lote = tam_lote
+
+    def validar(self, df):
+        """
+        Devuelve (validos, errores). errores trae una fila por problema con el
+        número de fila del Excel (la fila 1 es el encabezado).
+        """
+        df = df.rename(columns=lambda c: str(c).strip().lower())
+        faltantes = [c for c in COLUMNAS_PLANTILLA if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas de la plantilla: {', '.join(faltantes)}")
+
+        columnas = COLUMNAS_PLANTILLA + [c for c in COLUMNAS_OPCIONALES if c in df.columns]
+        datos = df[columnas].copy()
+        datos = datos.dropna(how="all")
+        datos["barcode"] = _texto(datos["barcode"])
+        datos["referencia"] = _texto(datos["referencia"])
+        datos["nombre"] = datos["nombre"].astype("string").str.strip().fillna("")
+
+        problemas = []
+        for col in [c for c in COLUMNAS_NUMERICAS if c in datos.columns]:
+            numeros = pd.to_numeric(datos[col], errors="coerce")
+            problemas.append((datos[col].notna() & numeros.isna(), f"{col}: no es un número"))
+            problemas.append((numeros < 0, f"{col}: no puede ser negativo"))
+            if col in COLUMNAS_ENTERAS:
+                problemas.append((numeros.notna() & (numeros % 1 != 0), f"{col}: debe ser un número entero"))
+            datos[col] = numeros
+
+        problemas.append((datos["barcode"] == "", "barcode: vacío"))
+        problemas.append((datos["nombre"] == "", "nombre: vacío"))
+        problemas.append(((datos["barcode"] != "") & datos["barcode"].duplicated(keep=False),
+                          "barcode: repetido en el archivo"))
+
+        errores = [
+            pd.DataFrame({"fila": datos.index[mascara.to_numpy()] + 2, "barcode": datos.loc[mascara, "barcode"], "error": mensaje})
+            for mascara, mensaje in problemas if mascara.any()
+        ]
+        errores = (pd.concat(errores, ignore_index=True).sort_values("fila", kind="stable")
+                   if errores else pd.DataFrame(columns=["fila", "barcode", "error"]))
+
+        validos = datos.drop(index=errores["fila"].unique() - 2)
+        validos["stock"] = validos["stock"].fillna(0)
+        for col in [c for c in COLUMNAS_ENTERAS if c in validos.columns]:
+            validos[col] = validos[col].astype("Int64")
+        return validos, errores
+
+    @staticmethod
+    def a_registros(df):
+        """DataFrame -> lista de dicts serializables a JSON (NaN como None, enteros nativos)."""
+        df = df.astype(object).where(df.notna(), None)
+        registros = df.to_dict(orient="records")
+        for reg in registros:
+            for k, v in reg.items():
+                if hasattr(v, "item"):
+                    reg[k] = v.item()
+            reg["referencia"] = reg.get("referencia") or None
+        return registros
+
+    def existentes(self, barcodes):
+        """Cuántos de estos barcodes ya están en la base (consulta por lotes con IN)."""
+        total = 0
+        for i in range(0, len(barcodes), self.tam_lote):
+            lote = barcodes[i:i + self.tam_lote]
+            total += len(self.db.fetch(self.tabla, filters={"barcode": ("in", lote)}, columnas=["barcode"]))
+        return total
+
+    def importar(self, validos, dry_run=False, progreso=None):
+        """
+        Envía las filas válidas por lotes de tam_lote. progreso(fraccion, texto) se
+        llama después de cada lote. En dry_run no se escribe nada: solo se informa
+        cuántos productos serían nuevos y cuántos se actualizarían.
+        """
+        registros = self.a_registros(validos)
+        total = len(registros)
+        existentes = self.existentes([r["barcode"] for r in registros])
+        resumen = {"total": total, "nuevos": total - existentes, "actualizados": existentes,
+                   "guardados": 0, "lotes_fallidos": []}
+        if dry_run:
+            return resumen
+
+        for i in range(0, total, self.tam_lote):
+            lote = registros[i:i + self.tam_lote]
+            try:
+                self.db.upsert(self.tabla, lote, on_conflict="barcode")
+                resumen["guardados"] += len(lote)
+            except Exception as e:
+                resumen["lotes_fallidos"].append({"desde": lote[0]["barcode"], "hasta": lote[-1]["barcode"],
+                                                  "filas": len(lote), "error": str(e)})
+            if progreso:
+                hechos = min(i + self.tam_lote, total)
+                progreso(hechos / total, f"Importando {hechos} de {total}...")
+        return resumen
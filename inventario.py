@@ -1,48 +1,38 @@
+import os
 import streamlit as st
-import pandas as pd
-import streamlit.components.v1 as components
+from busqueda import indice_productos
+from reporte_inventario import ReporteInventario
+import auditoria
+
+# Fichas que se dibujan por búsqueda: el resto se alcanza afinando la consulta
+LIMITE_RESULTADOS = 50
 
 class ModuloInventario:
     def __init__(self, db):
         self.db = db
 
-    def generar_pdf_inventario(self, datos):
-        """Genera HTML para impresión (Reporte de Inventario)"""
-        fecha_actual = pd.Timestamp.now().strftime("%d/%m/%Y %H:%M")
-        filas = ""
-        for p in datos:
-            actual = int(p.get('stock') or 0) 
-            precio = float(p.get('precio_venta') or 0)
-            filas += f"""
-            <tr>
-                <td style="border: 1px solid #ddd; padding: 8px;">{p.get('barcode', 'S/B')}</td>
-                <td style="border: 1px solid #ddd; padding: 8px;">{p.get('referencia', 'S/R')}</td>
-                <td style="border: 1px solid #ddd; padding: 8px;">{p.get('nombre', 'N/A')}</td>
-                <td style="border: 1px solid #ddd; padding: 8px; text-align: center;">{actual}</td>
-                <td style="border: 1px solid #ddd; padding: 8px; text-align: right;">${precio:,.2f}</td>
-            </tr>
-            """
+    def vista_reporte(self):
+        """Reporte PDF paginado (con totales por página) generado en el servidor."""
+        with st.expander("🖨️ Reporte de Inventario"):
+            c1, c2 = st.columns(2)
+            solo_bajo = c1.checkbox("Solo productos con stock bajo (stock ≤ mínimo)", key="rep_bajo")
+            prefijo = c2.text_input("Referencia empieza con", key="rep_prefijo").strip()
+            if st.button("Generar PDF", type="primary", key="rep_generar"):
+                barra = st.progress(0.0, text="Leyendo productos...")
+                try:
+                    ruta, resumen = ReporteInventario(self.db).generar(
+                        solo_bajo, prefijo or None, progreso=lambda f, t: barra.progress(f, text=t))
+                    barra.progress(1.0, text="Listo")
+                    st.session_state.reporte_inv = ruta
+                    st.success(f"{resumen['filas']} productos en {resumen['paginas']} páginas ({resumen['segundos']} s). "
+                               f"Costo: ${resumen['costo']:,.2f} | Venta: ${resumen['venta']:,.2f}")
+                except Exception as e:
+                    st.error(f"No se pudo generar el reporte: {e}")
 
-        html = f"""
-        <div style="font-family: Arial, sans-serif; padding: 20px;">
-            <h2 style="text-align: center; color: #004A99; border-bottom: 2px solid #004A99;">CIR PANAMÁ - REPORTE DE INVENTARIO</h2>
-            <p style="text-align: center;">Fecha: {fecha_actual}</p>
-            <table style="width: 100%; border-collapse: collapse; margin-top: 10px;">
-                <thead style="background: #f2f2f2;">
-                    <tr>
-                        <th style="border: 1px solid #ddd; padding: 8px;">Barcode</th>
-                        <th style="border: 1px solid #ddd; padding: 8px;">Ref.</th>
-                        <th style="border: 1px solid #ddd; padding: 8px;">Producto</th>
-                        <th style="border: 1px solid #ddd; padding: 8px;">Stock</th>
-                        <th style="border: 1px solid #ddd; padding: 8px;">Precio</th>
-                    </tr>
-                </thead>
-                <tbody>{filas}</tbody>
-            </table>
-        </div>
-        <script>window.print();</script>
-        """
-        return html
+            ruta = st.session_state.get("reporte_inv")
+            if ruta and os.path.exists(ruta):
+                with open(ruta, "rb") as f:
+                    st.download_button("📥 Descargar reporte", f, os.path.basename(ruta), "application/pdf", key="rep_descargar")
 
     def render(self):
         st.header("📦 Inventario CIR")
@@ -71,7 +61,7 @@ class ModuloInventario:
                     if nombre and costo_input > 0:
                         nuevo_p = {
                             "nombre": nombre,
-                            "barcode": barcode_val,
+                            "barcode": barcode_val.strip() or None,
                             "referencia": referencia_val,
                             "precio_costo": costo_input,
                             "stock": stock,
@@ -79,63 +69,54 @@ class ModuloInventario:
                             "precio_venta": p10
                         }
                         self.db.insert("productos", nuevo_p)
+                        auditoria.registrar("Creación", "Inventario", f"Producto: {nombre} (stock inicial {stock})")
                         st.success(f"✅ {nombre} guardado exitosamente.")
                         st.rerun()
                     else:
                         st.warning("⚠️ El nombre y el costo son obligatorios.")
 
         # --- BUSCADOR ---
-        productos = self.db.fetch("productos")
-        
-        col_bus, col_print = st.columns([3, 1])
-        with col_print:
-            if st.button("🖨️ Reporte", use_container_width=True, type="primary"):
-                if productos:
-                    st.session_state.print_inv = self.generar_pdf_inventario(productos)
+        # El catálogo vive indexado en memoria: cada tecla es una consulta al índice, no a la base
+        indice = indice_productos(self.db)
+
+        self.vista_reporte()
 
-        query = col_bus.text_input("🔍 Buscar por Nombre, Barcode o Referencia...").lower()
+        query = st.text_input("🔍 Buscar por Nombre, Barcode o Referencia...")
+        resultados = indice.buscar(query, limite=LIMITE_RESULTADOS)
 
         # --- LISTADO TIPO FICHA ---
-        if productos:
+        if resultados:
             st.divider()
-            for p in productos:
-                # Lógica de búsqueda trilingüe
-                match = (query in str(p.get('nombre','')).lower() or 
-                         query in str(p.get('barcode','')).lower() or 
-                         query in str(p.get('referencia','')).lower())
-                
-                if match:
-                    # DISEÑO DE FICHA TÉCNICA
-                    with st.container(border=True):
-                        # Título y Botón Editar
-                        col_tit, col_edit = st.columns([4, 1])
-                        col_tit.subheader(f"📦 {p.get('nombre')}")
-                        with col_edit:
-                            st.button("📝 Editar", key=f"btn_edit_{p.get('id')}", use_container_width=True)
-
-                        # Cuerpo de la Ficha en 3 columnas
-                        c1, c2, c3 = st.columns(3)
-                        
-                        with c1:
-                            st.write("**🆔 Identificadores**")
-                            st.caption(f"Ref: `{p.get('referencia', 'N/A')}`")
-                            st.caption(f"Barcode: `{p.get('barcode', 'N/A')}`")
-                        
-                        with c2:
-                            actual = int(p.get('stock') or 0)
-                            minimo = int(p.get('stock_minimo') or 0)
-                            color = "green" if actual > minimo else "red"
-                            st.write("**📉 Existencias**")
-                            st.markdown(f"Stock: :{color}[**{actual} unidades**]")
-                            st.caption(f"Mínimo: {minimo}")
+            if len(resultados) == LIMITE_RESULTADOS:
+                st.caption(f"Mostrando los primeros {LIMITE_RESULTADOS} resultados de {len(indice)} productos. Afine la búsqueda para ver otros.")
+            for _, p in resultados:
+                # DISEÑO DE FICHA TÉCNICA
+                with st.container(border=True):
+                    # Título y Botón Editar
+                    col_tit, col_edit = st.columns([4, 1])
+                    col_tit.subheader(f"📦 {p.get('nombre')}")
+                    with col_edit:
+                        st.button("📝 Editar", key=f"btn_edit_{p.get('id')}", use_container_width=True)
 
-                        with c3:
-                            venta = float(p.get('precio_venta') or 0)
-                            costo = float(p.get('precio_costo') or 0)
-                            st.write("**💰 Valores**")
-                            st.write(f"Venta: **${venta:.2f}**")
-                            st.caption(f"Costo Ref: ${costo:.2f}")
+                    # Cuerpo de la Ficha en 3 columnas
+                    c1, c2, c3 = st.columns(3)
+                    
+                    with c1:
+                        st.write("**🆔 Identificadores**")
+                        st.caption(f"Ref: `{p.get('referencia', 'N/A')}`")
+                        st.caption(f"Barcode: `{p.get('barcode', 'N/A')}`")
+                    
+                    with c2:
+                        actual = int(p.get('stock') or 0)
+                        minimo = int(p.get('stock_minimo') or 0)
+                        color = "green" if actual > minimo else "red"
+                        st.write("**📉 Existencias**")
+                        st.markdown(f"Stock: :{color}[**{actual} unidades**]")
+                        st.caption(f"Mínimo: {minimo}")
 
-        if "print_inv" in st.session_state:
-            components.html(st.session_state.print_inv, height=0, width=0)
-            del st.session_state.print_inv
\ No newline at end of file
+                    with c3:
+                        venta = float(p.get('precio_venta') or 0)
+                        costo = float(p.get('precio_costo') or 0)
+                        st.write("**💰 Valores**")
+                        st.write(f"Venta: **${venta:.2f}**")
+                        st.caption(f"Costo Ref: ${costo:.2f}")
@@ -1,5 +1,10 @@
+import uuid
+
 import streamlit as st
-from database import DBManager
+import metricas
+import retencion
+from database import DBManager, replica_local
+from auth import ModuloAuth
 
 # 1. CONFIGURACIÓN DE PÁGINA (Debe ser SIEMPRE la primera instrucción de Streamlit)
 st.set_page_config(
@@ -32,9 +37,17 @@ from ventas import ModuloVentas
 from clientes import ModuloClientes
 from contabilidad import ModuloContabilidad
 from configuracion import ModuloConfiguracion
+from omnibox import ModuloOmnibox
 
 # Inicializar manejador de Base de Datos
-db = DBManager()
+try:
+    db = DBManager()
+except RuntimeError as e:
+    # Credenciales o backend sin configurar: no hay nada que mostrar sin base
+    st.error(str(e))
+    st.stop()
+# Retención de logs en segundo plano (solo si RETENCION_CADA_HORAS > 0)
+retencion.programar()
 
 # 4. INICIALIZACIÓN DE SESSION STATE (Gestión de sesión)
 if 'autenticado' not in st.session_state:
@@ -44,6 +57,12 @@ if 'user_data' not in st.session_state:
 if 'rol' not in st.session_state:
     st.session_state.rol = None
 
+# Cada ejecución del script es un rerun: las llamadas a la base se anotan con su número
+if 'id_sesion' not in st.session_state:
+    st.session_state.id_sesion = uuid.uuid4().hex[:8]
+st.session_state.rerun_n = st.session_state.get('rerun_n', 0) + 1
+metricas.contexto("Acceso", f"{st.session_state.id_sesion}#{st.session_state.rerun_n}")
+
 # --- LÓGICA DE INTERFAZ ---
 
 if not st.session_state.autenticado:
@@ -62,14 +81,15 @@ if not st.session_state.autenticado:
             submit = st.form_submit_button("Ingresar", use_container_width=True)
             
             if submit:
-                # Consulta a la tabla perfiles mediante el DBManager
-                res = db.fetch("perfiles")
-                user = next((u for u in res if u['usuario'] == usuario and u['clave'] == clave), None)
+                # Consulta un solo perfil por usuario y valida el hash de la clave
+                try:
+                    user = ModuloAuth(db).autenticar(usuario, clave)
+                except Exception:
+                    # get_user ya mostró el error de la base: no son credenciales incorrectas
+                    st.stop()
                 
                 if user:
-                    st.session_state.autenticado = True
-                    st.session_state.user_data = user
-                    st.session_state.rol = user.get('rol', 'usuario')
+                    ModuloAuth.iniciar_sesion(user)
                     st.rerun()
                 else:
                     st.error("Credenciales incorrectas o usuario no existe.")
@@ -93,7 +113,17 @@ else:
         if u_rol == "master_it":
             opciones.append("⚙️ Configuración")
             
-        choice = st.radio("Navegación", opciones)
+        choice = st.radio("Navegación", opciones, key="navegacion")
+
+        # Búsqueda global: cada resultado lleva a su pantalla con el registro como foco
+        st.divider()
+        metricas.contexto("Búsqueda global")
+        ModuloOmnibox(db).render(opciones)
+
+        # Antigüedad de los datos que se leen de la réplica local (si está activa)
+        replica = replica_local()
+        if replica:
+            st.caption(replica.resumen())
         
         st.divider()
         if st.button("🚪 Cerrar Sesión", use_container_width=True):
@@ -103,6 +133,7 @@ else:
             st.rerun()
 
     # --- ENRUTADOR DE MÓDULOS (Renderizado de contenido) ---
+    metricas.contexto(choice.split(" ", 1)[-1])
     if choice == "📦 Inventario":
         ModuloInventario(db).render()
     elif choice == "📄 Cotizaciones":
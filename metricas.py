@@ -0,0 +1,165 @@
+# metricas.py (Registro de las llamadas a la base: pantalla, rerun, duración y tamaño de cada una)
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+import ajustes
+
+_log = logging.getLogger("sge.consultas")
+_contexto = threading.local()
+
+# Orígenes que no salen del proceso: no cuentan para latencias ni tráfico del servidor
+LOCALES = ("cache", "replica")
+
+
+def contexto(modulo, rerun=None):
+    """
+    Pantalla (y rerun) a la que se atribuyen las llamadas siguientes de este hilo.
+    main.py lo fija al comienzo de cada ejecución del script; los hilos de fondo
+    (réplica) quedan como "Segundo plano".
+    """
+    _contexto.modulo = modulo
+    if rerun is not None:
+        _contexto.rerun = rerun
+
+
+def estimar_bytes(datos, muestra=20):
+    """
+    Tamaño aproximado en JSON de lo enviado o recibido. Serializa a lo sumo `muestra`
+    filas y extrapola: medir exacto 100.000 filas costaría más que la consulta.
+    """
+    if datos is None:
+        return 0
+    if isinstance(datos, dict):
+        datos = [datos]
+    if not isinstance(datos, list):
+        return len(str(datos))
+    if not datos:
+        return 2
+    parte = datos[:muestra]
+    return int(len(json.dumps(parte, ensure_ascii=False, default=str)) * len(datos) / len(parte))
+
+
+def describir_filtros(condiciones, largo=160):
+    """Condiciones (campo, operador, valor) como texto corto para las tablas del panel."""
+    texto = ", ".join(f"{campo} {operador} {valor!r}"[:50] for campo, operador, valor in condiciones or ())
+    return texto[:largo]
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100); None si no hay valores."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def _contar_filas(resultado):
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, int) and not isinstance(resultado, bool):
+        return resultado  # delete_where devuelve la cantidad
+    return 1 if resultado is not None else 0
+
+
+class RegistroConsultas:
+    """
+    Últimas max_eventos llamadas de todas las sesiones del proceso (memoria acotada).
+    Las que pasan de lenta_ms van además a una lista aparte que dura más y al log
+    "sge.consultas" como advertencia.
+    """
+
+    def __init__(self, max_eventos=5000, lenta_ms=500, max_lentas=200):
+        self.max_eventos = max_eventos
+        self.lenta_ms = lenta_ms
+        self._eventos = deque(maxlen=max_eventos)
+        self._lentas = deque(maxlen=max_lentas)
+        self._lock = threading.Lock()
+
+    def registrar(self, tabla, operacion, condiciones=(), resultado=None, enviado=None, segundos=0.0,
+                  origen="servidor", error=None):
+        evento = {
+            "momento": time.time(),
+            "modulo": getattr(_contexto, "modulo", "Segundo plano"),
+            "rerun": getattr(_contexto, "rerun", None),
+            "tabla": tabla,
+            "operacion": operacion,
+            "filtros": describir_filtros(condiciones),
+            "filas": _contar_filas(resultado),
+            "bytes": estimar_bytes(resultado) + estimar_bytes(enviado),
+            "ms": round(segundos * 1000, 2),
+            "origen": origen,
+            "error": str(error)[:200] if error else None,
+        }
+        lenta = origen not in LOCALES and evento["ms"] >= self.lenta_ms
+        with self._lock:
+            self._eventos.append(evento)
+            if lenta:
+                self._lentas.append(evento)
+        if lenta:
+            _log.warning("Consulta lenta (%.0f ms): %s %s [%s] filas=%s pantalla=%s",
+                         evento["ms"], operacion, tabla, evento["filtros"], evento["filas"], evento["modulo"])
+        return evento
+
+    def recientes(self, ventana_seg=None):
+        desde = time.time() - ventana_seg if ventana_seg else 0
+        with self._lock:
+            return [e for e in self._eventos if e["momento"] >= desde]
+
+    def lentas(self):
+        with self._lock:
+            return list(self._lentas)
+
+    def vaciar(self):
+        with self._lock:
+            self._eventos.clear()
+            self._lentas.clear()
+
+    @staticmethod
+    def por_modulo(eventos):
+        """Llamadas, reruns y latencias del servidor agrupadas por pantalla."""
+        grupos = {}
+        for e in eventos:
+            grupos.setdefault(e["modulo"], []).append(e)
+        filas = []
+        for modulo, lista in grupos.items():
+            servidor = [e for e in lista if e["origen"] not in LOCALES]
+            reruns = {e["rerun"] for e in lista if e["rerun"] is not None}
+            filas.append({
+                "pantalla": modulo,
+                "llamadas": len(lista),
+                "al servidor": len(servidor),
+                "por rerun": round(len(servidor) / len(reruns), 1) if reruns else None,
+                "p50 ms": percentil([e["ms"] for e in servidor], 50),
+                "p95 ms": percentil([e["ms"] for e in servidor], 95),
+                "MB del servidor": round(sum(e["bytes"] for e in servidor) / 1e6, 3),
+                "errores": sum(1 for e in lista if e["error"]),
+            })
+        return sorted(filas, key=lambda f: f["al servidor"], reverse=True)
+
+    @staticmethod
+    def mas_pesadas(eventos, n=15):
+        """Consultas al servidor repetidas (misma pantalla, tabla, operación y filtros) ordenadas por tiempo total."""
+        grupos = {}
+        for e in eventos:
+            if e["origen"] not in LOCALES:
+                grupos.setdefault((e["modulo"], e["tabla"], e["operacion"], e["filtros"]), []).append(e)
+        filas = [{
+            "pantalla": modulo, "tabla": tabla, "operación": operacion, "filtros": filtros,
+            "veces": len(lista),
+            "ms total": round(sum(e["ms"] for e in lista), 1),
+            "p95 ms": percentil([e["ms"] for e in lista], 95),
+            "filas máx": max(e["filas"] for e in lista),
+            "MB total": round(sum(e["bytes"] for e in lista) / 1e6, 3),
+        } for (modulo, tabla, operacion, filtros), lista in grupos.items()]
+        return sorted(filas, key=lambda f: f["ms total"], reverse=True)[:n]
+
+
+# Un solo registro por proceso, como la caché de lecturas
+REGISTRO = RegistroConsultas(
+    max_eventos=ajustes.leer("METRICAS_MAX_EVENTOS"),
+    lenta_ms=ajustes.leer("CONSULTA_LENTA_MS"),
+)
@@ -0,0 +1,69 @@
+import streamlit as st
+from busqueda import buscar_en_todo
+
+# A qué pantalla lleva cada tipo de resultado y cómo se muestra en la lista
+DESTINOS = {
+    "clientes": ("👥 Clientes", "👥 Clientes"),
+    "ventas": ("💰 Contabilidad", "🧾 Facturas"),
+    "cotizaciones": ("📄 Cotizaciones", "📄 Cotizaciones"),
+    "recibos": ("💰 Contabilidad", "💵 Recibos"),
+}
+
+
+def etiqueta(tabla, fila):
+    if tabla == "clientes":
+        return f"{fila.get('nombre')} · {fila.get('identificacion') or 'S/ID'}"
+    if tabla == "recibos":
+        return f"Recibo #{fila['id']} · {fila.get('cliente')} · ${float(fila.get('monto') or 0):,.2f}"
+    folio = fila.get('folio') or f"#{fila['id']}"
+    return f"{folio} · {fila.get('cliente')} · ${float(fila.get('total') or 0):,.2f}"
+
+
+def ir_a(opcion, tabla, fila):
+    """Callback de los resultados: cambia de pantalla y deja el registro como foco."""
+    st.session_state.navegacion = opcion
+    st.session_state.foco = {"tabla": tabla, "id": fila["id"], "fila": fila}
+
+
+def foco_actual(*tablas):
+    """Registro elegido en el buscador si es de una de estas tablas (sin consumirlo)."""
+    foco = st.session_state.get("foco")
+    return foco if foco and foco["tabla"] in tablas else None
+
+
+def soltar_foco():
+    st.session_state.pop("foco", None)
+
+
+def tomar_foco(*tablas):
+    """Devuelve (y consume) el registro elegido en el buscador si es de una de estas tablas."""
+    foco = foco_actual(*tablas)
+    if foco:
+        soltar_foco()
+    return foco
+
+
+class ModuloOmnibox:
+    """Buscador de la barra lateral sobre clientes, facturas, cotizaciones y recibos."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def render(self, opciones):
+        consulta = st.text_input("🔎 Buscar en todo", key="omnibox",
+                                 placeholder="Cliente, RUC, factura 2025-007...")
+        if not consulta.strip():
+            return
+
+        grupos = buscar_en_todo(self.db, consulta)
+        if not grupos:
+            st.caption("Sin resultados.")
+            return
+        for tabla, resultados in grupos.items():
+            opcion, titulo = DESTINOS[tabla]
+            if opcion not in opciones:
+                continue
+            st.caption(titulo)
+            for _, fila in resultados:
+                st.button(etiqueta(tabla, fila), key=f"omni_{tabla}_{fila['id']}", use_container_width=True,
+                          on_click=ir_a, args=(opcion, tabla, dict(fila)))
@@ -0,0 +1,183 @@
+# replica.py (Réplica local en SQLite de las tablas del negocio, sincronizada por deltas)
+import threading
+import time
+from datetime import datetime, timedelta
+
+from almacen_sqlite import AlmacenSQLite
+
+# Tablas replicadas y columnas con índice local (las que usan los filtros y órdenes de las pantallas).
+# perfiles (claves) y logs_sistema (solo crece, pantalla de administración) se leen siempre remotos.
+TABLAS_REPLICA = {
+    "productos": ["nombre", "barcode", "referencia", "stock", "updated_at"],
+    "clientes": ["nombre", "identificacion", "updated_at"],
+    "ventas": ["fecha", "cliente", "anio", "updated_at"],
+    "cotizaciones": ["estado", "fecha", "updated_at"],
+    "recibos": ["id_venta", "fecha", "updated_at"],
+    "gastos": ["fecha", "updated_at"],
+    "depositos": ["fecha", "updated_at"],
+}
+TABLA_ESTADO = "_replica_estado"
+# Solapamiento al pedir cambios por updated_at: cubre relojes y transacciones en vuelo
+MARGEN_DELTA = timedelta(seconds=5)
+
+
+class ReplicaLocal:
+    """
+    Copia en disco de las tablas del negocio. Un hilo de fondo trae de Supabase las
+    filas con updated_at posterior a la última marca de cada tabla (la primera vez,
+    la tabla completa) y cada reconciliar_seg compara los ids para quitar los
+    borrados. Las marcas se guardan en el mismo archivo: al reiniciar la app solo
+    se piden los cambios.
+
+    DBManager lee de aquí las tablas ya cargadas y sigue escribiendo en Supabase;
+    tras cada escritura aplica las filas devueltas y marca la tabla como pendiente,
+    y mientras lo está sus lecturas van al servidor hasta la siguiente sincronización.
+    """
+
+    def __init__(self, remoto, ruta, intervalo=15, reconciliar_seg=600, tablas=None, tam_pagina=1000):
+        self.remoto = remoto
+        self.almacen = AlmacenSQLite(ruta)
+        self.intervalo = intervalo
+        self.reconciliar_seg = reconciliar_seg
+        self.tablas = dict(tablas or TABLAS_REPLICA)
+        self.tam_pagina = tam_pagina
+        self.ultimo_error = None
+        self._estado = self._leer_estado()
+        self._reconciliado_en = {}
+        self._pendientes = set()
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+
+    # --- Estado persistente: marca y hora de la última sincronización por tabla ---
+
+    def _leer_estado(self):
+        conn = self.almacen.conn
+        with self.almacen._lock:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLA_ESTADO} (tabla PRIMARY KEY, marca, sincronizado_en REAL)")
+            filas = conn.execute(f"SELECT tabla, marca, sincronizado_en FROM {TABLA_ESTADO}").fetchall()
+        return {f["tabla"]: {"marca": f["marca"], "sincronizado_en": f["sincronizado_en"]} for f in filas}
+
+    def _guardar_estado(self, tabla, marca, sincronizado_en):
+        with self.almacen._lock, self.almacen.conn:
+            self.almacen.conn.execute(f"INSERT OR REPLACE INTO {TABLA_ESTADO} VALUES (?, ?, ?)",
+                                      (tabla, marca, sincronizado_en))
+        self._estado[tabla] = {"marca": marca, "sincronizado_en": sincronizado_en}
+
+    # --- Hilo de sincronización ---
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ciclo, name="replica-local", daemon=True)
+            self._hilo.start()
+
+    def _ciclo(self):
+        while True:
+            self.sincronizar()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def sincronizar(self):
+        """Una pasada sobre todas las tablas; un error en una no detiene las demás."""
+        errores = []
+        for tabla in self.tablas:
+            with self._lock:
+                self._pendientes.discard(tabla)
+            try:
+                self._sincronizar_tabla(tabla)
+            except Exception as e:
+                errores.append(f"{tabla}: {e}")
+        self.ultimo_error = "; ".join(errores) or None
+
+    def _sincronizar_tabla(self, tabla):
+        inicio = time.time()
+        marca = (self._estado.get(tabla) or {}).get("marca")
+        filtros = None
+        if marca:
+            desde = datetime.fromisoformat(marca) - MARGEN_DELTA
+            filtros = {"updated_at": ("gt", desde.isoformat())}
+
+        lote = []
+        for fila in self.remoto.iter_rows(tabla, filters=filtros, tam_pagina=self.tam_pagina, avisar=False):
+            lote.append(fila)
+            valor = fila.get("updated_at")
+            if valor and (marca is None or str(valor) > marca):
+                marca = str(valor)
+            if len(lote) >= self.tam_pagina:
+                self.almacen.upsert(tabla, lote)
+                lote = []
+        self.almacen.upsert(tabla, lote)
+
+        if tabla not in self._estado:
+            for columna in self.tablas[tabla]:
+                self.almacen.crear_indice(tabla, columna)
+            self._reconciliado_en[tabla] = inicio
+        elif inicio - self._reconciliado_en.get(tabla, 0) > self.reconciliar_seg:
+            self._reconciliar(tabla)
+            self._reconciliado_en[tabla] = inicio
+        # Una tabla vacía en el servidor también queda cargada (marca None, pero con estado)
+        self._guardar_estado(tabla, marca, inicio)
+
+    def _reconciliar(self, tabla):
+        """Los borrados no llegan por updated_at: se quitan los ids que ya no existen en el servidor."""
+        remotos = {f["id"] for f in self.remoto.iter_rows(tabla, columnas=["id"], tam_pagina=10000, avisar=False)}
+        self.almacen.borrar(tabla, self.almacen.ids(tabla) - remotos)
+
+    # --- Uso desde DBManager ---
+
+    def cargada(self, tabla):
+        return tabla in self.tablas and tabla in self._estado
+
+    def sirve(self, tabla):
+        """True si la tabla ya tiene su carga inicial y no espera cambios propios sin sincronizar."""
+        return self.cargada(tabla) and tabla not in self._pendientes
+
+    def consultar(self, tabla, condiciones=(), columnas=None, orden=None, limite=None):
+        return self.almacen.consultar(tabla, condiciones, columnas, orden, limite)
+
+    def pendiente(self, tabla):
+        """Una escritura tocó la tabla: se lee remota hasta que el hilo traiga los cambios."""
+        if self.cargada(tabla):
+            with self._lock:
+                self._pendientes.add(tabla)
+            self._despertar.set()
+
+    def aplicar(self, tabla, filas):
+        """Filas que devolvió el servidor tras insertar o actualizar."""
+        if self.cargada(tabla) and filas:
+            self.almacen.upsert(tabla, filas)
+
+    def borrar(self, tabla, id_fila):
+        if self.cargada(tabla):
+            self.almacen.borrar(tabla, [id_fila])
+
+    def antiguedad(self):
+        """
+        (segundos desde la sincronización más vieja, tablas sin carga inicial, último error).
+        Los segundos son None mientras ninguna tabla terminó su primera carga.
+        """
+        sincronizadas = [e["sincronizado_en"] for t, e in self._estado.items() if t in self.tablas]
+        sin_cargar = [t for t in self.tablas if t not in self._estado]
+        segundos = time.time() - min(sincronizadas) if sincronizadas else None
+        return segundos, sin_cargar, self.ultimo_error
+
+    def resumen(self):
+        """Texto corto para la barra lateral: qué tan vieja es la copia que se está leyendo."""
+        segundos, sin_cargar, error = self.antiguedad()
+        if segundos is None:
+            return "⏳ Copia local: cargando datos..."
+        if error:
+            return f"🟠 Sin conexión con el servidor: datos de hace {_duracion(segundos)}"
+        if sin_cargar:
+            return f"⏳ Copia local: cargando {', '.join(sin_cargar)}"
+        if segundos > 3 * self.intervalo:
+            return f"🟠 Copia local atrasada: {_duracion(segundos)}"
+        return f"🟢 Copia local al día (hace {_duracion(segundos)})"
+
+
+def _duracion(segundos):
+    if segundos < 60:
+        return f"{int(segundos)} s"
+    if segundos < 3600:
+        return f"{int(segundos // 60)} min"
+    return f"{segundos / 3600:.1f} h"
@@ -0,0 +1,266 @@
+# respaldo.py (Respaldo completo de la base de datos en memoria constante)
+import hashlib
+import json
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import xlsxwriter
+
+import ajustes
+
+TABLAS_RESPALDO = [
+    "productos", "clientes", "ventas", "cotizaciones", "recibos",
+    "gastos", "depositos", "perfiles", "logs_sistema",
+]
+FORMATOS = {
+    "xlsx": "Excel (.xlsx)",
+    "ndjson": "NDJSON comprimido (.zip)",
+    "parquet": "Parquet (.zip)",
+}
+# Límite de filas de una hoja de Excel (sin contar el encabezado)
+MAX_FILAS_XLSX = 1_048_575
+
+# Respaldos incrementales: columna mantenida por sql/005_updated_at.sql
+COLUMNA_MARCA = "updated_at"
+# Una transacción larga puede confirmar filas con updated_at anterior a la marca
+# ya guardada; volvemos a pedir este margen (las filas repetidas se sobrescriben al restaurar).
+# Cada delta lleva además los ids vivos de cada tabla para reproducir los borrados.
+MARGEN_MARCA = timedelta(minutes=5)
+ARCHIVO_ESTADO = "estado_incremental.json"
+
+
+def linea_json(fila):
+    """Forma canónica de una fila: la misma para el archivo y para la suma de verificación."""
+    return json.dumps(fila, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def formatos_disponibles():
+    disponibles = ["xlsx", "ndjson"]
+    try:
+        import pyarrow  # noqa: F401
+        disponibles.append("parquet")
+    except ImportError:
+        pass
+    return disponibles
+
+
+class MotorRespaldo:
+    """
+    Recorre cada tabla con DBManager.iter_rows y escribe página por página, así
+    la memoria depende del tamaño de página y no del tamaño de la tabla. Cada
+    respaldo trae un manifiesto con filas y SHA-256 por tabla, calculado sobre
+    la forma canónica de cada fila (linea_json) sin importar el formato.
+    """
+
+    def __init__(self, db, tablas=None, tam_pagina=1000, directorio=None, columna_marca=COLUMNA_MARCA):
+        self.db = db
+        self.tablas = tablas or TABLAS_RESPALDO
+        self.tam_pagina = tam_pagina
+        self.directorio = directorio or ajustes.leer("DIR_RESPALDOS")
+        self.columna_marca = columna_marca
+        os.makedirs(self.directorio, exist_ok=True)
+
+    # --- Estado de la cadena incremental (base completa + deltas) ---
+
+    @property
+    def ruta_estado(self):
+        return os.path.join(self.directorio, ARCHIVO_ESTADO)
+
+    def leer_estado(self):
+        """{"base": archivo, "cadena": [base, delta1, ...], "marcas": {tabla: updated_at máximo}} o None"""
+        if not os.path.exists(self.ruta_estado):
+            return None
+        with open(self.ruta_estado, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_estado(self, estado):
+        temporal = self.ruta_estado + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta_estado)
+
+    def _paginas(self, tabla, desde=None):
+        filtros = None
+        if desde:
+            inicio = datetime.fromisoformat(desde) - MARGEN_MARCA
+            filtros = {self.columna_marca: ("gt", inicio.isoformat())}
+        return self.db.iter_rows(tabla, filters=filtros, tam_pagina=self.tam_pagina, como_df=False)
+
+    def _filas(self, tabla, resumen, desde=None):
+        """Entrega las filas de la tabla y va llenando su entrada del manifiesto."""
+        suma = hashlib.sha256()
+        marca = desde
+        for fila in self._paginas(tabla, desde):
+            suma.update(linea_json(fila).encode("utf-8") + b"\n")
+            resumen["filas"] += 1
+            valor = fila.get(self.columna_marca)
+            if valor and (marca is None or str(valor) > marca):
+                marca = str(valor)
+            yield fila
+        resumen["sha256"] = suma.hexdigest()
+        resumen["marca"] = marca
+
+    def generar(self, formato="xlsx", progreso=None, nombre=None, incremental=False):
+        """
+        Genera el respaldo y devuelve (ruta, manifiesto).
+        progreso(fraccion, texto) se llama al terminar cada tabla.
+        Con incremental=True solo exporta lo creado o modificado desde el último
+        respaldo de la cadena (siempre en NDJSON, que es lo que lee restaurar.py).
+        Un respaldo completo NDJSON inicia una cadena nueva.
+        """
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de respaldo desconocido: {formato}")
+        if formato not in formatos_disponibles():
+            raise RuntimeError("El formato Parquet requiere el paquete pyarrow")
+
+        estado = self.leer_estado()
+        if incremental:
+            if formato != "ndjson":
+                raise ValueError("Los respaldos incrementales solo se generan en NDJSON")
+            if not estado:
+                raise RuntimeError("No hay respaldo base: genere primero un respaldo completo en NDJSON")
+
+        marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+        nombre = nombre or f"BACKUP_SGE_CIR_{marca}" + ("_INC" if incremental else "")
+        manifiesto = {
+            "creado": datetime.now().isoformat(timespec="seconds"),
+            "tipo": "incremental" if incremental else "completo",
+            "formato": formato,
+            "columna_marca": self.columna_marca,
+            "tablas": {},
+        }
+        if incremental:
+            manifiesto["base"] = estado["base"]
+            manifiesto["padre"] = estado["cadena"][-1]
+            manifiesto["desde"] = dict(estado["marcas"])
+
+        ruta = os.path.join(self.directorio, f"{nombre}.{'xlsx' if formato == 'xlsx' else 'zip'}")
+        try:
+            if formato == "xlsx":
+                self._escribir_xlsx(ruta, manifiesto, progreso)
+            else:
+                self._escribir_zip(ruta, formato, manifiesto, progreso)
+        except BaseException:
+            # Un respaldo a medias no debe quedar junto a los buenos ni confundir a restaurar.py
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            raise
+
+        # Solo avanzamos la cadena cuando el archivo quedó completo en disco
+        if formato == "ndjson":
+            archivo = os.path.basename(ruta)
+            marcas = {t: r["marca"] for t, r in manifiesto["tablas"].items() if r.get("marca")}
+            if incremental:
+                estado["cadena"].append(archivo)
+                estado["marcas"].update(marcas)
+            else:
+                estado = {"base": archivo, "cadena": [archivo], "marcas": marcas}
+            self._guardar_estado(estado)
+        return ruta, manifiesto
+
+    def _escribir_ids(self, archivo, tabla, nombre):
+        """Todos los ids de la tabla, uno por línea (JSON), leídos después de las filas del delta."""
+        suma, total = hashlib.sha256(), 0
+        with archivo.open(nombre, "w", force_zip64=True) as destino:
+            for fila in self.db.iter_rows(tabla, columnas=["id"], tam_pagina=10000):
+                linea = json.dumps(fila["id"]).encode("utf-8") + b"\n"
+                suma.update(linea)
+                destino.write(linea)
+                total += 1
+        return total, suma.hexdigest()
+
+    def _escribir_xlsx(self, ruta, manifiesto, progreso):
+        # constant_memory: xlsxwriter baja cada fila a disco al pasar a la siguiente
+        libro = xlsxwriter.Workbook(ruta, {"constant_memory": True, "strings_to_urls": False})
+        for n, tabla in enumerate(self.tablas, start=1):
+            resumen = manifiesto["tablas"].setdefault(tabla, {"filas": 0, "sha256": None, "hojas": []})
+            hoja, columnas, fila_hoja = None, None, 0
+            for fila in self._filas(tabla, resumen):
+                if hoja is None or fila_hoja > MAX_FILAS_XLSX:
+                    nombre_hoja = tabla[:28] if not resumen["hojas"] else f"{tabla[:26]}_{len(resumen['hojas']) + 1}"
+                    hoja = libro.add_worksheet(nombre_hoja)
+                    resumen["hojas"].append(nombre_hoja)
+                    columnas = columnas or list(fila.keys())
+                    hoja.write_row(0, 0, columnas)
+                    fila_hoja = 1
+                hoja.write_row(fila_hoja, 0, [_celda(fila.get(c)) for c in columnas])
+                fila_hoja += 1
+            if hoja is None:
+                libro.add_worksheet(tabla[:28])
+                resumen["hojas"].append(tabla[:28])
+            if progreso:
+                progreso(n / len(self.tablas), f"{tabla}: {resumen['filas']} filas")
+
+        hoja = libro.add_worksheet("_manifiesto")
+        hoja.write_row(0, 0, ["tabla", "filas", "sha256", "creado"])
+        for i, (tabla, resumen) in enumerate(manifiesto["tablas"].items(), start=1):
+            hoja.write_row(i, 0, [tabla, resumen["filas"], resumen["sha256"], manifiesto["creado"]])
+        libro.close()
+
+    def _escribir_zip(self, ruta, formato, manifiesto, progreso):
+        with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archivo:
+            for n, tabla in enumerate(self.tablas, start=1):
+                resumen = manifiesto["tablas"].setdefault(tabla, {"filas": 0, "sha256": None})
+                if formato == "ndjson":
+                    resumen["archivo"] = f"{tabla}.ndjson"
+                    desde = manifiesto.get("desde", {}).get(tabla)
+                    # ZipFile.open en modo "w" comprime mientras escribimos, sin armar el archivo en memoria
+                    with archivo.open(resumen["archivo"], "w", force_zip64=True) as destino:
+                        for fila in self._filas(tabla, resumen, desde):
+                            destino.write(linea_json(fila).encode("utf-8") + b"\n")
+                    if manifiesto["tipo"] == "incremental":
+                        # Los borrados no dejan updated_at: con los ids vivos restaurar.py quita los que faltan
+                        resumen["ids"] = f"{tabla}.ids"
+                        resumen["ids_total"], resumen["ids_sha256"] = self._escribir_ids(archivo, tabla, resumen["ids"])
+                else:
+                    resumen["archivo"] = f"{tabla}.parquet"
+                    temporal = ruta + f".{tabla}.parquet"
+                    try:
+                        _escribir_parquet(temporal, self._filas(tabla, resumen), self.tam_pagina)
+                        archivo.write(temporal, resumen["archivo"])
+                    finally:
+                        if os.path.exists(temporal):
+                            os.remove(temporal)
+                if progreso:
+                    progreso(n / len(self.tablas), f"{tabla}: {resumen['filas']} filas")
+            archivo.writestr("manifest.json", json.dumps(manifiesto, ensure_ascii=False, indent=2))
+
+
+def _celda(valor):
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return valor
+
+
+def _escribir_parquet(ruta, filas, tam_lote):
+    """Escribe por lotes de tam_lote filas; las columnas anidadas se guardan como JSON."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor, esquema, lote = None, None, []
+
+    def vaciar():
+        nonlocal escritor, esquema
+        if not lote:
+            return
+        filas_planas = [{k: _celda(v) for k, v in f.items()} for f in lote]
+        if esquema is None:
+            tabla = pa.Table.from_pylist(filas_planas)
+            # Columnas que vinieron vacías en el primer lote: texto, para aceptar lo que venga
+            esquema = pa.schema([pa.field(c.name, pa.string()) if pa.types.is_null(c.type) else c for c in tabla.schema])
+            escritor = pq.ParquetWriter(ruta, esquema, compression="zstd")
+        escritor.write_table(pa.Table.from_pylist(filas_planas, schema=esquema))
+        lote.clear()
+
+    try:
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= tam_lote:
+                vaciar()
+        vaciar()
+    finally:
+        if escritor is not None:
+            escritor.close()
+        else:
+            pq.write_table(pa.table({}), ruta)
@@ -0,0 +1,131 @@
+# restaurar.py (Restaura una cadena de respaldos NDJSON en una base SQLite local)
+#
+# Uso:
+#   python restaurar.py respaldos/ copia.sqlite            -> base + todos los incrementales de la cadena
+#   python restaurar.py base.zip inc1.zip inc2.zip copia.sqlite
+#
+# Verifica el SHA-256 de cada tabla contra el manifiesto antes de aplicar el archivo.
+# Los incrementales traen los ids vivos de cada tabla: las filas que ya no están se borran.
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zipfile
+
+from almacen_sqlite import AlmacenSQLite
+from respaldo import ARCHIVO_ESTADO
+
+
+class RespaldoCorrupto(Exception):
+    pass
+
+
+def cadena_desde_directorio(directorio):
+    """Lista de archivos de la cadena actual según estado_incremental.json."""
+    with open(os.path.join(directorio, ARCHIVO_ESTADO), encoding="utf-8") as f:
+        estado = json.load(f)
+    return [os.path.join(directorio, archivo) for archivo in estado["cadena"]]
+
+
+def leer_manifiesto(ruta):
+    with zipfile.ZipFile(ruta) as archivo:
+        return json.loads(archivo.read("manifest.json"))
+
+
+def _verificar(archivo, ruta, tabla, nombre, esperada):
+    suma = hashlib.sha256()
+    with archivo.open(nombre) as origen:
+        for bloque in iter(lambda: origen.read(1 << 20), b""):
+            suma.update(bloque)
+    if suma.hexdigest() != esperada:
+        raise RespaldoCorrupto(f"{ruta}: la suma de verificación de {nombre} ({tabla}) no coincide")
+
+
+def _ids(archivo, nombre):
+    with archivo.open(nombre) as origen:
+        return {json.loads(linea) for linea in origen if linea.strip()}
+
+
+def _lotes(archivo, nombre, tam_lote):
+    lote = []
+    with archivo.open(nombre) as origen:
+        for linea in origen:
+            lote.append(json.loads(linea))
+            if len(lote) >= tam_lote:
+                yield lote
+                lote = []
+    if lote:
+        yield lote
+
+
+def aplicar_respaldo(almacen, ruta, verificar=True, tam_lote=1000):
+    """
+    Aplica un archivo (completo o incremental) sobre el almacén. Devuelve el
+    manifiesto, las filas escritas y las borradas por tabla (solo incrementales).
+    """
+    aplicadas, borradas = {}, {}
+    with zipfile.ZipFile(ruta) as archivo:
+        manifiesto = json.loads(archivo.read("manifest.json"))
+        if manifiesto.get("formato") != "ndjson":
+            raise ValueError(f"{ruta}: solo se restauran respaldos NDJSON")
+        # Verificamos todo el archivo antes de escribir: uno dañado no se aplica a medias
+        if verificar:
+            for tabla, resumen in manifiesto["tablas"].items():
+                _verificar(archivo, ruta, tabla, resumen["archivo"], resumen["sha256"])
+                if resumen.get("ids"):
+                    _verificar(archivo, ruta, tabla, resumen["ids"], resumen["ids_sha256"])
+        for tabla, resumen in manifiesto["tablas"].items():
+            aplicadas[tabla] = 0
+            for lote in _lotes(archivo, resumen["archivo"], tam_lote):
+                aplicadas[tabla] += almacen.upsert(tabla, lote)
+            if resumen.get("ids"):
+                borradas[tabla] = almacen.borrar(tabla, almacen.ids(tabla) - _ids(archivo, resumen["ids"]))
+    return manifiesto, aplicadas, borradas
+
+
+def restaurar(rutas, destino, verificar=True, informe=print):
+    """Reproduce la base y sus incrementales, en orden, sobre la base SQLite destino."""
+    manifiestos = [leer_manifiesto(r) for r in rutas]
+    if manifiestos and manifiestos[0].get("tipo") != "completo":
+        raise ValueError("La cadena debe empezar con un respaldo completo")
+    for anterior, ruta, manifiesto in zip(rutas, rutas[1:], manifiestos[1:]):
+        if manifiesto.get("padre") != os.path.basename(anterior):
+            raise ValueError(f"{ruta} no continúa a {os.path.basename(anterior)}")
+
+    almacen = AlmacenSQLite(destino)
+    try:
+        for ruta in rutas:
+            manifiesto, aplicadas, borradas = aplicar_respaldo(almacen, ruta, verificar)
+            informe(f"{os.path.basename(ruta)} ({manifiesto['tipo']}): "
+                    + ", ".join(f"{t}={n}" + (f" (-{borradas[t]})" if borradas.get(t) else "")
+                                for t, n in aplicadas.items()))
+        return {t: almacen.contar(t) for t in almacen.tablas()}
+    finally:
+        almacen.cerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restaura respaldos NDJSON de SGE-CIR en SQLite.")
+    parser.add_argument("origen", nargs="+", help="Directorio de respaldos o archivos .zip en orden (base primero)")
+    parser.add_argument("destino", help="Archivo SQLite de salida")
+    parser.add_argument("--sin-verificar", action="store_true", help="No comparar sumas SHA-256")
+    args = parser.parse_args(argv)
+
+    if len(args.origen) == 1 and os.path.isdir(args.origen[0]):
+        rutas = cadena_desde_directorio(args.origen[0])
+    else:
+        rutas = args.origen
+
+    try:
+        totales = restaurar(rutas, args.destino, verificar=not args.sin_verificar)
+    except (RespaldoCorrupto, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    for tabla, filas in totales.items():
+        print(f"  {tabla}: {filas} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
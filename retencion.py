@@ -0,0 +1,364 @@
+# retencion.py (Retención de logs_sistema: archiva lo viejo en disco y lo borra de la base por tramos)
+#
+# Uso:
+#   python retencion.py                           -> archiva y borra lo que excede RETENCION_LOGS_DIAS
+#   python retencion.py --simulacro               -> solo informa qué se archivaría, no toca nada
+#   python retencion.py --dias 30 --formato parquet
+#   python retencion.py --buscar --desde 2025-01-01 --hasta 2025-03-31 --usuario ana --texto factura
+#
+# Pensado para cron (por ejemplo cada noche); la app también puede correrlo sola
+# cada RETENCION_CADA_HORAS horas (ver programar()).
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+import ajustes
+from auditoria import escritor_logs
+from database import DBManager
+from respaldo import _escribir_parquet, formatos_disponibles, linea_json
+
+FORMATOS_ARCHIVO = {
+    "ndjson": "NDJSON comprimido (.ndjson.gz)",
+    "parquet": "Parquet (.parquet)",
+}
+ARCHIVO_INDICE = "indice.json"
+ARCHIVO_CANDADO = "retencion.lock"
+# Un candado más viejo que esto es de una ejecución que murió sin soltarlo
+CANDADO_VENCE_SEG = 6 * 3600
+
+
+class RetencionEnCurso(Exception):
+    pass
+
+
+class RetencionInconsistente(Exception):
+    """Lo que hay en la base para una parte no coincide con lo archivado: no se marca como borrada."""
+
+
+def politicas():
+    """Tabla -> columna de fecha y días que se conservan en la base."""
+    return {"logs_sistema": {"columna": "fecha", "dias": ajustes.leer("RETENCION_LOGS_DIAS")}}
+
+
+def _instante(dia):
+    """Medianoche UTC del día en ISO, el formato con que auditoria.py guarda las fechas."""
+    return datetime.combine(dia, datetime.min.time(), timezone.utc).isoformat()
+
+
+def _dia(valor):
+    fecha = datetime.fromisoformat(str(valor))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.astimezone(timezone.utc).date()
+
+
+class MotorRetencion:
+    """
+    Mueve a archivos las filas más viejas que la política, en lotes de tam_lote:
+    cada lote se escribe en una partición por día (directorio/tabla/fecha=AAAA-MM-DD/),
+    se anota en el índice de la tabla y recién entonces se borra de la base con
+    delete_where en tramos de tam_borrado ids, con una pausa entre tramos para no
+    retener la tabla. Si el borrado se corta, la próxima ejecución lo termina antes
+    de archivar nada nuevo (el índice marca qué partes ya se borraron).
+    """
+
+    def __init__(self, db, directorio=None, tam_lote=5000, tam_borrado=1000, pausa=0.2):
+        self.db = db
+        self.directorio = directorio or ajustes.leer("DIR_ARCHIVO_LOGS")
+        self.tam_lote = tam_lote
+        self.tam_borrado = tam_borrado
+        self.pausa = pausa
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def corte(self, dias, hoy=None):
+        """Se conservan los últimos `dias` días completos (UTC): se archiva lo anterior a esta medianoche."""
+        return _instante((hoy or datetime.now(timezone.utc).date()) - timedelta(days=dias))
+
+    # --- Índice de archivos por tabla ---
+
+    def ruta_indice(self, tabla):
+        return os.path.join(self.directorio, tabla, ARCHIVO_INDICE)
+
+    def leer_indice(self, tabla):
+        """Lista de partes archivadas: archivo, dia, filas, rango de ids y fechas, sha256 y si ya se borraron."""
+        if not os.path.exists(self.ruta_indice(tabla)):
+            return []
+        with open(self.ruta_indice(tabla), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_indice(self, tabla, indice):
+        temporal = self.ruta_indice(tabla) + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(indice, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, self.ruta_indice(tabla))
+
+    @contextmanager
+    def _candado(self):
+        ruta = os.path.join(self.directorio, ARCHIVO_CANDADO)
+        if os.path.exists(ruta) and time.time() - os.path.getmtime(ruta) > CANDADO_VENCE_SEG:
+            os.remove(ruta)
+        try:
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RetencionEnCurso("Ya hay una retención en curso (otra sesión, el programador o cron).")
+        try:
+            os.write(descriptor, f"{os.getpid()} {datetime.now().isoformat()}".encode())
+            os.close(descriptor)
+            yield
+        finally:
+            os.remove(ruta)
+
+    # --- Simulacro ---
+
+    def simular(self, tabla, dias, columna="fecha"):
+        """Qué se archivaría hoy, por día, sin escribir ni borrar (lee solo id y fecha)."""
+        corte = self.corte(dias)
+        por_dia = {}
+        for fila in self.db.iter_rows(tabla, filters={columna: ("lt", corte)}, columnas=[columna],
+                                      tam_pagina=self.tam_lote, avisar=False):
+            dia = _dia(fila[columna]).isoformat()
+            por_dia[dia] = por_dia.get(dia, 0) + 1
+        return {"corte": corte, "filas": sum(por_dia.values()), "por_dia": dict(sorted(por_dia.items()))}
+
+    # --- Archivado y borrado ---
+
+    def archivar(self, tabla, dias, formato="ndjson", columna="fecha", progreso=None):
+        """
+        Archiva y borra las filas anteriores al corte. Devuelve un resumen con el corte,
+        filas archivadas y borradas, y archivos escritos. progreso(fraccion, texto) es opcional.
+        """
+        if formato not in formatos_disponibles() or formato not in FORMATOS_ARCHIVO:
+            raise ValueError(f"Formato de archivo no disponible: {formato}")
+        with self._candado():
+            resumen = {"corte": self.corte(dias), "archivadas": 0, "borradas": 0, "archivos": []}
+            resumen["borradas"] += self._completar_borrados(tabla, columna)
+
+            filtros = {columna: ("lt", resumen["corte"])}
+            total = self.db.contar(tabla, filtros, fresh=True)
+            lote = []
+            for fila in self.db.iter_rows(tabla, filters=filtros, tam_pagina=self.tam_lote, avisar=False):
+                lote.append(fila)
+                if len(lote) >= self.tam_lote:
+                    self._procesar_lote(tabla, lote, formato, columna, resumen)
+                    lote = []
+                    if progreso and total:
+                        progreso(min(resumen["archivadas"] / total, 1.0), f"{resumen['archivadas']} de {total} filas")
+            self._procesar_lote(tabla, lote, formato, columna, resumen)
+            if progreso:
+                progreso(1.0, f"{resumen['archivadas']} filas archivadas")
+            return resumen
+
+    def _procesar_lote(self, tabla, lote, formato, columna, resumen):
+        if not lote:
+            return
+        por_dia = {}
+        for fila in lote:
+            por_dia.setdefault(_dia(fila[columna]), []).append(fila)
+
+        indice = self.leer_indice(tabla)
+        nuevas = []
+        for dia, filas in sorted(por_dia.items()):
+            entrada = self._escribir_parte(tabla, dia, filas, formato, columna, resumen["corte"])
+            indice.append(entrada)
+            nuevas.append(entrada)
+        # Primero queda escrito (e indexado) y solo después se borra de la base
+        self._guardar_indice(tabla, indice)
+        resumen["archivadas"] += len(lote)
+        resumen["archivos"].extend(e["archivo"] for e in nuevas)
+
+        for entrada in nuevas:
+            resumen["borradas"] += self._borrar_parte(tabla, entrada, columna)
+            entrada["borrado"] = True
+            self._guardar_indice(tabla, indice)
+
+    def _escribir_parte(self, tabla, dia, filas, formato, columna, corte):
+        ids = [f["id"] for f in filas]
+        fechas = sorted(str(f[columna]) for f in filas)
+        extension = "ndjson.gz" if formato == "ndjson" else "parquet"
+        relativa = os.path.join(tabla, f"fecha={dia.isoformat()}", f"parte-{min(ids)}-{max(ids)}.{extension}")
+        ruta = os.path.join(self.directorio, relativa)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        # Misma suma que los respaldos: sobre la forma canónica de cada fila, sin importar el formato
+        suma = hashlib.sha256()
+        for fila in filas:
+            suma.update((linea_json(fila) + "\n").encode("utf-8"))
+        temporal = ruta + ".tmp"
+        if formato == "ndjson":
+            with gzip.open(temporal, "wt", encoding="utf-8") as f:
+                for fila in filas:
+                    f.write(linea_json(fila) + "\n")
+        else:
+            _escribir_parquet(temporal, filas, self.tam_lote)
+        os.replace(temporal, ruta)
+
+        return {
+            "archivo": relativa, "formato": formato, "dia": dia.isoformat(), "filas": len(filas),
+            "id_min": min(ids), "id_max": max(ids), "fecha_min": fechas[0], "fecha_max": fechas[-1],
+            "corte": corte, "sha256": suma.hexdigest(), "creado": datetime.now().isoformat(timespec="seconds"),
+            "borrado": False,
+        }
+
+    def _borrar_parte(self, tabla, entrada, columna, reanudando=False):
+        """
+        Borra de la base exactamente las filas de la parte: su rango de ids dentro de su
+        día y antes de su corte (los ids de otros días del mismo rango tienen otra fecha).
+        Se apoya en que iter_rows entrega los ids en orden ascendente: un lote no salta
+        ids que cumplan el filtro, así que las filas del día en [id_min, id_max] son las
+        archivadas. Se comprueba contando antes y después; si no cuadra con entrada["filas"]
+        se lanza RetencionInconsistente y la parte no queda marcada como borrada.
+        """
+        dia = date.fromisoformat(entrada["dia"])
+        ventana = [("gte", _instante(dia)), ("lt", min(_instante(dia + timedelta(days=1)), entrada["corte"]))]
+        presentes = self.db.contar(tabla, {"id": [("gte", entrada["id_min"]), ("lte", entrada["id_max"])],
+                                           columna: ventana}, fresh=True)
+        # Al reanudar un borrado cortado pueden quedar menos, pero nunca más que las archivadas
+        if presentes > entrada["filas"] or (not reanudando and presentes != entrada["filas"]):
+            raise RetencionInconsistente(f"{entrada['archivo']}: {presentes} filas en la base para "
+                                         f"{entrada['filas']} archivadas; no se borra")
+        borradas = 0
+        for desde_id in range(entrada["id_min"], entrada["id_max"] + 1, self.tam_borrado):
+            hasta_id = min(desde_id + self.tam_borrado - 1, entrada["id_max"])
+            borradas += self.db.delete_where(tabla, {"id": [("gte", desde_id), ("lte", hasta_id)], columna: ventana})
+            time.sleep(self.pausa)
+        if borradas != presentes:
+            raise RetencionInconsistente(f"{entrada['archivo']}: se borraron {borradas} filas de {presentes} esperadas")
+        return borradas
+
+    def _completar_borrados(self, tabla, columna):
+        """Partes archivadas cuyo borrado se cortó en una ejecución anterior."""
+        indice = self.leer_indice(tabla)
+        borradas = 0
+        for entrada in indice:
+            if not entrada["borrado"]:
+                borradas += self._borrar_parte(tabla, entrada, columna, reanudando=True)
+                entrada["borrado"] = True
+                self._guardar_indice(tabla, indice)
+        return borradas
+
+    # --- Búsqueda en lo archivado ---
+
+    def _leer_parte(self, entrada):
+        ruta = os.path.join(self.directorio, entrada["archivo"])
+        if entrada["formato"] == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(ruta).to_pylist()
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            return [json.loads(linea) for linea in f if linea.strip()]
+
+    def buscar(self, tabla, desde=None, hasta=None, usuario=None, modulo=None, accion=None, texto=None,
+               columna="fecha", limite=500):
+        """
+        Filas archivadas que cumplen los filtros, más nuevas primero. El índice descarta
+        los días fuera del rango sin abrir sus archivos; se leen días hacia atrás hasta
+        juntar `limite` filas.
+        """
+        entradas = [e for e in self.leer_indice(tabla)
+                    if (desde is None or e["dia"] >= desde.isoformat()) and (hasta is None or e["dia"] <= hasta.isoformat())]
+        entradas.sort(key=lambda e: (e["dia"], e["id_max"]), reverse=True)
+        iguales = {"usuario": usuario, "modulo": modulo, "accion": accion}
+        texto = (texto or "").strip().lower()
+
+        encontradas = []
+        for i, entrada in enumerate(entradas):
+            for fila in self._leer_parte(entrada):
+                if any(valor and fila.get(campo) != valor for campo, valor in iguales.items()):
+                    continue
+                if texto and texto not in str(fila.get("detalle", "")).lower():
+                    continue
+                encontradas.append(fila)
+            # Un día puede estar repartido en varias partes: se termina el día antes de cortar
+            siguiente = entradas[i + 1]["dia"] if i + 1 < len(entradas) else None
+            if len(encontradas) >= limite and siguiente != entrada["dia"]:
+                break
+        encontradas.sort(key=lambda f: (str(f.get(columna)), f.get("id", 0)), reverse=True)
+        return encontradas[:limite]
+
+
+# --- Ejecución programada dentro de la app ---
+
+_programador = None
+_programador_lock = threading.Lock()
+
+
+def _ciclo_programado(horas):
+    time.sleep(60)  # que la app termine de arrancar antes de la primera pasada
+    while True:
+        try:
+            motor = MotorRetencion(DBManager())
+            for tabla, politica in politicas().items():
+                resumen = motor.archivar(tabla, politica["dias"], columna=politica["columna"])
+                if resumen["archivadas"] or resumen["borradas"]:
+                    escritor_logs().registrar("Retención", "Mantenimiento",
+                                              f"{tabla}: {resumen['archivadas']} archivadas, {resumen['borradas']} borradas "
+                                              f"(antes de {resumen['corte'][:10]})", usuario="sistema", rol="sistema")
+        except RetencionEnCurso:
+            pass
+        except Exception as e:
+            escritor_logs().registrar("Retención", "Mantenimiento", f"Error en la retención programada: {e}",
+                                      usuario="sistema", rol="sistema")
+        time.sleep(horas * 3600)
+
+
+def programar():
+    """Arranca (una vez por proceso) el hilo que aplica las políticas cada RETENCION_CADA_HORAS horas; 0 = nunca."""
+    global _programador
+    horas = ajustes.leer("RETENCION_CADA_HORAS")
+    if _programador is not None or not horas:
+        return
+    with _programador_lock:
+        if _programador is None:
+            _programador = threading.Thread(target=_ciclo_programado, args=(horas,), name="retencion", daemon=True)
+            _programador.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archiva y borra los logs antiguos de SGE-CIR.")
+    parser.add_argument("--dias", type=int, help="Días que se conservan en la base (por defecto RETENCION_LOGS_DIAS)")
+    parser.add_argument("--formato", choices=list(FORMATOS_ARCHIVO), default="ndjson")
+    parser.add_argument("--simulacro", action="store_true", help="Solo informar qué se archivaría")
+    parser.add_argument("--directorio", help="Carpeta del archivo (por defecto DIR_ARCHIVO_LOGS)")
+    parser.add_argument("--buscar", action="store_true", help="Buscar en lo archivado en vez de archivar")
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    parser.add_argument("--usuario")
+    parser.add_argument("--modulo")
+    parser.add_argument("--accion")
+    parser.add_argument("--texto")
+    args = parser.parse_args(argv)
+
+    motor = MotorRetencion(DBManager(), directorio=args.directorio)
+
+    if args.buscar:
+        for fila in motor.buscar("logs_sistema", args.desde, args.hasta, args.usuario, args.modulo, args.accion, args.texto):
+            print(linea_json(fila))
+        return 0
+
+    for tabla, politica in politicas().items():
+        dias = args.dias or politica["dias"]
+        if args.simulacro:
+            simulacro = motor.simular(tabla, dias, politica["columna"])
+            print(f"{tabla}: se archivarían {simulacro['filas']} filas anteriores a {simulacro['corte']}")
+            for dia, filas in simulacro["por_dia"].items():
+                print(f"  {dia}: {filas}")
+            continue
+        try:
+            resumen = motor.archivar(tabla, dias, args.formato, politica["columna"],
+                                     progreso=lambda f, t: print(f"  {t}"))
+        except (RetencionEnCurso, RetencionInconsistente) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        print(f"{tabla}: {resumen['archivadas']} archivadas en {len(resumen['archivos'])} archivos, "
+              f"{resumen['borradas']} borradas (anteriores a {resumen['corte']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
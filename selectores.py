@@ -0,0 +1,58 @@
+# selectores.py (Selectores con búsqueda en el servidor para clientes y productos)
+import streamlit as st
+from database import patron_ilike
+
+# Letras mínimas antes de consultar y filas que trae cada búsqueda
+MIN_CARACTERES = 2
+LIMITE_OPCIONES = 20
+
+
+def buscar_opciones(db, tabla, texto, columnas, campos=("nombre",), filtros=None, limite=LIMITE_OPCIONES):
+    """
+    Hasta `limite` filas cuyo algún campo contiene el texto (ILIKE, resuelto en Postgres
+    con los índices de trigramas de sql/008). Un campo por consulta: la segunda solo se
+    hace si la primera no llenó la lista.
+    """
+    texto = (texto or "").strip()
+    if len(texto) < MIN_CARACTERES:
+        return []
+    filas = {}
+    for campo in campos:
+        condiciones = dict(filtros or {}, **{campo: ("ilike", patron_ilike(texto))})
+        for fila in db.fetch(tabla, filters=condiciones, columnas=columnas, orden="nombre", limite=limite):
+            filas.setdefault(fila["id"], fila)
+        if len(filas) >= limite:
+            break
+    return list(filas.values())[:limite]
+
+
+def selector(db, tabla, etiqueta, clave, columnas, formato, campos=("nombre",), filtros=None,
+             vacio="Seleccionar..."):
+    """
+    Caja de búsqueda + lista corta para elegir una fila de una tabla grande.
+    La elección se guarda por id (dos clientes con el mismo nombre no se confunden)
+    y se conserva aunque cambie la búsqueda. Devuelve la fila elegida o None.
+
+    st.text_input solo vuelve a ejecutar el script al presionar Enter o salir del
+    campo, no con cada tecla; además no se consulta con menos de MIN_CARACTERES
+    y una búsqueda repetida sale de la caché de lecturas de DBManager.
+    """
+    clave_id, clave_filas = f"{clave}_id", f"{clave}_filas"
+    texto = st.text_input(etiqueta, key=f"{clave}_buscar",
+                          placeholder=f"Escriba al menos {MIN_CARACTERES} letras y presione Enter")
+
+    elegido = st.session_state.get(clave_id)
+    anteriores = st.session_state.get(clave_filas, {})
+    filas = {f["id"]: f for f in buscar_opciones(db, tabla, texto, columnas, campos, filtros)}
+    if elegido in anteriores and elegido not in filas:
+        filas = {elegido: anteriores[elegido], **filas}
+    st.session_state[clave_filas] = filas
+
+    if texto.strip() and len(texto.strip()) >= MIN_CARACTERES and not filas:
+        st.caption("Sin coincidencias.")
+    if len(filas) >= LIMITE_OPCIONES:
+        st.caption(f"Se muestran las primeras {LIMITE_OPCIONES} coincidencias: afine la búsqueda para ver otras.")
+
+    id_fila = st.selectbox(etiqueta, [None] + list(filas), key=clave_id, label_visibility="collapsed",
+                           format_func=lambda i: vacio if i is None else formato(filas[i]))
+    return filas.get(id_fila)
@@ -0,0 +1,6 @@
+-- 001_perfiles_login.sql
+-- Login por una sola fila: índice único sobre el usuario.
+-- Las claves se guardan como hash pbkdf2_sha256 (ver auth.py); las que
+-- aún estén en texto plano se migran solas en el siguiente ingreso.
+
+create unique index if not exists perfiles_usuario_idx on perfiles (usuario);
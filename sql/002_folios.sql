@@ -0,0 +1,71 @@
+-- 002_folios.sql
+-- Numeración de facturas y cotizaciones (AAAA-NNN) sin recorrer la tabla ventas.
+-- Una fila contador por tipo de documento y año; el UPSERT toma un bloqueo de
+-- fila, así dos cajeros que confirman a la vez reciben números distintos.
+
+create table if not exists folios (
+    tipo   text    not null,
+    anio   integer not null,
+    ultimo integer not null default 0,
+    primary key (tipo, anio)
+);
+
+create or replace function siguiente_folio(p_tipo text, p_anio integer)
+returns integer
+language sql
+as $$
+    insert into folios (tipo, anio, ultimo)
+    values (p_tipo, p_anio, 1)
+    on conflict (tipo, anio) do update set ultimo = folios.ultimo + 1
+    returning ultimo;
+$$;
+
+alter table ventas add column if not exists anio integer;
+alter table cotizaciones add column if not exists anio integer;
+alter table cotizaciones add column if not exists numero integer;
+
+-- Año de cada documento anterior: el de su fecha (o created_at), no el de hoy,
+-- para que reimpresiones y exportaciones muestren el AAAA-NNN que corresponde
+update ventas
+set anio = coalesce(extract(year from coalesce(left(fecha::text, 10), left(created_at::text, 10))::date),
+                    extract(year from now()))::integer
+where anio is null;
+
+update cotizaciones
+set anio = coalesce(extract(year from coalesce(left(fecha::text, 10), left(created_at::text, 10))::date),
+                    extract(year from now()))::integer
+where anio is null;
+
+-- Las cotizaciones viejas se imprimían con su id: ese es su número
+update cotizaciones set numero = id where numero is null;
+
+-- La numeración anterior (cantidad de ventas + 1) repetía números cuando dos cajeros
+-- facturaban a la vez. Antes del índice único, la venta más antigua de cada
+-- (anio, num_fact) conserva su número y las demás reciben uno nuevo al final de su año.
+with repetidas as (
+    select id, anio
+    from (select id, anio, row_number() over (partition by anio, num_fact order by id) as orden
+          from ventas where num_fact is not null) v
+    where orden > 1
+),
+nuevas as (
+    select r.id, m.maximo + row_number() over (partition by r.anio order by r.id) as num_fact
+    from repetidas r
+    join (select anio, max(num_fact) as maximo from ventas where num_fact is not null group by anio) m
+      on m.anio = r.anio
+)
+update ventas v set num_fact = n.num_fact
+from nuevas n
+where v.id = n.id;
+
+-- Los contadores siguen desde el número más alto ya entregado en cada año (no desde
+-- la cantidad de filas: con ventas borradas, max(num_fact) es mayor que count(*))
+insert into folios (tipo, anio, ultimo)
+select 'venta', anio, coalesce(max(num_fact), 0) from ventas group by anio
+on conflict (tipo, anio) do update set ultimo = greatest(folios.ultimo, excluded.ultimo);
+
+insert into folios (tipo, anio, ultimo)
+select 'cotizacion', anio, coalesce(max(numero), 0) from cotizaciones group by anio
+on conflict (tipo, anio) do update set ultimo = greatest(folios.ultimo, excluded.ultimo);
+
+create unique index if not exists ventas_folio_idx on ventas (anio, num_fact) where num_fact is not null;
@@ -0,0 +1,70 @@
+-- 003_registrar_venta.sql
+-- Confirma una venta en una sola llamada y una sola transacción:
+--   1. bloquea los productos del carrito (en orden de id, sin interbloqueos)
+--   2. descuenta todo el stock de una vez y rechaza si algún producto no alcanza
+--   3. toma el número de factura del contador (sin huecos: si algo falla, se revierte)
+--   4. inserta la venta y, si viene de una cotización, la marca como facturada
+-- Requiere 002_folios.sql.
+
+create or replace function registrar_venta(
+    p_venta jsonb,
+    p_lineas jsonb,
+    p_id_cotizacion bigint default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_anio      integer := coalesce((p_venta->>'anio')::integer, extract(year from now())::integer);
+    v_faltantes jsonb;
+    v_venta     ventas;
+begin
+    create temporary table if not exists _pedido (id bigint primary key, cantidad integer) on commit drop;
+    truncate _pedido;
+
+    -- Una misma línea puede repetirse en el carrito: sumamos por producto.
+    -- Las líneas manuales (mano de obra) no tienen id y no mueven inventario.
+    insert into _pedido (id, cantidad)
+    select (l->>'id')::bigint, sum((l->>'cantidad')::integer)
+    from jsonb_array_elements(p_lineas) l
+    where nullif(l->>'id', '') is not null
+    group by 1;
+
+    perform 1 from productos where id in (select id from _pedido) order by id for update;
+
+    select jsonb_agg(jsonb_build_object('id', pe.id, 'pedido', pe.cantidad, 'stock', coalesce(p.stock, 0)))
+    into v_faltantes
+    from _pedido pe
+    left join productos p on p.id = pe.id
+    where p.id is null or p.stock < pe.cantidad;
+
+    if v_faltantes is not null then
+        raise exception 'Stock insuficiente: %', v_faltantes using errcode = 'P0001';
+    end if;
+
+    update productos p set stock = p.stock - pe.cantidad
+    from _pedido pe
+    where p.id = pe.id;
+
+    if p_id_cotizacion is not null then
+        update cotizaciones set estado = 'Facturado'
+        where id = p_id_cotizacion and estado = 'Pendiente';
+        if not found then
+            raise exception 'La cotización % ya fue facturada', p_id_cotizacion using errcode = 'P0001';
+        end if;
+    end if;
+
+    -- jsonb_populate_record convierte cada campo al tipo real de su columna
+    v_venta := jsonb_populate_record(
+        null::ventas,
+        p_venta || jsonb_build_object('anio', v_anio, 'num_fact', siguiente_folio('venta', v_anio))
+    );
+
+    insert into ventas (cliente, subtotal, itbms, descuento, flete, total, num_fact, anio, detalle, fecha)
+    values (v_venta.cliente, v_venta.subtotal, v_venta.itbms, v_venta.descuento, v_venta.flete,
+            v_venta.total, v_venta.num_fact, v_venta.anio, v_venta.detalle, v_venta.fecha)
+    returning * into v_venta;
+
+    return to_jsonb(v_venta);
+end;
+$$;
@@ -0,0 +1,9 @@
+-- 004_productos_barcode.sql
+-- La importación masiva hace UPSERT por barcode (ON CONFLICT necesita un índice único).
+-- Los productos sin código se guardan con NULL, que no choca con el índice.
+-- Si ya hay códigos repetidos, hay que resolverlos antes de crear la restricción:
+--   select barcode, count(*) from productos group by 1 having count(*) > 1;
+
+update productos set barcode = null where trim(barcode) = '';
+
+alter table productos add constraint productos_barcode_key unique (barcode);
@@ -0,0 +1,30 @@
+-- 005_updated_at.sql
+-- Marca de modificación en todas las tablas del negocio para los respaldos
+-- incrementales (respaldo.py) y la sincronización por deltas.
+-- created_at ya existe en las tablas de Supabase; updated_at lo mantiene el trigger.
+
+create or replace function tocar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['productos', 'clientes', 'ventas', 'cotizaciones', 'recibos',
+                             'gastos', 'depositos', 'perfiles', 'logs_sistema']
+    loop
+        execute format('alter table %I add column if not exists updated_at timestamptz not null default now()', t);
+        execute format('drop trigger if exists %I on %I', t || '_updated_at', t);
+        execute format('create trigger %I before update on %I for each row execute function tocar_updated_at()',
+                       t || '_updated_at', t);
+        execute format('create index if not exists %I on %I (updated_at)', t || '_updated_at_idx', t);
+    end loop;
+end;
+$$;
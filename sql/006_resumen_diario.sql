@@ -0,0 +1,140 @@
+-- 006_resumen_diario.sql
+-- Resumen financiero por día para el tablero de Contabilidad.
+-- Los triggers lo mantienen al insertar, modificar o borrar en ventas, gastos,
+-- depositos y recibos; reconstruir_resumen_diario() lo recalcula desde cero.
+
+create table if not exists resumen_diario (
+    dia            date primary key,
+    ingresos       numeric not null default 0,
+    itbms          numeric not null default 0,
+    descuentos     numeric not null default 0,
+    fletes         numeric not null default 0,
+    num_ventas     integer not null default 0,
+    gastos         numeric not null default 0,
+    depositos      numeric not null default 0,
+    recibos_total  numeric not null default 0,
+    recibos        jsonb   not null default '{}'::jsonb  -- {"Efectivo": 120.50, "ACH": 300, ...}
+);
+
+-- Suma (signo = 1) o resta (signo = -1) los importes de un movimiento en su día
+create or replace function acumular_resumen(p_dia date, p_campos jsonb, p_metodo text, p_signo integer)
+returns void
+language plpgsql
+as $$
+declare
+    v_recibo numeric := coalesce((p_campos->>'recibos_total')::numeric, 0) * p_signo;
+begin
+    insert into resumen_diario as r (dia) values (p_dia) on conflict (dia) do nothing;
+    update resumen_diario r set
+        ingresos      = r.ingresos      + coalesce((p_campos->>'ingresos')::numeric, 0)   * p_signo,
+        itbms         = r.itbms         + coalesce((p_campos->>'itbms')::numeric, 0)      * p_signo,
+        descuentos    = r.descuentos    + coalesce((p_campos->>'descuentos')::numeric, 0) * p_signo,
+        fletes        = r.fletes        + coalesce((p_campos->>'fletes')::numeric, 0)     * p_signo,
+        num_ventas    = r.num_ventas    + coalesce((p_campos->>'num_ventas')::integer, 0) * p_signo,
+        gastos        = r.gastos        + coalesce((p_campos->>'gastos')::numeric, 0)     * p_signo,
+        depositos     = r.depositos     + coalesce((p_campos->>'depositos')::numeric, 0)  * p_signo,
+        recibos_total = r.recibos_total + v_recibo,
+        recibos       = case when p_metodo is null then r.recibos
+                             else jsonb_set(r.recibos, array[p_metodo],
+                                            to_jsonb(coalesce((r.recibos->>p_metodo)::numeric, 0) + v_recibo))
+                        end
+    where r.dia = p_dia;
+end;
+$$;
+
+create or replace function campos_resumen(p_tabla text, p_fila jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select case p_tabla
+        when 'ventas' then jsonb_build_object(
+            'ingresos', p_fila->'total', 'itbms', p_fila->'itbms', 'descuentos', p_fila->'descuento',
+            'fletes', p_fila->'flete', 'num_ventas', 1)
+        when 'gastos'    then jsonb_build_object('gastos', p_fila->'monto')
+        when 'depositos' then jsonb_build_object('depositos', p_fila->'monto')
+        when 'recibos'   then jsonb_build_object('recibos_total', p_fila->'monto')
+    end;
+$$;
+
+create or replace function dia_movimiento(p_fila jsonb)
+returns date
+language sql
+immutable
+as $$
+    select coalesce(left(p_fila->>'fecha', 10), left(p_fila->>'created_at', 10))::date;
+$$;
+
+create or replace function trigger_resumen_diario()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_vieja jsonb;
+    v_nueva jsonb;
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        v_vieja := to_jsonb(old);
+        perform acumular_resumen(dia_movimiento(v_vieja), campos_resumen(tg_table_name, v_vieja),
+                                 case when tg_table_name = 'recibos' then coalesce(v_vieja->>'metodo_pago', 'Otro') end, -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        v_nueva := to_jsonb(new);
+        perform acumular_resumen(dia_movimiento(v_nueva), campos_resumen(tg_table_name, v_nueva),
+                                 case when tg_table_name = 'recibos' then coalesce(v_nueva->>'metodo_pago', 'Otro') end, 1);
+    end if;
+    return null;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['ventas', 'gastos', 'depositos', 'recibos']
+    loop
+        execute format('drop trigger if exists %I on %I', t || '_resumen_diario', t);
+        execute format('create trigger %I after insert or update or delete on %I '
+                       'for each row execute function trigger_resumen_diario()', t || '_resumen_diario', t);
+    end loop;
+end;
+$$;
+
+create or replace function reconstruir_resumen_diario()
+returns integer
+language plpgsql
+as $$
+declare
+    v_dias integer;
+begin
+    lock table resumen_diario in exclusive mode;
+    delete from resumen_diario;
+
+    insert into resumen_diario (dia, ingresos, itbms, descuentos, fletes, num_ventas)
+    select dia_movimiento(to_jsonb(v)), sum(coalesce(total, 0)), sum(coalesce(itbms, 0)),
+           sum(coalesce(descuento, 0)), sum(coalesce(flete, 0)), count(*)
+    from ventas v group by 1;
+
+    insert into resumen_diario as r (dia, gastos)
+    select dia_movimiento(to_jsonb(g)), sum(coalesce(monto, 0)) from gastos g group by 1
+    on conflict (dia) do update set gastos = excluded.gastos;
+
+    insert into resumen_diario as r (dia, depositos)
+    select dia_movimiento(to_jsonb(d)), sum(coalesce(monto, 0)) from depositos d group by 1
+    on conflict (dia) do update set depositos = excluded.depositos;
+
+    insert into resumen_diario as r (dia, recibos_total, recibos)
+    select dia, sum(monto), jsonb_object_agg(metodo, monto)
+    from (
+        select dia_movimiento(to_jsonb(x)) as dia, coalesce(metodo_pago, 'Otro') as metodo, sum(coalesce(monto, 0)) as monto
+        from recibos x group by 1, 2
+    ) por_metodo
+    group by dia
+    on conflict (dia) do update set recibos_total = excluded.recibos_total, recibos = excluded.recibos;
+
+    select count(*) into v_dias from resumen_diario;
+    return v_dias;
+end;
+$$;
+
+select reconstruir_resumen_diario();
@@ -0,0 +1,43 @@
+-- 007_cxc_saldos.sql
+-- Saldo por factura mantenido en la propia fila de ventas:
+--   pagado = suma de recibos de la factura (lo mantiene el trigger de recibos)
+--   saldo  = total - pagado (columna generada, indexada para las pendientes)
+-- Así consultar el saldo de una factura es una lectura por llave primaria.
+
+alter table ventas add column if not exists pagado numeric not null default 0;
+alter table ventas add column if not exists saldo numeric
+    generated always as (coalesce(total, 0) - pagado) stored;
+
+create index if not exists ventas_pendientes_idx on ventas (cliente, fecha) where saldo > 0.01;
+create index if not exists recibos_id_venta_idx on recibos (id_venta);
+
+create or replace function trigger_saldo_venta()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.id_venta is not null then
+        update ventas set pagado = pagado - coalesce(old.monto, 0) where id = old.id_venta;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.id_venta is not null then
+        update ventas set pagado = pagado + coalesce(new.monto, 0) where id = new.id_venta;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists recibos_saldo_venta on recibos;
+create trigger recibos_saldo_venta
+    after insert or update of monto, id_venta or delete on recibos
+    for each row execute function trigger_saldo_venta();
+
+-- Cambiar pagado no mueve el resumen diario: limitamos ese trigger a las columnas que sí lo afectan
+drop trigger if exists ventas_resumen_diario on ventas;
+create trigger ventas_resumen_diario
+    after insert or update of total, itbms, descuento, flete, fecha or delete on ventas
+    for each row execute function trigger_resumen_diario();
+
+-- Carga inicial con los recibos existentes
+update ventas v set pagado = r.pagado
+from (select id_venta, sum(coalesce(monto, 0)) as pagado from recibos where id_venta is not null group by 1) r
+where v.id = r.id_venta;
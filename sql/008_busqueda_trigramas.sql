@@ -0,0 +1,11 @@
+-- 008_busqueda_trigramas.sql
+-- Los selectores de Ventas y Cotizaciones (selectores.py) buscan con ILIKE '%texto%'
+-- y un LIMIT corto. Sin estos índices cada tecla recorre la tabla completa; con
+-- pg_trgm, Postgres resuelve el patrón desde un índice GIN de trigramas.
+
+create extension if not exists pg_trgm;
+
+create index if not exists productos_nombre_trgm_idx on productos using gin (nombre gin_trgm_ops);
+create index if not exists productos_referencia_trgm_idx on productos using gin (referencia gin_trgm_ops);
+create index if not exists clientes_nombre_trgm_idx on clientes using gin (nombre gin_trgm_ops);
+create index if not exists clientes_identificacion_trgm_idx on clientes using gin (identificacion gin_trgm_ops);
@@ -0,0 +1,10 @@
+-- 009_logs_indices.sql
+-- El visor de auditoría (visor_logs.py) pide páginas de logs_sistema ordenadas por
+-- fecha e id descendentes, dentro de un rango de fechas y opcionalmente por usuario,
+-- módulo o acción, y cuenta las filas del mismo filtro. Con estos índices cada página
+-- y cada conteo recorren solo el rango pedido, aunque la tabla tenga millones de filas.
+
+create index if not exists logs_sistema_fecha_idx on logs_sistema (fecha desc, id desc);
+create index if not exists logs_sistema_usuario_fecha_idx on logs_sistema (usuario, fecha desc, id desc);
+create index if not exists logs_sistema_modulo_fecha_idx on logs_sistema (modulo, fecha desc, id desc);
+create index if not exists logs_sistema_accion_fecha_idx on logs_sistema (accion, fecha desc, id desc);
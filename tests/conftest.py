@@ -0,0 +1,19 @@
+# conftest.py (Pruebas contra la base SQLite en memoria de backends.py: sin red ni Supabase)
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_BACKEND", "memoria")
+
+from backends import BackendSQLite  # noqa: E402
+from database import CacheLectura, DBManager  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """DBManager sobre una base vacía propia de cada prueba, con su propia caché de lecturas."""
+    manejador = DBManager(BackendSQLite(":memory:"))
+    manejador.cache = CacheLectura()
+    return manejador
@@ -0,0 +1,27 @@
+# Numeración de facturas y cotizaciones (siguiente_folio) y formato impreso AAAA-NNN
+from folios import TIPO_COTIZACION, TIPO_VENTA, folio_documento, formatear_folio
+
+
+def test_folios_consecutivos_por_tipo_y_anio(db):
+    assert [db.siguiente_folio(TIPO_VENTA, 2025) for _ in range(3)] == [1, 2, 3]
+    assert db.siguiente_folio(TIPO_COTIZACION, 2025) == 1
+    assert db.siguiente_folio(TIPO_VENTA, 2026) == 1
+    assert db.siguiente_folio(TIPO_VENTA, 2025) == 4
+
+
+def test_registrar_venta_toma_el_folio_de_su_anio(db):
+    primera = db.registrar_venta({"cliente": "Ana", "total": 10, "anio": 2025}, [])
+    segunda = db.registrar_venta({"cliente": "Beto", "total": 20, "anio": 2025}, [])
+    otra = db.registrar_venta({"cliente": "Ana", "total": 5, "anio": 2026}, [])
+    assert (primera["anio"], primera["num_fact"]) == (2025, 1)
+    assert (segunda["anio"], segunda["num_fact"]) == (2025, 2)
+    assert (otra["anio"], otra["num_fact"]) == (2026, 1)
+
+
+def test_formato_impreso():
+    assert formatear_folio(2025, 7) == "2025-007"
+    assert formatear_folio(2025, 1234) == "2025-1234"
+    assert folio_documento({"id": 9, "num_fact": 12, "anio": 2024}) == "2024-012"
+    # Sin año ni número: el de la fecha y el id
+    assert folio_documento({"id": 9, "fecha": "2023-05-01T10:00:00"}) == "2023-009"
+    assert folio_documento({"id": 3, "numero": 4, "anio": 2025}, "numero") == "2025-004"
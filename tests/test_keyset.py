@@ -0,0 +1,58 @@
+# Recorridos por páginas (keyset) de DBManager.iter_rows, con una y con varias columnas
+import pytest
+
+from reporte_inventario import ReporteInventario
+
+NOMBRES = ["Tubo", "Codo", "Abrazadera", "Tubo", "Válvula", None, "Codo", "Tubo", None, "Brida"]
+
+
+@pytest.fixture
+def productos(db):
+    db.insert("productos", [{"nombre": NOMBRES[i % len(NOMBRES)], "referencia": f"R{i}", "stock": i % 7,
+                             "stock_minimo": 3, "precio_costo": 1, "precio_venta": 2, "barcode": str(i)}
+                            for i in range(53)])
+    return db.fetch("productos", fresh=True)
+
+
+def _orden_esperado(filas):
+    # Mismo orden que la base: nombre ascendente con los NULL al final, luego id
+    return [f["id"] for f in sorted(filas, key=lambda f: (f["nombre"] is None, f["nombre"] or "", f["id"]))]
+
+
+def test_una_clave_recorre_todo_por_id(db, productos):
+    ids = [f["id"] for f in db.iter_rows("productos", columnas=["nombre"], tam_pagina=4)]
+    assert ids == sorted(f["id"] for f in productos)
+
+
+@pytest.mark.parametrize("tam_pagina", [1, 2, 5, 100])
+def test_varias_claves_respetan_el_orden_con_empates(db, productos, tam_pagina):
+    filas = list(db.iter_rows("productos", filters={"nombre": ("gte", "")}, columnas=["nombre"],
+                              tam_pagina=tam_pagina, clave=["nombre", "id"]))
+    con_nombre = [f for f in productos if f["nombre"] is not None]
+    assert [f["id"] for f in filas] == _orden_esperado(con_nombre)
+
+
+def test_respuestas_recortadas_no_saltan_filas(db, productos):
+    # Como PostgREST con max-rows: nunca más de 3 filas aunque se pidan más
+    consultar = db.backend.consultar
+    db.backend.consultar = lambda tabla, condiciones=(), columnas=None, orden=None, limite=None: \
+        consultar(tabla, condiciones, columnas, orden, 3 if limite is None else min(limite, 3))
+    filas = list(db.iter_rows("productos", filters={"nombre": ("gte", "")}, columnas=["nombre"],
+                              tam_pagina=10, clave=["nombre", "id"]))
+    assert [f["id"] for f in filas] == _orden_esperado([f for f in productos if f["nombre"] is not None])
+
+
+def test_reporte_incluye_los_productos_sin_nombre_al_final(db, productos, tmp_path):
+    reporte = ReporteInventario(db, tam_pagina=4, directorio=str(tmp_path))
+    barcodes = [fila[0] for fila in reporte._filas()]
+    por_id = {f["id"]: f["barcode"] for f in productos}
+    assert barcodes == [por_id[i] for i in _orden_esperado(productos)]
+    sin_nombre = sum(1 for f in productos if f["nombre"] is None)
+    assert sin_nombre and [fila[2] for fila in reporte._filas()][-sin_nombre:] == [None] * sin_nombre
+
+
+def test_reporte_filtra_referencia_y_stock_bajo(db, productos, tmp_path):
+    reporte = ReporteInventario(db, tam_pagina=4, directorio=str(tmp_path))
+    filas = list(reporte._filas(solo_stock_bajo=True, prefijo_referencia="r1"))
+    esperados = [f for f in productos if f["referencia"].startswith("R1") and f["stock"] <= f["stock_minimo"]]
+    assert sorted(fila[0] for fila in filas) == sorted(f["barcode"] for f in esperados)
@@ -0,0 +1,72 @@
+# Respaldo completo + incrementales NDJSON y su restauración con restaurar.py
+import os
+import zipfile
+
+import pytest
+
+import restaurar
+from almacen_sqlite import AlmacenSQLite
+from respaldo import MotorRespaldo
+
+
+@pytest.fixture
+def motor(db, tmp_path):
+    return MotorRespaldo(db, tablas=["productos", "clientes"], directorio=str(tmp_path / "respaldos"))
+
+
+def _restaurado(motor, destino):
+    rutas = restaurar.cadena_desde_directorio(motor.directorio)
+    restaurar.restaurar(rutas, str(destino), informe=lambda texto: None)
+    almacen = AlmacenSQLite(str(destino))
+    try:
+        return {t: {f["id"]: f for f in almacen.consultar(t)} for t in motor.tablas}
+    finally:
+        almacen.cerrar()
+
+
+def _vivo(db, tablas):
+    return {t: {f["id"]: f for f in db.fetch(t, fresh=True)} for t in tablas}
+
+
+def test_cadena_con_altas_cambios_y_borrados(db, motor, tmp_path):
+    productos = db.insert("productos", [{"nombre": f"p{i}", "stock": i} for i in range(7)])
+    clientes = db.insert("clientes", [{"nombre": "Ana"}, {"nombre": "Beto"}])
+    motor.generar("ndjson")
+
+    db.delete("productos", productos[2]["id"])
+    db.update("productos", {"stock": 99}, productos[0]["id"])
+    db.insert("productos", {"nombre": "nuevo"})
+    db.delete("clientes", clientes[1]["id"])
+    _, manifiesto = motor.generar("ndjson", nombre="delta", incremental=True)
+    assert manifiesto["tablas"]["productos"]["ids_total"] == 7
+
+    restaurado = _restaurado(motor, tmp_path / "copia.sqlite")
+    vivo = _vivo(db, motor.tablas)
+    assert {t: set(filas) for t, filas in restaurado.items()} == {t: set(filas) for t, filas in vivo.items()}
+    assert restaurado["productos"][productos[0]["id"]]["stock"] == 99
+
+
+def test_respaldo_danado_no_se_aplica(db, motor, tmp_path):
+    db.insert("productos", [{"nombre": "a"}, {"nombre": "b"}])
+    ruta, _ = motor.generar("ndjson")
+    danado = tmp_path / "danado.zip"
+    with zipfile.ZipFile(ruta) as origen, zipfile.ZipFile(danado, "w") as destino:
+        for nombre in origen.namelist():
+            datos = origen.read(nombre)
+            destino.writestr(nombre, datos.replace(b'"a"', b'"x"') if nombre == "productos.ndjson" else datos)
+    with pytest.raises(restaurar.RespaldoCorrupto):
+        restaurar.restaurar([str(danado)], str(tmp_path / "copia.sqlite"), informe=lambda texto: None)
+
+
+def test_falla_a_medias_no_deja_archivo_ni_avanza_la_cadena(db, motor, monkeypatch):
+    db.insert("productos", [{"nombre": "a"}])
+
+    def se_cae(*args, **kwargs):
+        raise ConnectionError("sin red")
+        yield
+
+    monkeypatch.setattr(db, "iter_rows", se_cae)
+    with pytest.raises(ConnectionError):
+        motor.generar("ndjson")
+    assert motor.leer_estado() is None
+    assert not [n for n in os.listdir(motor.directorio) if n.endswith(".zip")]
@@ -0,0 +1,85 @@
+# Retención de logs: archivo por día, borrado por tramos y búsqueda en lo archivado
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from retencion import MotorRetencion, RetencionInconsistente
+
+TABLA = "logs_sistema"
+
+
+@pytest.fixture
+def logs(db):
+    viejos = [{"fecha": f"2020-01-0{1 + i % 3}T10:{i:02d}:00+00:00", "usuario": "ana" if i % 2 else "beto",
+               "modulo": "Ventas", "accion": "Venta", "detalle": f"Factura {i}"} for i in range(30)]
+    ahora = datetime.now(timezone.utc)
+    recientes = [{"fecha": (ahora - timedelta(minutes=i)).isoformat(), "usuario": "ana", "modulo": "Ventas",
+                  "accion": "Venta", "detalle": f"Reciente {i}"} for i in range(5)]
+    # Intercalados, como llegan de verdad: los ids de un día no son contiguos
+    db.insert(TABLA, [f for par in zip(viejos[:5], recientes) for f in par] + viejos[5:])
+    return db
+
+
+@pytest.fixture
+def motor(logs, tmp_path):
+    return MotorRetencion(logs, directorio=str(tmp_path / "archivo"), tam_lote=7, tam_borrado=4, pausa=0)
+
+
+def test_simulacro_no_toca_nada(logs, motor):
+    simulacro = motor.simular(TABLA, 30)
+    assert simulacro["filas"] == 30
+    assert simulacro["por_dia"] == {"2020-01-01": 10, "2020-01-02": 10, "2020-01-03": 10}
+    assert logs.contar(TABLA, fresh=True) == 35
+
+
+def test_archiva_borra_y_busca(logs, motor):
+    resumen = motor.archivar(TABLA, 30)
+    assert resumen["archivadas"] == resumen["borradas"] == 30
+    restantes = logs.fetch(TABLA, fresh=True)
+    assert len(restantes) == 5 and all(f["detalle"].startswith("Reciente") for f in restantes)
+
+    indice = motor.leer_indice(TABLA)
+    assert sum(e["filas"] for e in indice) == 30 and all(e["borrado"] for e in indice)
+
+    de_ana = motor.buscar(TABLA, usuario="ana")
+    assert len(de_ana) == 15 and all(f["usuario"] == "ana" for f in de_ana)
+    assert [f["detalle"] for f in motor.buscar(TABLA, texto="factura 29")] == ["Factura 29"]
+    assert len(motor.buscar(TABLA, desde=date(2020, 1, 2), hasta=date(2020, 1, 2))) == 10
+
+    # Una segunda pasada no encuentra nada más que archivar
+    assert motor.archivar(TABLA, 30)["archivadas"] == 0
+
+
+def test_borrado_cortado_se_termina_en_la_siguiente_pasada(logs, motor, monkeypatch):
+    borrar = logs.delete_where
+    llamadas = []
+
+    def se_corta(tabla, filters):
+        llamadas.append(1)
+        if len(llamadas) == 2:
+            raise ConnectionError("sin red")
+        return borrar(tabla, filters)
+
+    monkeypatch.setattr(logs, "delete_where", se_corta)
+    with pytest.raises(ConnectionError):
+        motor.archivar(TABLA, 30)
+    assert not all(e["borrado"] for e in motor.leer_indice(TABLA))
+
+    monkeypatch.setattr(logs, "delete_where", borrar)
+    motor.archivar(TABLA, 30)
+    assert logs.contar(TABLA, fresh=True) == 5
+    assert sum(e["filas"] for e in motor.leer_indice(TABLA)) == 30
+
+
+def test_parte_que_no_cuadra_no_se_borra(logs, motor, monkeypatch):
+    escribir = motor._escribir_parte
+
+    def pierde_una_fila(tabla, dia, filas, *args):
+        # El archivo queda sin una fila del medio: el rango de ids ya no coincide con lo archivado
+        return escribir(tabla, dia, filas[:1] + filas[2:] if len(filas) > 2 else filas, *args)
+
+    monkeypatch.setattr(motor, "_escribir_parte", pierde_una_fila)
+    with pytest.raises(RetencionInconsistente):
+        motor.archivar(TABLA, 30)
+    assert logs.contar(TABLA, fresh=True) == 35
+    assert not any(e["borrado"] for e in motor.leer_indice(TABLA))
@@ -0,0 +1,52 @@
+# registrar_venta: todo o nada, sin vender más de lo que hay en stock
+import pytest
+
+from backends import StockInsuficiente
+
+
+@pytest.fixture
+def productos(db):
+    filas = db.insert("productos", [{"nombre": "Tubo", "stock": 5}, {"nombre": "Codo", "stock": 2}])
+    return {f["nombre"]: f["id"] for f in filas}
+
+
+def _stock(db):
+    return {f["nombre"]: f["stock"] for f in db.fetch("productos", columnas=["nombre", "stock"], fresh=True)}
+
+
+def test_descuenta_todas_las_lineas(db, productos):
+    venta = db.registrar_venta({"cliente": "Ana", "total": 30},
+                               [{"id": productos["Tubo"], "cantidad": 2}, {"id": productos["Codo"], "cantidad": 2},
+                                {"id": productos["Tubo"], "cantidad": 1}])
+    assert venta["num_fact"] == 1
+    assert _stock(db) == {"Tubo": 2, "Codo": 0}
+
+
+def test_sobreventa_no_aplica_nada(db, productos):
+    with pytest.raises(StockInsuficiente):
+        db.registrar_venta({"cliente": "Ana", "total": 30},
+                           [{"id": productos["Tubo"], "cantidad": 1}, {"id": productos["Codo"], "cantidad": 3}])
+    assert _stock(db) == {"Tubo": 5, "Codo": 2}
+    assert db.fetch("ventas", fresh=True) == []
+
+
+def test_lineas_repetidas_se_suman_antes_de_validar(db, productos):
+    with pytest.raises(StockInsuficiente):
+        db.registrar_venta({"cliente": "Ana"}, [{"id": productos["Codo"], "cantidad": 2},
+                                                {"id": productos["Codo"], "cantidad": 1}])
+    assert _stock(db)["Codo"] == 2
+
+
+def test_producto_inexistente_es_sobreventa(db, productos):
+    with pytest.raises(StockInsuficiente):
+        db.registrar_venta({"cliente": "Ana"}, [{"id": 999, "cantidad": 1}])
+
+
+def test_cotizacion_se_factura_una_sola_vez(db, productos):
+    cotizacion = db.insert("cotizaciones", {"cliente": "Ana", "estado": "Pendiente"})[0]
+    lineas = [{"id": productos["Tubo"], "cantidad": 1}]
+    db.registrar_venta({"cliente": "Ana"}, lineas, id_cotizacion=cotizacion["id"])
+    with pytest.raises(ValueError):
+        db.registrar_venta({"cliente": "Ana"}, lineas, id_cotizacion=cotizacion["id"])
+    assert _stock(db)["Tubo"] == 4
+    assert len(db.fetch("ventas", fresh=True)) == 1
@@ -0,0 +1,113 @@
+# visor_logs.py (Historial de auditoría por páginas, con filtros y orden resueltos en la base)
+import math
+from datetime import date, datetime, time, timedelta, timezone
+
+import pandas as pd
+import streamlit as st
+
+from auditoria import ACCIONES, MODULOS, TABLA_LOGS
+
+TAM_PAGINA = 50
+DIAS_POR_DEFECTO = 7
+COLUMNAS = ["id", "fecha", "usuario", "rol", "modulo", "accion", "detalle"]
+ORDEN = ["-fecha", "-id"]
+
+
+def _instante(dia):
+    """Medianoche local del día, en UTC e ISO (el mismo formato que guarda auditoria.py)."""
+    return datetime.combine(dia, time.min).astimezone().astimezone(timezone.utc).isoformat()
+
+
+def filtros_logs(desde, hasta, usuario=None, modulo=None, accion=None):
+    """Filtros de fetch para logs_sistema: días completos [desde, hasta] y las igualdades elegidas."""
+    filtros = {"fecha": [("gte", _instante(desde)), ("lt", _instante(hasta + timedelta(days=1)))]}
+    for campo, valor in (("usuario", usuario), ("modulo", modulo), ("accion", accion)):
+        if valor:
+            filtros[campo] = valor
+    return filtros
+
+
+def pagina_logs(db, filtros, cursor=None, tam=TAM_PAGINA):
+    """
+    Una página por fecha e id descendentes, empezando después de cursor = (fecha, id)
+    de la última fila de la página anterior. "(fecha, id) < cursor" necesitaría un OR;
+    se parte en dos consultas con AND que usan el índice de sql/009: la misma fecha con
+    id menor (casi nunca hay) y luego las fechas anteriores.
+    """
+    if cursor is None:
+        return db.fetch(TABLA_LOGS, filters=filtros, columnas=COLUMNAS, orden=ORDEN, limite=tam)
+    fecha, ultimo_id = cursor
+    empates = db.fetch(TABLA_LOGS, filters=dict(filtros, fecha=filtros["fecha"] + [("eq", fecha)], id=("lt", ultimo_id)),
+                       columnas=COLUMNAS, orden=ORDEN, limite=tam)
+    if len(empates) >= tam:
+        return empates
+    anteriores = db.fetch(TABLA_LOGS, filters=dict(filtros, fecha=filtros["fecha"] + [("lt", fecha)]),
+                          columnas=COLUMNAS, orden=ORDEN, limite=tam - len(empates))
+    return empates + anteriores
+
+
+class VisorLogs:
+    """
+    Tabla de logs_sistema para Configuración y Administración. Cada rerun trae solo
+    la página visible (TAM_PAGINA filas) y un conteo, nunca la tabla completa; las
+    páginas se recorren por cursor (keyset) y no por OFFSET.
+    """
+
+    def __init__(self, db, clave="logs"):
+        self.db = db
+        self.clave = clave
+
+    def _estado(self, firma):
+        # Al cambiar un filtro se vuelve a la primera página
+        if st.session_state.get(f"{self.clave}_firma") != firma:
+            st.session_state[f"{self.clave}_firma"] = firma
+            st.session_state[f"{self.clave}_cursores"] = [None]
+            st.session_state[f"{self.clave}_pagina"] = 0
+        return st.session_state[f"{self.clave}_cursores"], st.session_state[f"{self.clave}_pagina"]
+
+    def _mover(self, paso, cursor=None):
+        cursores = st.session_state[f"{self.clave}_cursores"]
+        pagina = st.session_state[f"{self.clave}_pagina"] + paso
+        if paso > 0 and len(cursores) <= pagina:
+            cursores.append(cursor)
+        st.session_state[f"{self.clave}_pagina"] = max(pagina, 0)
+
+    def render(self):
+        hoy = date.today()
+        c_fechas, c_usu, c_mod, c_acc = st.columns([2, 1, 1, 1])
+        rango = c_fechas.date_input("Fechas", value=(hoy - timedelta(days=DIAS_POR_DEFECTO), hoy),
+                                    max_value=hoy, key=f"{self.clave}_fechas")
+        # Mientras se elige el rango, date_input devuelve una sola fecha
+        desde, hasta = (rango[0], rango[-1]) if isinstance(rango, (tuple, list)) and rango else (hoy, hoy)
+        usuarios = [u["usuario"] for u in self.db.fetch("perfiles", columnas=["usuario"], orden="usuario")]
+        usuario = c_usu.selectbox("Usuario", [None] + usuarios, key=f"{self.clave}_usuario",
+                                  format_func=lambda u: "Todos" if u is None else u)
+        modulo = c_mod.selectbox("Módulo", [None] + MODULOS, key=f"{self.clave}_modulo",
+                                 format_func=lambda m: "Todos" if m is None else m)
+        accion = c_acc.selectbox("Acción", [None] + ACCIONES, key=f"{self.clave}_accion",
+                                 format_func=lambda a: "Todas" if a is None else a)
+
+        filtros = filtros_logs(desde, hasta, usuario, modulo, accion)
+        cursores, pagina = self._estado(repr(filtros))
+        total = self.db.contar(TABLA_LOGS, filtros)
+        filas = pagina_logs(self.db, filtros, cursores[pagina])
+
+        if not filas:
+            st.warning("No hay registros de actividad con estos filtros.")
+            return
+
+        df = pd.DataFrame(filas, columns=COLUMNAS)
+        # Solo la página visible: fechas a la hora local, ya ordenadas por la base
+        df["fecha"] = (pd.to_datetime(df["fecha"], utc=True, format="ISO8601")
+                       .dt.tz_convert(datetime.now().astimezone().tzinfo).dt.strftime("%d/%m/%Y %H:%M:%S"))
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+        paginas = max(1, math.ceil(total / TAM_PAGINA))
+        ultima = filas[-1]
+        hay_mas = len(filas) == TAM_PAGINA and (pagina + 1) * TAM_PAGINA < total
+        c_ant, c_info, c_sig = st.columns([1, 3, 1])
+        c_ant.button("⬅️ Anterior", key=f"{self.clave}_ant", disabled=pagina == 0,
+                     on_click=self._mover, args=(-1,), use_container_width=True)
+        c_info.caption(f"{total:,} registros · página {pagina + 1} de {paginas}")
+        c_sig.button("Siguiente ➡️", key=f"{self.clave}_sig", disabled=not hay_mas,
+                     on_click=self._mover, args=(1, (ultima["fecha"], ultima["id"])), use_container_width=True)